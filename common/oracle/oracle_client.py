@@ -1,19 +1,58 @@
 """
 Cliente Oracle reutilizable para todos los scripts de database-scripts/.
 
-Uso:
+Uso (una conexión):
     from common.oracle.oracle_client import OracleConnection
 
     with OracleConnection(dsn="host:port/service", user="usr", password="pwd") as conn:
         with conn.cursor() as cursor:
             cursor.execute("SELECT 1 FROM DUAL")
             row = cursor.fetchone()
+
+Uso (pool, varias conexiones concurrentes):
+    from common.oracle.oracle_client import OraclePool
+
+    with OraclePool(dsn="host:port/service", user="usr", password="pwd", max_size=4) as pool:
+        with pool.acquire() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM DUAL")
+                row = cursor.fetchone()
+        print(pool.stats())
 """
 
+import math
+import threading
+import time
+from contextlib import contextmanager
+
 import oracledb
 from typing import Optional
 
 
+def _validate_credentials(dsn: str, user: str, password: str) -> None:
+    """Valida que DSN, usuario y contraseña estén definidos."""
+    if not dsn:
+        raise ValueError(
+            "ORACLE_DSN no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
+            "  Ejemplo: ORACLE_DSN=host:1521/service_name"
+        )
+    if not user:
+        raise ValueError(
+            "ORACLE_USER no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
+            "  Ejemplo: ORACLE_USER=usuario_oracle"
+        )
+    if not password:
+        raise ValueError(
+            "ORACLE_PASSWORD no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
+            "  Ejemplo: ORACLE_PASSWORD=contraseña_oracle"
+        )
+
+
+def _easy_connect(dsn: str) -> str:
+    """Fuerza formato Easy Connect para evitar búsqueda en tnsnames.ora."""
+    return dsn if dsn.startswith("//") else f"//{dsn}"
+
+
 class OracleConnection:
     """
     Context manager para conexión a Oracle DB en thin mode.
@@ -28,23 +67,8 @@ class OracleConnection:
             user:     Usuario Oracle
             password: Contraseña Oracle
         """
-        if not dsn:
-            raise ValueError(
-                "ORACLE_DSN no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
-                "  Ejemplo: ORACLE_DSN=host:1521/service_name"
-            )
-        if not user:
-            raise ValueError(
-                "ORACLE_USER no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
-                "  Ejemplo: ORACLE_USER=usuario_oracle"
-            )
-        if not password:
-            raise ValueError(
-                "ORACLE_PASSWORD no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
-                "  Ejemplo: ORACLE_PASSWORD=contraseña_oracle"
-            )
-        # Forzar formato Easy Connect para evitar búsqueda en tnsnames.ora
-        self.dsn = dsn if dsn.startswith("//") else f"//{dsn}"
+        _validate_credentials(dsn, user, password)
+        self.dsn = _easy_connect(dsn)
         self.user = user
         self.password = password
         self._conn: Optional[oracledb.Connection] = None
@@ -61,3 +85,236 @@ class OracleConnection:
         if self._conn:
             self._conn.close()
         return False
+
+
+class _PooledCursor:
+    """
+    Envoltorio de oracledb.Cursor que contabiliza ejecuciones y filas leídas
+    para las métricas del pool. El resto de atributos se delega al cursor real.
+    """
+
+    def __init__(self, cursor: oracledb.Cursor, pool: "OraclePool"):
+        self._cursor = cursor
+        self._pool = pool
+        self._rows_current = 0
+        self._executing = False
+
+    def _finish_execute(self):
+        if self._executing:
+            self._pool._record_execute(self._rows_current)
+        self._executing = False
+        self._rows_current = 0
+
+    def execute(self, statement, parameters=None, **kwargs):
+        self._finish_execute()
+        self._executing = True
+        result = self._cursor.execute(statement, parameters, **kwargs)
+        return self if result is not None else None
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._rows_current += 1
+        return row
+
+    def fetchmany(self, size: int = None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._rows_current += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._rows_current += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._rows_current += 1
+            yield row
+
+    def close(self):
+        self._finish_execute()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _PooledConnection:
+    """
+    Conexión prestada por OraclePool. Los cursores se crean con el fetch sizing
+    del pool (arraysize / prefetchrows). El resto se delega a oracledb.Connection.
+    """
+
+    def __init__(self, conn: oracledb.Connection, pool: "OraclePool"):
+        self._conn = conn
+        self._pool = pool
+
+    def cursor(self) -> _PooledCursor:
+        cursor = self._conn.cursor()
+        cursor.arraysize = self._pool.arraysize
+        cursor.prefetchrows = self._pool.prefetchrows
+        return _PooledCursor(cursor, self._pool)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class OraclePool:
+    """
+    Context manager para un pool de conexiones Oracle en thin mode (oracledb.create_pool).
+
+    Contraparte de OracleConnection para scripts que necesitan varias conexiones
+    concurrentes (workers en paralelo, consultas batch simultáneas). Expone:
+      - statement cache configurable por conexión (stmt_cache_size)
+      - fetch sizing por defecto de los cursores (arraysize / prefetchrows)
+      - acquire(): context manager thread-safe para tomar y devolver conexiones
+      - stats(): métricas de uso (espera al adquirir, filas por round-trip)
+
+    Cierra el pool automáticamente al salir del bloque `with`.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        user: str,
+        password: str,
+        min_size: int = 1,
+        max_size: int = 4,
+        increment: int = 1,
+        stmt_cache_size: int = 50,
+        arraysize: int = 1000,
+        prefetchrows: int = 1000,
+        wait_timeout_ms: int = 60000,
+        client_identifier: Optional[str] = None,
+    ):
+        """
+        Args:
+            dsn:             DSN de conexión Oracle (ej: "host:1521/service_name")
+            user:            Usuario Oracle
+            password:        Contraseña Oracle
+            min_size:        Conexiones abiertas al crear el pool
+            max_size:        Máximo de conexiones simultáneas
+            increment:       Conexiones que se abren cada vez que el pool crece
+            stmt_cache_size: Sentencias cacheadas por conexión (statement cache del driver)
+            arraysize:       Filas por round-trip en fetchall/fetchmany
+            prefetchrows:    Filas que se traen junto con la respuesta del execute
+            wait_timeout_ms: Espera máxima al adquirir si todas las conexiones están ocupadas
+            client_identifier: Si se indica, se asigna a cada conexión prestada
+                             (V$SESSION.CLIENT_IDENTIFIER) para identificar las sesiones del pool
+        """
+        _validate_credentials(dsn, user, password)
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Tamaño de pool inválido: min={min_size}, max={max_size}. "
+                "Debe cumplirse 0 <= min <= max y max >= 1."
+            )
+        self.dsn = _easy_connect(dsn)
+        self.user = user
+        self.password = password
+        self.min_size = min_size
+        self.max_size = max_size
+        self.increment = increment
+        self.stmt_cache_size = stmt_cache_size
+        self.arraysize = arraysize
+        self.prefetchrows = prefetchrows
+        self.wait_timeout_ms = wait_timeout_ms
+        self.client_identifier = client_identifier
+        self._pool: Optional[oracledb.ConnectionPool] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "acquires": 0,
+            "acquire_wait_total_s": 0.0,
+            "acquire_wait_max_s": 0.0,
+            "executes": 0,
+            "rows": 0,
+            "round_trips_est": 0,
+        }
+
+    def __enter__(self) -> "OraclePool":
+        self._pool = oracledb.create_pool(
+            user=self.user,
+            password=self.password,
+            dsn=self.dsn,
+            min=self.min_size,
+            max=self.max_size,
+            increment=self.increment,
+            stmtcachesize=self.stmt_cache_size,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=self.wait_timeout_ms,
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._pool:
+            self._pool.close(force=True)
+            self._pool = None
+        return False
+
+    @contextmanager
+    def acquire(self):
+        """
+        Toma una conexión del pool y la devuelve al salir del bloque `with`.
+
+        Es seguro usarlo desde varios threads a la vez: si todas las conexiones
+        están ocupadas, espera hasta wait_timeout_ms.
+        """
+        if self._pool is None:
+            raise RuntimeError("El pool Oracle no está abierto. Usa `with OraclePool(...) as pool:`.")
+        start = time.perf_counter()
+        conn = self._pool.acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats["acquires"] += 1
+            self._stats["acquire_wait_total_s"] += waited
+            self._stats["acquire_wait_max_s"] = max(self._stats["acquire_wait_max_s"], waited)
+        if self.client_identifier:
+            conn.client_identifier = self.client_identifier
+        try:
+            yield _PooledConnection(conn, self)
+        finally:
+            self._pool.release(conn)
+
+    def _record_execute(self, rows: int):
+        """
+        Registra una ejecución. Los round-trips se estiman con el fetch sizing:
+        1 por execute (que ya trae `prefetchrows` filas) + 1 por cada `arraysize` adicional.
+        """
+        extra_fetches = math.ceil(max(0, rows - self.prefetchrows) / self.arraysize) if self.arraysize else 0
+        with self._lock:
+            self._stats["executes"] += 1
+            self._stats["rows"] += rows
+            self._stats["round_trips_est"] += 1 + extra_fetches
+
+    def stats(self) -> dict:
+        """
+        Retorna las métricas de uso acumuladas del pool.
+
+        Returns:
+            Dict con acquires, acquire_wait_total_s, acquire_wait_avg_ms, acquire_wait_max_ms,
+            executes, rows, round_trips_est, rows_per_round_trip, opened, busy, max_size.
+        """
+        with self._lock:
+            data = dict(self._stats)
+        acquires = data["acquires"]
+        round_trips = data["round_trips_est"]
+        return {
+            "acquires": acquires,
+            "acquire_wait_total_s": round(data["acquire_wait_total_s"], 3),
+            "acquire_wait_avg_ms": round(data["acquire_wait_total_s"] / acquires * 1000, 2) if acquires else 0.0,
+            "acquire_wait_max_ms": round(data["acquire_wait_max_s"] * 1000, 2),
+            "executes": data["executes"],
+            "rows": data["rows"],
+            "round_trips_est": round_trips,
+            "rows_per_round_trip": round(data["rows"] / round_trips, 1) if round_trips else 0.0,
+            "opened": self._pool.opened if self._pool else 0,
+            "busy": self._pool.busy if self._pool else 0,
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,571 @@
+"""
+Benchmark offline de process_batch (billing_service y legacy_service).
+
+Genera un set sintético de órdenes, proformas, invoices y filas del legado
+(DCBT/OSER/CLHL/OAPV/DEMV) con sesgo de cuentas, y ejecuta los servicios contra:
+  - MongoDB: una colección en memoria (default) o un mongod local (--mongo-uri),
+    sembrado en una base desechable que se elimina al terminar.
+  - Oracle:  reemplazos en memoria de las funciones batch_find_* de
+    legacy_repository, servidos a través de un pool falso.
+
+No usa el .env ni se conecta a producción. Reporta OS/s, round-trips por lote
+(Mongo y Oracle) y memoria peak (tracemalloc) para validar optimizaciones del
+pipeline antes de ejecutarlas contra las bases reales.
+
+Uso:
+    python ./database-scripts/billing-initial-load/bench_process_batch.py
+    python ./database-scripts/billing-initial-load/bench_process_batch.py --orders 50000 --oracle-latency-ms 5
+    python ./database-scripts/billing-initial-load/bench_process_batch.py --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# ── Resolver raíz del repo (donde está common/) ──────────────────────────────
+current_path = Path(__file__).parent
+while current_path != current_path.parent:
+    if (current_path / "common").exists():
+        repo_root = current_path
+        break
+    current_path = current_path.parent
+else:
+    raise RuntimeError("No se encontró el directorio con el módulo 'common/'")
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(repo_root))
+sys.path.insert(0, str(script_dir))
+
+from bson import ObjectId
+
+import config
+from repositories import legacy_repository
+from services import billing_service, legacy_service
+
+SERVICES = {
+    "taxDocument": billing_service,
+    "legacy": legacy_service,
+}
+
+_COLLECTIONS = ("orders", "proformas", "proformaRequests", "invoices")
+
+
+# ============================================================================
+# DATOS SINTÉTICOS
+# ============================================================================
+
+
+def generate_dataset(
+    n_orders: int,
+    n_accounts: int,
+    skew: float,
+    seed: int,
+    orders_per_invoice: int = 5,
+    billed_ratio: float = 0.05,
+    no_tax_doc_ratio: float = 0.05,
+    no_dcbt_ratio: float = 0.05,
+    existing_proforma_ratio: float = 0.5,
+    existing_invoice_ratio: float = 0.2,
+) -> dict:
+    """
+    Genera documentos MongoDB y filas del legado coherentes entre sí.
+
+    Las cuentas siguen una distribución Zipf (peso 1 / rank^skew): con skew alto unas
+    pocas cuentas concentran la mayoría de las OS, como en producción.
+
+    Returns:
+        {"orders", "proformas", "invoices": listas de documentos,
+         "oracle": {"dcbt", "oser", "proforma_data", "order_series", "invoice_data"}}
+    """
+    rng = random.Random(seed)
+    accounts = [f"{76000000 + i}-{i % 10}" for i in range(n_accounts)]
+    weights = [1 / (rank + 1) ** skew for rank in range(n_accounts)]
+    day = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+    orders_by_account = {}
+    for i, account in enumerate(rng.choices(accounts, weights, k=n_orders)):
+        orders_by_account.setdefault(account, []).append(i)
+
+    orders, proformas, invoices = [], [], []
+    dcbt, oser, proforma_data, order_series, invoice_data = {}, {}, {}, {}, {}
+    factura_seq = 0
+
+    for account, indexes in orders_by_account.items():
+        for start in range(0, len(indexes), orders_per_invoice):
+            factura_seq += 1
+            dcbt_pf = str(5000000 + factura_seq)
+            dcbt_real = str(8000000 + factura_seq)
+            sii_folio = str(100000 + factura_seq)
+            created_at = day - timedelta(days=rng.randint(1, 60))
+            members = indexes[start: start + orders_per_invoice]
+
+            proforma_data[dcbt_pf] = {
+                "monobulto": len(members),
+                "padres": 0,
+                "hijas": 0,
+                "company_name": f"EMPRESA {account} SPA",
+                "valor_flete": rng.randint(1000, 50000),
+                "garantia_extendida": rng.randint(0, 5000),
+                "reintentos": rng.randint(0, 3000),
+                "created_at": created_at.isoformat(),
+                "updated_at": (created_at + timedelta(days=1)).isoformat(),
+                "dcbt_nmr_fac_real": dcbt_real,
+            }
+            invoice_data[dcbt_real] = {
+                "sii_folio": sii_folio,
+                "sii_document_path": f"https://docs.example.invalid/{sii_folio}.pdf",
+            }
+            order_series[dcbt_pf] = []
+
+            if rng.random() < existing_proforma_ratio:
+                proformas.append({
+                    "_id": ObjectId(),
+                    "account": account,
+                    "proformaSerie": f"EMPR_{created_at:%Y%m%d}_{dcbt_pf}",
+                    "serviceCharges": {"freight": 0, "extendedWarranty": 0, "retries": 0, "total": 0},
+                    "siiFolio": sii_folio,
+                    "createdAt": created_at,
+                })
+            if rng.random() < existing_invoice_ratio:
+                invoices.append({"_id": ObjectId(), "siiFolio": sii_folio, "type": "12"})
+
+            for i in members:
+                order_id = f"{900000000 + i}"
+                reference_order = str(3000000 + i)
+                order = {
+                    "_id": ObjectId(),
+                    "orderId": order_id,
+                    "referenceOrder": reference_order,
+                    "emissionDate": day + timedelta(seconds=rng.randint(0, 86399)),
+                    "seller": {"account": account},
+                    "billing": {"status": "BILLED"} if rng.random() < billed_ratio else {},
+                }
+                if rng.random() >= no_tax_doc_ratio:
+                    order["taxDocument"] = {
+                        "siiDocumentId": sii_folio,
+                        "createDate": created_at,
+                        "type": "33",
+                        "typeDesc": "FACTURA ELECTRONICA",
+                        "path": f"https://docs.example.invalid/{sii_folio}.pdf",
+                        "receiver": {"rut": account},
+                    }
+                orders.append(order)
+
+                oser[reference_order] = {
+                    "retries": rng.randint(0, 2000),
+                    "additional_charges": rng.randint(0, 1000),
+                }
+                if rng.random() >= no_dcbt_ratio:
+                    dcbt[reference_order] = {"dcbt_nmr_fac_pf": dcbt_pf, "dcbt_nmr_fac_real": dcbt_real}
+                    order_series[dcbt_pf].append(order_id)
+
+    orders.sort(key=lambda o: o["emissionDate"])
+    return {
+        "orders": orders,
+        "proformas": proformas,
+        "invoices": invoices,
+        "accounts": len(orders_by_account),
+        "oracle": {
+            "dcbt": dcbt,
+            "oser": oser,
+            "proforma_data": proforma_data,
+            "order_series": order_series,
+            "invoice_data": invoice_data,
+        },
+    }
+
+
+# ============================================================================
+# REEMPLAZO DE MONGODB EN MEMORIA
+# ============================================================================
+
+
+class _RoundTrips:
+    """Contador thread-safe de round-trips por operación."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_op = Counter()
+
+    def add(self, op: str, count: int = 1):
+        with self._lock:
+            self.by_op[op] += count
+
+    def total(self) -> int:
+        return sum(self.by_op.values())
+
+    def reset(self):
+        with self._lock:
+            self.by_op.clear()
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict) and "$in" in cond:
+            if value not in cond["$in"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return dict(doc)
+    out = {k: doc[k] for k, v in projection.items() if v and k in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        out["_id"] = doc["_id"]
+    return out
+
+
+def _apply_set(doc: dict, set_doc: dict) -> bool:
+    changed = False
+    for path, value in set_doc.items():
+        target = doc
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        if target.get(leaf) != value:
+            target[leaf] = value
+            changed = True
+    return changed
+
+
+class _MemoryCollection:
+    """Subconjunto de la API de pymongo.Collection usado por los repositorios."""
+
+    def __init__(self, name: str, round_trips: _RoundTrips, latency_s: float):
+        self.name = name
+        self.docs = []
+        self._by_order_id = {}
+        self._round_trips = round_trips
+        self._latency_s = latency_s
+
+    def _round_trip(self, op: str):
+        self._round_trips.add(f"{self.name}.{op}")
+        if self._latency_s:
+            time.sleep(self._latency_s)
+
+    def _add(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        if "orderId" in doc:
+            self._by_order_id[doc["orderId"]] = doc
+        return doc["_id"]
+
+    def find(self, query: dict, projection: dict = None, **kwargs):
+        self._round_trip("find")
+        return [_project(d, projection) for d in self.docs if _matches(d, query)]
+
+    def insert_one(self, doc: dict):
+        self._round_trip("insert")
+        return SimpleNamespace(inserted_id=self._add(doc))
+
+    def insert_many(self, docs: list, ordered: bool = True):
+        self._round_trip("insert")
+        return SimpleNamespace(inserted_ids=[self._add(d) for d in docs])
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        self._round_trip("bulk_write")
+        matched = modified = 0
+        for op in operations:
+            doc = self._by_order_id.get(op._filter.get("orderId"))
+            if doc is None:
+                continue
+            matched += 1
+            modified += _apply_set(doc, op._doc.get("$set", {}))
+        return SimpleNamespace(matched_count=matched, modified_count=modified)
+
+
+class _MemoryDatabase(dict):
+    def __init__(self, round_trips: _RoundTrips, latency_s: float):
+        super().__init__({name: _MemoryCollection(name, round_trips, latency_s) for name in _COLLECTIONS})
+
+
+# ============================================================================
+# REEMPLAZO DEL LEGADO ORACLE EN MEMORIA
+# ============================================================================
+
+
+class _LegacyStandIn:
+    """
+    Reemplazo de las funciones batch_find_* con el mismo contrato (cursor, claves) → dict.
+
+    Cada llamada cuenta los round-trips que haría la versión real según
+    ORACLE_LOOKUP_STRATEGY y duerme latency_s por cada uno.
+    """
+
+    def __init__(self, oracle_data: dict, round_trips: _RoundTrips, latency_s: float):
+        self._data = oracle_data
+        self._round_trips = round_trips
+        self._latency_s = latency_s
+        self._max_items = legacy_repository._MAX_ITEMS_PER_EXECUTE[config.ORACLE_LOOKUP_STRATEGY]
+
+    def _round_trip(self, name: str, keys: list):
+        count = math.ceil(len(keys) / self._max_items)
+        self._round_trips.add(name, count)
+        if self._latency_s:
+            time.sleep(self._latency_s * count)
+
+    def _by_key(self, name: str, table: str, keys: list) -> dict:
+        if not keys:
+            return {}
+        self._round_trip(name, keys)
+        rows = self._data[table]
+        return {k: copy.copy(rows[k]) for k in keys if k in rows}
+
+    def batch_find_dcbt(self, cursor, reference_orders: list) -> dict:
+        return self._by_key("dcbt", "dcbt", reference_orders)
+
+    def batch_find_oser(self, cursor, reference_orders: list) -> dict:
+        return self._by_key("oser", "oser", reference_orders)
+
+    def batch_find_proforma_data_bulk(self, cursor, facturas: list) -> dict:
+        return self._by_key("proforma_data", "proforma_data", facturas)
+
+    def batch_find_invoice_data(self, cursor, dcbt_nmr_fac_reals: list) -> dict:
+        return self._by_key("invoice_data", "invoice_data", dcbt_nmr_fac_reals)
+
+    def batch_find_order_series(self, cursor, facturas: list) -> dict:
+        if not facturas:
+            return {}
+        self._round_trip("order_series", facturas)
+        series = self._data["order_series"]
+        return {order_id: f for f in facturas for order_id in series.get(f, [])}
+
+
+class _StandInPool:
+    """Pool falso con la interfaz acquire() de OraclePool."""
+
+    class _Connection:
+        @contextmanager
+        def cursor(self):
+            yield None
+
+    def __init__(self):
+        self.acquires = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            self.acquires += 1
+        yield self._Connection()
+
+
+@contextmanager
+def _patched_legacy_repository(stand_in: _LegacyStandIn):
+    """Reemplaza temporalmente las funciones batch_find_* del repositorio real."""
+    names = [
+        "batch_find_dcbt",
+        "batch_find_oser",
+        "batch_find_proforma_data_bulk",
+        "batch_find_invoice_data",
+        "batch_find_order_series",
+    ]
+    originals = {name: getattr(legacy_repository, name) for name in names}
+    try:
+        for name in names:
+            setattr(legacy_repository, name, getattr(stand_in, name))
+        yield
+    finally:
+        for name, fn in originals.items():
+            setattr(legacy_repository, name, fn)
+
+
+# ============================================================================
+# MONGOD LOCAL (OPCIONAL)
+# ============================================================================
+
+
+def _register_command_counter(round_trips: _RoundTrips):
+    """Cuenta cada comando enviado por pymongo como un round-trip (debe ir antes de crear el cliente)."""
+    from pymongo import monitoring
+
+    class _CommandCounter(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name not in ("ping", "dropDatabase", "endSessions", "hello", "isMaster"):
+                round_trips.add(f"{event.command_name}")
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(_CommandCounter())
+
+
+def _seed(mongo_db, dataset: dict):
+    """Siembra la base (en memoria o mongod local) con una copia del set sintético."""
+    for name, docs in (("orders", dataset["orders"]), ("proformas", dataset["proformas"]), ("invoices", dataset["invoices"])):
+        if docs:
+            mongo_db[name].insert_many(copy.deepcopy(docs), ordered=False)
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+
+def _run_service(mode: str, dataset: dict, args, mongo_db, mongo_rt: _RoundTrips) -> dict:
+    service = SERVICES[mode]
+    oracle_rt = _RoundTrips()
+    stand_in = _LegacyStandIn(dataset["oracle"], oracle_rt, args.oracle_latency_ms / 1000)
+    pool = _StandInPool()
+    mongo_rt.reset()
+
+    statuses = Counter()
+    oracle_ms = Counter()
+    batches = 0
+    orders = dataset["orders"]
+
+    if not args.no_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with _patched_legacy_repository(stand_in):
+        for i in range(0, len(orders), args.batch_size):
+            batch = [dict(o) for o in orders[i: i + args.batch_size]]
+            results, write_stats = service.process_batch(batch, mongo_db, pool, args.dry_run)
+            batches += 1
+            statuses.update(r.get("status") for r in results)
+            oracle_ms.update(write_stats.get("oracle_ms") or {})
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if not args.no_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    processed = len(orders)
+    return {
+        "mode": mode,
+        "orders": processed,
+        "batches": batches,
+        "elapsed_s": round(elapsed, 3),
+        "orders_per_s": round(processed / elapsed, 1) if elapsed > 0 else None,
+        "mongo_round_trips_per_batch": round(mongo_rt.total() / batches, 2) if batches else 0,
+        "mongo_round_trips": dict(mongo_rt.by_op),
+        "oracle_round_trips_per_batch": round(oracle_rt.total() / batches, 2) if batches else 0,
+        "oracle_round_trips": dict(oracle_rt.by_op),
+        "oracle_acquires": pool.acquires,
+        "oracle_ms_avg_per_batch": {k: round(v / batches, 1) for k, v in oracle_ms.items()} if batches else {},
+        "peak_memory_mb": round(peak / 1024 / 1024, 1) if not args.no_memory else None,
+        "statuses": dict(statuses),
+    }
+
+
+def _print_report(dataset: dict, args, reports: list):
+    print()
+    print("=" * 65)
+    print("=== BENCHMARK process_batch (datos sintéticos) ===")
+    print(f"  OS              : {len(dataset['orders'])} en {dataset['accounts']} cuentas (skew {args.skew})")
+    print(f"  Tamaño lote     : {args.batch_size} | DRY_RUN: {args.dry_run} | lookup: {config.ORACLE_LOOKUP_STRATEGY}")
+    print(f"  MongoDB         : {args.mongo_uri or 'en memoria'} | latencia simulada {args.mongo_latency_ms} ms")
+    print(f"  Oracle          : en memoria | latencia simulada {args.oracle_latency_ms} ms/round-trip")
+    for r in reports:
+        print("-" * 65)
+        print(f"  [{r['mode']}]")
+        print(f"  Throughput      : {r['orders_per_s']} OS/s ({r['orders']} OS en {r['elapsed_s']} s, {r['batches']} lotes)")
+        print(f"  Mongo RT/lote   : {r['mongo_round_trips_per_batch']}  {r['mongo_round_trips']}")
+        print(f"  Oracle RT/lote  : {r['oracle_round_trips_per_batch']}  {r['oracle_round_trips']}")
+        if r["oracle_ms_avg_per_batch"]:
+            detail = ", ".join(f"{k} {v}ms" for k, v in r["oracle_ms_avg_per_batch"].items())
+            print(f"  Oracle ms/lote  : {detail}")
+        if r["peak_memory_mb"] is not None:
+            print(f"  Memoria peak    : {r['peak_memory_mb']} MB (tracemalloc)")
+        print(f"  Estados         : {r['statuses']}")
+    print("=" * 65)
+
+
+def _save_report(dataset: dict, args, reports: list):
+    logs_dir = Path(config.LOGS_DIR)
+    logs_dir = logs_dir if logs_dir.is_absolute() else script_dir / logs_dir
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    out = logs_dir / f"bench_process_batch_{datetime.now():%Y%m%d_%H%M%S}.json"
+    data = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k != "mongo_uri"},
+        "mongo": "mongod" if args.mongo_uri else "memory",
+        "oracle_lookup_strategy": config.ORACLE_LOOKUP_STRATEGY,
+        "accounts_with_orders": dataset["accounts"],
+        "reports": reports,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nReporte guardado en: {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de process_batch (billing-initial-load)")
+    parser.add_argument("--mode", choices=["all", *SERVICES], default="all", help="Servicio a medir (default: all)")
+    parser.add_argument("--orders", type=int, default=20000, help="OS sintéticas (default: 20000)")
+    parser.add_argument("--accounts", type=int, default=300, help="Cuentas sintéticas (default: 300)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Sesgo Zipf de OS por cuenta (default: 1.1)")
+    parser.add_argument("--orders-per-invoice", type=int, default=5, help="OS por factura del legado (default: 5)")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE, help=f"Tamaño de lote (default: {config.BATCH_SIZE})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dry-run", action="store_true", help="Ejecuta process_batch con dry_run=True")
+    parser.add_argument("--oracle-latency-ms", type=float, default=0, help="Latencia simulada por round-trip Oracle")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0, help="Latencia simulada por round-trip Mongo (solo en memoria)")
+    parser.add_argument("--mongo-uri", default="", help="mongod local de pruebas (default: Mongo en memoria)")
+    parser.add_argument("--mongo-db", default="billing_bench", help="Base desechable en --mongo-uri (se elimina al terminar)")
+    parser.add_argument("--no-memory", action="store_true", help="No medir memoria (tracemalloc agrega overhead)")
+    args = parser.parse_args()
+
+    if args.batch_size <= 0:
+        raise ValueError("--batch-size debe ser mayor que 0.")
+    if args.mongo_uri and (args.mongo_uri == config.MONGO_URI or args.mongo_db == config.MONGO_DATABASE):
+        raise ValueError(
+            "El benchmark siembra y elimina su base: --mongo-uri/--mongo-db no pueden apuntar a MONGO_URI/MONGO_DATABASE."
+        )
+
+    print(f"Generando datos sintéticos ({args.orders} OS, {args.accounts} cuentas)...")
+    dataset = generate_dataset(args.orders, args.accounts, args.skew, args.seed, args.orders_per_invoice)
+    modes = list(SERVICES) if args.mode == "all" else [args.mode]
+    mongo_rt = _RoundTrips()
+    reports = []
+
+    if args.mongo_uri:
+        from common.mongo.mongo_client import MongoConnection
+
+        _register_command_counter(mongo_rt)
+        with MongoConnection(uri=args.mongo_uri, database=args.mongo_db) as mongo_db:
+            try:
+                for mode in modes:
+                    mongo_db.client.drop_database(args.mongo_db)
+                    mongo_db["orders"].create_index("orderId")
+                    _seed(mongo_db, dataset)
+                    reports.append(_run_service(mode, dataset, args, mongo_db, mongo_rt))
+            finally:
+                mongo_db.client.drop_database(args.mongo_db)
+    else:
+        for mode in modes:
+            mongo_db = _MemoryDatabase(mongo_rt, args.mongo_latency_ms / 1000)
+            _seed(mongo_db, dataset)
+            reports.append(_run_service(mode, dataset, args, mongo_db, mongo_rt))
+
+    _print_report(dataset, args, reports)
+    _save_report(dataset, args, reports)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nInterrumpido por el usuario.")
+        sys.exit(130)
+    except ValueError as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
@@ -26,6 +26,40 @@ ORACLE_DSN = os.getenv("ORACLE_DSN", "")
 ORACLE_USER = os.getenv("ORACLE_USER", "")
 ORACLE_PASSWORD = os.getenv("ORACLE_PASSWORD", "")
 
+# Estrategia para bindear las claves en las consultas batch al legado:
+#   "collection" → un solo bind SYS.ODCIVARCHAR2LIST + TABLE(:1). SQL estable
+#                  (sin hard parse por cada largo de lote) y sin troceo a 1000.
+#   "in_list"    → IN (:1, :2, ...) en trozos de 1000. Útil para comparar el
+#                  costo de parseo o si el usuario no puede usar el tipo SYS.
+ORACLE_LOOKUP_STRATEGY = "collection"
+
+# Pool de conexiones Oracle (common.oracle.oracle_client.OraclePool).
+# ORACLE_POOL_MAX limita cuántas consultas al legado pueden correr en paralelo.
+ORACLE_POOL_MIN = 1
+ORACLE_POOL_MAX = 4
+
+# Sentencias cacheadas por conexión en el driver (evita re-enviar el SQL al servidor).
+ORACLE_STMT_CACHE_SIZE = 50
+
+# Fetch sizing de los cursores: filas por round-trip (arraysize) y filas que
+# vienen junto con la respuesta del execute (prefetchrows). Los batch_find_*
+# leen miles de filas con fetchall(); el default del driver (100/2) multiplica
+# los round-trips.
+ORACLE_ARRAYSIZE = 1000
+ORACLE_PREFETCH_ROWS = 1000
+
+# Snapshot local (SQLite) de las consultas batch al legado (ver extract_cache.py):
+#   "off"    → todas las consultas van a Oracle.
+#   "record" → consulta a Oracle solo lo que no esté en el snapshot y lo guarda.
+#   "replay" → solo lee del snapshot; no se conecta a Oracle (útil para DRY_RUN
+#              repetidos sin cargar producción).
+ORACLE_EXTRACT_CACHE = "off"
+ORACLE_EXTRACT_PATH = "./logs/oracle_extract.sqlite"
+
+# Antigüedad máxima del snapshot en horas (0 = sin límite). Vencido, se descarta
+# en "record" y se rechaza en "replay".
+ORACLE_EXTRACT_MAX_AGE_HOURS = 72
+
 # ============================================================================
 # CONFIGURACIÓN: EJECUCIÓN
 # ============================================================================
@@ -47,6 +81,86 @@ BATCH_SIZE = 1000
 # el tamaño de cada query y el uso de recursos en la base de datos.
 ACCOUNT_BATCH_SIZE = 500
 
+# Ajuste adaptativo de BATCH_SIZE y ACCOUNT_BATCH_SIZE (services/batch_tuner.py):
+# los valores de arriba son el punto de partida y durante la ejecución se ajustan
+# para acercarse a la latencia objetivo, dentro de [MIN, MAX]. El lote de OS se
+# ajusta después de cada lote; el de cuentas, entre días. Las decisiones se imprimen
+# y quedan en summary.batch_tuning del log.
+# ADAPTIVE_BATCHING = False → tamaños fijos.
+ADAPTIVE_BATCHING = True
+BATCH_SIZE_MIN = 200
+BATCH_SIZE_MAX = 5000
+BATCH_TARGET_MS = 2000            # duración objetivo de process_batch por lote
+ACCOUNT_BATCH_SIZE_MIN = 50
+ACCOUNT_BATCH_SIZE_MAX = 2000
+ACCOUNT_BATCH_TARGET_S = 60       # duración objetivo por lote de cuentas (escaneo + proceso)
+
+# Estimación del total de OS del día para el % de progreso (services/progress_estimator.py).
+# Un count_documents completo del día cuesta casi lo mismo que el escaneo:
+#   "exact"      → count_documents completo antes de escanear (bloquea el inicio del día).
+#   "concurrent" → conteo exacto por lote de cuentas en segundo plano, en paralelo al escaneo.
+#   "index"      → conteo solo-índice (seller.account + emissionDate) por lote de cuentas
+#                  antes de escanearlo. Cota superior: no filtra billing/taxDocument.
+#   "sample"     → conteo exacto de una muestra de cuentas proyectado al total.
+#   "off"        → sin total; solo OS procesadas.
+# Se puede sobrescribir por ejecución con --progress.
+PROGRESS_ESTIMATE = "concurrent"
+PROGRESS_SAMPLE_RATIO = 0.1     # fracción de cuentas contadas en "sample"
+PROGRESS_COUNT_WORKERS = 2      # hilos de conteo en "concurrent"
+
+# Escaneo particionado de días grandes (services/order_scanner.py): cada lote de
+# cuentas se divide en sub-rangos de emissionDate de ~SCAN_PARTITION_TARGET OS
+# (estimadas con conteos solo-índice por tramo del día) leídos con cursores en paralelo.
+# SCAN_PARALLEL_CURSORS = 1 → un solo cursor por lote de cuentas, sin conteos previos.
+# Días con menos de SCAN_PARTITION_TARGET OS (total de progreso o un conteo del lote)
+# no cuentan los SCAN_PARTITION_SLOTS tramos.
+SCAN_PARALLEL_CURSORS = 4
+SCAN_PARTITION_TARGET = 50000   # OS por sub-rango; días más chicos usan un solo cursor
+SCAN_PARTITION_SLOTS = 24       # tramos del día contados para dimensionar los sub-rangos
+SCAN_QUEUE_SIZE = 5000          # OS en tránsito entre los cursores y el procesamiento
+
+# Escritor en segundo plano (services/mongo_writer.py): los updates de billing y las
+# invoices nuevas de cada lote se encolan y un hilo los escribe en bulk_write /
+# insert_many de hasta MONGO_WRITER_MAX_OPS operaciones, sin bloquear el lote siguiente.
+# Las proformas siguen siendo síncronas. Sin efecto en DRY_RUN.
+# MONGO_ASYNC_WRITER = False → cada lote escribe y espera el acknowledge como antes.
+MONGO_ASYNC_WRITER = True
+MONGO_WRITER_MAX_OPS = 5000        # operaciones por bulk_write / insert_many
+MONGO_WRITER_QUEUE_BATCHES = 4     # lotes encolados como máximo (backpressure)
+MONGO_WRITER_MAX_WAIT_MS = 500     # espera máxima antes de escribir un lote incompleto
+# Write concern de las escrituras del escritor; None = el de la conexión.
+# Ejemplo: {"w": 1, "j": False}
+MONGO_BULK_WRITE_CONCERN = None
+
+# Verificación previa de índices (services/index_advisor.py): al inicio de cada modo
+# revisa index_information() y el explain de cada forma de consulta (cursor de orders
+# con hint, conteos, proformas por cuenta, invoices por siiFolio) y registra el uso de
+# índices ($indexStats) en summary.index_check del log.
+#   "warn"   → imprime los problemas; en terminal interactiva pide confirmar para seguir.
+#              Un índice faltante de una consulta con hint (MISSING) igual detiene la
+#              ejecución: el cursor fallaría a mitad del rango.
+#   "strict" → con algún problema (índice faltante, COLLSCAN, otro índice) no ejecuta.
+#   "off"    → sin verificación.
+MONGO_INDEX_CHECK = "warn"
+
+# Modo legacy: índice de la ejecución con los pares (orderId, DCBT_NMR_FAC_PF) ya
+# escritos con proforma (services/applied_index.py). Las OS hermanas de una factura
+# que reaparece en otros lotes/días no se reescriben y su serie no se vuelve a
+# consultar en Oracle. LEGACY_DEDUPE_MAX_KEYS limita la memoria (~150 bytes por par).
+LEGACY_DEDUPE = True
+LEGACY_DEDUPE_MAX_KEYS = 5_000_000
+
+# Estimación de carga (run.py --estimate, modes/estimate.py): conteos solo-índice en
+# ESTIMATE_DAYS_SAMPLE días (0 = todos), conteos exactos en ESTIMATE_EXACT_COUNTS pares
+# (día, lote de cuentas) y process_batch en DRY_RUN sobre ESTIMATE_SAMPLE_ORDERS OS.
+# La escritura en MongoDB no se mide (no se escribe): se usa ESTIMATE_WRITE_MS_PER_ORDER,
+# que puede tomarse de summary.mongo_writer de una ejecución real anterior.
+ESTIMATE_DAYS_SAMPLE = 7
+ESTIMATE_EXACT_COUNTS = 20
+ESTIMATE_SAMPLE_ORDERS = 2000
+ESTIMATE_WRITE_MS_PER_ORDER = 0.5
+ESTIMATE_WORKERS = [1, 2, 4, 8]   # procesos en paralelo para proyectar el tiempo total
+
 # ============================================================================
 # CONFIGURACIÓN: DRY_RUN
 # ============================================================================
@@ -72,3 +186,16 @@ LOGS_DIR = "./logs"
 # Si es True, imprime en consola cada query Oracle y MongoDB antes de ejecutarla.
 # Útil para depuración. No activar en producción con volúmenes grandes.
 QUERY_LOGGING = False
+
+# Profiler de queries (query_logger.py): registra por forma de query (SQL normalizado
+# o colección + operación + filtro sin valores) llamadas, duración, filas/documentos,
+# bytes y parámetros. El log incluye las QUERY_PROFILE_TOP_N formas con más tiempo
+# total en summary.query_profile.
+QUERY_PROFILE = False
+QUERY_PROFILE_TOP_N = 15
+# explain() de los cursores de orders en la primera ejecución de cada forma:
+#   "off" | "queryPlanner" (solo plan, barato) | "executionStats" (ejecuta la query completa)
+QUERY_PROFILE_EXPLAIN = "off"
+# Estadísticas de V$SQL (buffer gets, lecturas, tiempo por ejecución) en la primera
+# ejecución de cada sentencia Oracle. Requiere acceso a V$SESSION / V$SQL.
+QUERY_PROFILE_ORACLE_STATS = False
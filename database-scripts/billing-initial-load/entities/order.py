@@ -321,6 +321,9 @@ def build_invoice_legacy(
         ],
         "isLegacy": True,
     }
+
+
+def build_invoice(order: dict, proforma_doc: dict | None) -> dict:
     """
     Construye el documento para insertar en la colección invoices.
 
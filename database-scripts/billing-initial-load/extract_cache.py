@@ -0,0 +1,220 @@
+"""
+Snapshot local (SQLite) de las consultas batch al legado Oracle.
+
+Activar con ORACLE_EXTRACT_CACHE en config.py:
+    "off"    → sin snapshot, todas las consultas van a Oracle.
+    "record" → lee del snapshot lo que ya exista y consulta a Oracle solo las claves
+               faltantes, guardando el resultado (incluye claves sin filas).
+    "replay" → lee solo del snapshot; no abre conexiones a Oracle. Una clave que no
+               esté en el snapshot hace fallar el lote con un error explícito.
+
+El snapshot se guarda por consulta (nombre de la función batch_find_*) y clave de
+entrada, así que sirve para cualquier rango de fechas o set de cuentas cuyas
+órdenes ya se hayan consultado al menos una vez en modo "record".
+
+Todas las lecturas/escrituras ocurren en el hilo principal (run_concurrent_lookups
+consulta el snapshot antes de despachar los hilos y guarda al recibir resultados).
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+MODES = ("off", "record", "replay")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        name  TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS extract (
+        lookup TEXT NOT NULL,
+        key    TEXT NOT NULL,
+        rows   TEXT NOT NULL,
+        PRIMARY KEY (lookup, key)
+    ) WITHOUT ROWID;
+"""
+
+# SQLite limita la cantidad de parámetros por sentencia (999 en builds antiguos)
+_MAX_KEYS_PER_SELECT = 900
+
+_state = {
+    "conn": None,
+    "mode": "off",
+    "path": None,
+    "created_at": None,
+    "source_dsn": None,
+    "hits": 0,
+    "misses": 0,
+    "stored": 0,
+}
+
+
+def _read_meta(conn) -> dict:
+    return dict(conn.execute("SELECT name, value FROM meta").fetchall())
+
+
+def _snapshot_age_hours(created_at: str) -> float:
+    created = datetime.fromisoformat(created_at)
+    return (datetime.now(timezone.utc) - created).total_seconds() / 3600
+
+
+@contextmanager
+def open_snapshot(path, mode: str, max_age_hours: float, source_dsn: str = ""):
+    """
+    Abre el snapshot para la duración de la ejecución (no-op si mode == "off").
+
+    Un snapshot más antiguo que max_age_hours (0 = sin límite) se descarta en modo
+    "record" y se rechaza en modo "replay".
+
+    Raises:
+        ValueError: si el modo no es válido, o en "replay" si el snapshot no existe
+                    o está vencido.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Modo de snapshot inválido: '{mode}'. Valores permitidos: {', '.join(MODES)}.")
+    if mode == "off":
+        yield
+        return
+
+    path = str(path)
+    exists = os.path.exists(path)
+    if mode == "replay" and not exists:
+        raise ValueError(
+            f"No existe el snapshot Oracle: {path}\n"
+            "  Ejecuta primero con ORACLE_EXTRACT_CACHE = \"record\"."
+        )
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        meta = _read_meta(conn)
+        created_at = meta.get("created_at")
+
+        if created_at and max_age_hours > 0:
+            age = _snapshot_age_hours(created_at)
+            if age > max_age_hours:
+                if mode == "replay":
+                    raise ValueError(
+                        f"El snapshot Oracle tiene {age:.1f} h (máximo ORACLE_EXTRACT_MAX_AGE_HOURS = "
+                        f"{max_age_hours} h): {path}\n"
+                        "  Regenéralo con ORACLE_EXTRACT_CACHE = \"record\"."
+                    )
+                print(f"  Snapshot Oracle vencido ({age:.1f} h): se descarta y se vuelve a poblar.")
+                conn.execute("DELETE FROM extract")
+                conn.execute("DELETE FROM meta")
+                created_at = None
+
+        if not created_at:
+            if mode == "replay":
+                raise ValueError(f"El snapshot Oracle está vacío: {path}")
+            created_at = datetime.now(timezone.utc).isoformat()
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [("created_at", created_at), ("source_dsn", source_dsn)],
+            )
+            conn.commit()
+
+        _state.update(
+            conn=conn,
+            mode=mode,
+            path=path,
+            created_at=created_at,
+            source_dsn=_read_meta(conn).get("source_dsn"),
+            hits=0,
+            misses=0,
+            stored=0,
+        )
+        yield
+    finally:
+        conn.commit()
+        conn.close()
+        _state["conn"] = None
+
+
+def lookup(name: str, keys: list) -> tuple[dict, list]:
+    """
+    Busca en el snapshot las claves de una consulta batch.
+
+    Returns:
+        Tupla (resultado combinado de las claves encontradas, claves faltantes).
+        Con el snapshot apagado retorna ({}, keys).
+
+    Raises:
+        ValueError: en modo "replay" si alguna clave no está en el snapshot.
+    """
+    conn = _state["conn"]
+    if conn is None or not keys:
+        return {}, keys
+
+    found = {}
+    seen = set()
+    unique_keys = list(dict.fromkeys(str(k) for k in keys))
+    for i in range(0, len(unique_keys), _MAX_KEYS_PER_SELECT):
+        chunk = unique_keys[i: i + _MAX_KEYS_PER_SELECT]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = conn.execute(
+            f"SELECT key, rows FROM extract WHERE lookup = ? AND key IN ({placeholders})",
+            [name, *chunk],
+        ).fetchall()
+        for key, payload in rows:
+            seen.add(key)
+            found.update(json.loads(payload))
+
+    missing = [k for k in keys if str(k) not in seen]
+    _state["hits"] += len(seen)
+    if missing and _state["mode"] == "replay":
+        raise ValueError(
+            f"El snapshot Oracle no tiene {len(missing)} claves de {name} "
+            f"(ej: {missing[0]}). Ejecuta con ORACLE_EXTRACT_CACHE = \"record\" para este rango."
+        )
+    _state["misses"] += len(missing)
+    return found, missing
+
+
+def store(name: str, keys: list, result: dict, key_of=None) -> None:
+    """
+    Guarda en el snapshot el resultado de una consulta batch, agrupado por clave de entrada.
+
+    Las claves sin filas se guardan vacías para no volver a consultarlas.
+
+    Args:
+        key_of: función (clave_resultado, valor) → clave de entrada, para consultas cuyo
+                resultado no está indexado por la clave consultada. Default: la clave.
+    """
+    conn = _state["conn"]
+    if conn is None or not keys:
+        return
+
+    grouped = {str(k): {} for k in keys}
+    for result_key, value in result.items():
+        input_key = key_of(result_key, value) if key_of else result_key
+        grouped.setdefault(str(input_key), {})[result_key] = value
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO extract (lookup, key, rows) VALUES (?, ?, ?)",
+        [(name, key, json.dumps(rows, default=str)) for key, rows in grouped.items()],
+    )
+    conn.commit()
+    _state["stored"] += len(grouped)
+
+
+def is_replay() -> bool:
+    return _state["conn"] is not None and _state["mode"] == "replay"
+
+
+def stats() -> dict | None:
+    """Resumen del uso del snapshot en la ejecución (None si está apagado)."""
+    if _state["path"] is None:
+        return None
+    return {
+        "mode": _state["mode"],
+        "path": _state["path"],
+        "created_at": _state["created_at"],
+        "source_dsn": _state["source_dsn"],
+        "keys_from_snapshot": _state["hits"],
+        "keys_from_oracle": _state["misses"],
+        "keys_stored": _state["stored"],
+    }
@@ -1,28 +1,46 @@
 """
-Utilidad: extrae datos desde un log de billing-initial-load.
+Utilidad: extrae datos desde uno o varios logs de billing-initial-load.
 
-Genera una carpeta con el nombre del log dentro de logs/ y deposita ahí:
+Genera una carpeta dentro de logs/ (con el nombre del log, o extract_<timestamp> si
+son varios) y deposita ahí:
   - proforma_series.txt      → proformaSeries únicas, ordenadas
   - sii_folios.txt           → siiFolios únicos, ordenados
   - accounts.txt             → cuentas únicas, ordenadas
   - dcbt_nmr_fac_pf.txt      → números de proforma Oracle únicos, ordenados
   - dcbt_nmr_fac_real.txt    → números de factura real Oracle únicos, ordenados
   - order_ids.json           → array con todos los orderIds procesados
+  - by_day.csv / by_account.csv → (opcional, --by-day / --by-account) resultados por status
+
+Los resultados se leen de a uno (sin json.load del log completo): la memoria depende
+de la cantidad de valores únicos, no del tamaño del log. También acepta el spool
+JSONL (*.results.jsonl.part) que queda en logs/ si una ejecución se interrumpe.
 
 Uso:
     python ./database-scripts/billing-initial-load/extract_log.py
+    python ./database-scripts/billing-initial-load/extract_log.py logs/a.json logs/b.json --by-day --by-account
 """
 
+import argparse
+import csv
 import json
+from collections import Counter, defaultdict
+from datetime import datetime
 from pathlib import Path
 
 script_dir = Path(__file__).parent
 logs_dir = script_dir / "logs"
 
+_READ_CHUNK = 1 << 20          # 1 MB por lectura del log
+_RESULTS_KEY = '"results":'
+
 
-def pick_log_file() -> Path:
-    """Muestra los logs disponibles y permite seleccionar uno o usar el más reciente."""
-    logs = sorted(logs_dir.glob("billing-initial-load_*.json"), reverse=True)
+def pick_log_files() -> list[Path]:
+    """Muestra los logs disponibles y permite seleccionar uno o varios, o usar el más reciente."""
+    logs = sorted(
+        [*logs_dir.glob("billing-initial-load_*.json"), *logs_dir.glob("billing-initial-load_*.results.jsonl.part")],
+        key=lambda p: p.name,
+        reverse=True,
+    )
     if not logs:
         raise FileNotFoundError(f"No se encontraron logs en: {logs_dir}")
 
@@ -32,69 +50,176 @@ def pick_log_file() -> Path:
         print(f"  [{i}] {log.name}")
 
     print(f"\n  [Enter] Usar el más reciente: {logs[0].name}")
-    resp = input("\nSelecciona el número del log: ").strip()
+    resp = input("\nSelecciona el número del log (varios separados por coma): ").strip()
 
     if not resp:
-        return logs[0]
+        return [logs[0]]
     try:
-        idx = int(resp)
-        if 0 <= idx < len(logs):
-            return logs[idx]
-        print("Índice fuera de rango, usando el más reciente.")
-        return logs[0]
+        indexes = [int(part) for part in resp.split(",") if part.strip()]
     except ValueError:
         print("Entrada inválida, usando el más reciente.")
-        return logs[0]
+        return [logs[0]]
+    selected = [logs[idx] for idx in indexes if 0 <= idx < len(logs)]
+    if len(selected) < len(indexes):
+        print("Índices fuera de rango ignorados.")
+    return selected or [logs[0]]
+
+
+# ============================================================================
+# LECTURA INCREMENTAL DE RESULTADOS
+# ============================================================================
 
 
-def extract(log_file: Path):
-    print(f"\nLeyendo: {log_file.name} ...")
+def _iter_jsonl(log_file: Path):
+    with open(log_file, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _iter_json_results(log_file: Path):
+    """
+    Itera los elementos de "results" de un log JSON decodificándolos de a uno.
 
+    Lee el archivo por bloques hasta la clave "results" (última del log) y luego
+    decodifica cada entrada del array con raw_decode, pidiendo más bloques solo
+    cuando una entrada queda cortada al final del buffer.
+    """
+    decoder = json.JSONDecoder()
     with open(log_file, encoding="utf-8") as f:
-        data = json.load(f)
+        buf = ""
+        pos = -1
+        while pos < 0:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                return
+            # Conservar la cola por si la clave quedó partida entre bloques
+            buf = buf[-len(_RESULTS_KEY):] + chunk
+            pos = buf.find(_RESULTS_KEY)
+        buf = buf[pos + len(_RESULTS_KEY):].lstrip()
+        while not buf:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                raise ValueError(f"Log truncado: {log_file.name}")
+            buf = chunk.lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"Formato inesperado en {log_file.name}: 'results' no es un array.")
+        buf = buf[1:]
+
+        idx = 0
+        eof = False
+        while True:
+            # Saltar espacios y separadores; el buffer se recorre por índice y solo se
+            # recorta al pedir otro bloque (evita copiar el buffer por cada entrada)
+            while idx < len(buf) and buf[idx] in " \t\r\n,":
+                idx += 1
+            if idx < len(buf) and buf[idx] == "]":
+                return
+            try:
+                if idx >= len(buf):
+                    raise json.JSONDecodeError("buffer vacío", buf, idx)
+                entry, end = decoder.raw_decode(buf, idx)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Log truncado: {log_file.name}")
+                chunk = f.read(_READ_CHUNK)
+                eof = not chunk
+                buf = buf[idx:] + chunk
+                idx = 0
+                continue
+            yield entry
+            idx = end
+
 
-    results = data.get("results", [])
-    if not results:
-        print("El log no contiene resultados.")
-        return
+def iter_results(log_file: Path):
+    """Itera las entradas de results de un log JSON o de un spool JSONL."""
+    if log_file.name.endswith((".jsonl", ".jsonl.part")):
+        return _iter_jsonl(log_file)
+    return _iter_json_results(log_file)
+
+
+# ============================================================================
+# EXTRACCIÓN
+# ============================================================================
+
+
+def _write_aggregates(path: Path, key_label: str, counts: dict):
+    """Escribe un CSV con una fila por clave y una columna por status."""
+    statuses = sorted({status for per_status in counts.values() for status in per_status})
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([key_label, "total", *statuses])
+        for key in sorted(counts):
+            per_status = counts[key]
+            writer.writerow([key, sum(per_status.values()), *(per_status.get(s, 0) for s in statuses)])
+
+
+def extract(log_files: list[Path], by_day: bool = False, by_account: bool = False):
+    if len(log_files) == 1:
+        out_dir = log_files[0].parent / log_files[0].name.split(".")[0]
+    else:
+        out_dir = logs_dir / f"extract_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    out_dir.mkdir(parents=True, exist_ok=True)
 
     proforma_series = set()
     sii_folios = set()
     accounts = set()
     dcbt_numbers = set()
     dcbt_real_numbers = set()
-    order_ids = []
+    day_counts = defaultdict(Counter)
+    account_counts = defaultdict(Counter)
+    total_entries = 0
+    order_id_count = 0
+
+    # order_ids.json se escribe a medida que se leen los resultados
+    with open(out_dir / "order_ids.json", "w", encoding="utf-8") as order_ids_file:
+        order_ids_file.write("[")
+        for log_file in log_files:
+            print(f"\nLeyendo: {log_file.name} ...")
+            log_entries = 0
+            for entry in iter_results(log_file):
+                log_entries += 1
+                billing = entry.get("billing_applied") or {}
+
+                serie = billing.get("proformaSerie")
+                if serie:
+                    proforma_series.add(str(serie))
 
-    for entry in results:
-        billing = entry.get("billing_applied") or {}
+                folio = billing.get("siiFolio")
+                if folio:
+                    sii_folios.add(str(folio))
 
-        serie = billing.get("proformaSerie")
-        if serie:
-            proforma_series.add(str(serie))
+                account = entry.get("account")
+                if account:
+                    accounts.add(str(account))
 
-        folio = billing.get("siiFolio")
-        if folio:
-            sii_folios.add(str(folio))
+                dcbt = entry.get("dcbt_nmr_fac_pf")
+                if dcbt:
+                    dcbt_numbers.add(str(dcbt))
 
-        account = entry.get("account")
-        if account:
-            accounts.add(str(account))
+                dcbt_real = entry.get("dcbt_nmr_fac_real")
+                if dcbt_real:
+                    dcbt_real_numbers.add(str(dcbt_real))
 
-        dcbt = entry.get("dcbt_nmr_fac_pf")
-        if dcbt:
-            dcbt_numbers.add(str(dcbt))
+                order_id = entry.get("orderId")
+                if order_id:
+                    order_ids_file.write(",\n  " if order_id_count else "\n  ")
+                    order_ids_file.write(json.dumps(str(order_id), ensure_ascii=False))
+                    order_id_count += 1
 
-        dcbt_real = entry.get("dcbt_nmr_fac_real")
-        if dcbt_real:
-            dcbt_real_numbers.add(str(dcbt_real))
+                status = entry.get("status") or "UNKNOWN"
+                if by_day:
+                    day_counts[str(entry.get("emissionDate") or "")[:10] or "sin_fecha"][status] += 1
+                if by_account:
+                    account_counts[str(account or "sin_cuenta")][status] += 1
 
-        order_id = entry.get("orderId")
-        if order_id:
-            order_ids.append(str(order_id))
+            print(f"  {log_entries} resultados")
+            total_entries += log_entries
+        order_ids_file.write("\n]" if order_id_count else "]")
 
-    # Carpeta de salida: logs/<stem del log>/
-    out_dir = log_file.parent / log_file.stem
-    out_dir.mkdir(exist_ok=True)
+    if not total_entries:
+        print("Los logs no contienen resultados.")
 
     files = {
         "proforma_series.txt":   sorted(proforma_series),
@@ -107,24 +232,37 @@ def extract(log_file: Path):
     for filename, values in files.items():
         (out_dir / filename).write_text("\n".join(values), encoding="utf-8")
 
-    (out_dir / "order_ids.json").write_text(
-        json.dumps(order_ids, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    if by_day:
+        _write_aggregates(out_dir / "by_day.csv", "day", day_counts)
+    if by_account:
+        _write_aggregates(out_dir / "by_account.csv", "account", account_counts)
 
-    print(f"\n  Carpeta de salida: logs/{log_file.stem}/")
+    print(f"\n  Carpeta de salida: logs/{out_dir.name}/")
     print(f"  proformaSeries únicas  : {len(proforma_series):>6}  →  proforma_series.txt")
     print(f"  siiFolios únicos       : {len(sii_folios):>6}  →  sii_folios.txt")
     print(f"  Cuentas únicas         : {len(accounts):>6}  →  accounts.txt")
     print(f"  DCBT NMR FAC PF únicos : {len(dcbt_numbers):>6}  →  dcbt_nmr_fac_pf.txt")
     print(f"  DCBT NMR FAC REAL únicos:{len(dcbt_real_numbers):>5}  →  dcbt_nmr_fac_real.txt")
-    print(f"  OrderIds               : {len(order_ids):>6}  →  order_ids.json")
+    print(f"  OrderIds               : {order_id_count:>6}  →  order_ids.json")
+    if by_day:
+        print(f"  Días                   : {len(day_counts):>6}  →  by_day.csv")
+    if by_account:
+        print(f"  Cuentas (agregado)     : {len(account_counts):>6}  →  by_account.csv")
     print()
 
 
 def main():
-    log_file = pick_log_file()
-    extract(log_file)
+    parser = argparse.ArgumentParser(description="Extrae datos desde logs de billing-initial-load")
+    parser.add_argument("logs", nargs="*", type=Path, help="Logs a procesar (default: selección interactiva)")
+    parser.add_argument("--by-day", action="store_true", help="Genera by_day.csv (resultados por día y status)")
+    parser.add_argument("--by-account", action="store_true", help="Genera by_account.csv (resultados por cuenta y status)")
+    args = parser.parse_args()
+
+    log_files = args.logs or pick_log_files()
+    missing = [str(p) for p in log_files if not p.is_file()]
+    if missing:
+        raise FileNotFoundError(f"No se encontraron los logs: {', '.join(missing)}")
+    extract(log_files, by_day=args.by_day, by_account=args.by_account)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+"""
+Estimación rápida de la carga de una ejecución (run.py --estimate), sin escrituras.
+
+Reemplaza el uso de DRY_RUN + DRY_RUN_LIMIT para dimensionar una ejecución REAL:
+en vez de procesar OS de todos los días, mide una muestra y proyecta.
+
+Flujo:
+    1. Conteos solo-índice (seller.account + emissionDate) por día y lote de cuentas,
+       en ESTIMATE_DAYS_SAMPLE días repartidos en el rango (o todos).
+    2. Conteo exacto con el filtro completo del modo en ESTIMATE_EXACT_COUNTS pares
+       (día, lote de cuentas) → proporción de candidatas sobre el conteo de índice.
+    3. Lectura de una muestra de hasta ESTIMATE_SAMPLE_ORDERS OS candidatas repartida
+       entre esos pares (costo de escaneo por OS).
+    4. process_batch en DRY_RUN sobre la muestra: tasas de DCBT/proformas/invoices
+       encontradas vs. a crear y costo por OS de las consultas Oracle + MongoDB.
+    5. Proyección de OS, proformas e invoices a crear y del tiempo total con
+       ESTIMATE_WORKERS procesos en paralelo. Reporte en consola y en
+       logs/estimate_<modo>_<timestamp>.json.
+"""
+
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+_SCRIPT_DIR = Path(__file__).parent.parent  # billing-initial-load/
+
+# CLIENT_IDENTIFIER de las sesiones Oracle del pool
+_ORACLE_CLIENT_ID = f"billing-initial-load-estimate-{os.getpid()}"
+
+import config
+import extract_cache
+from common.mongo.mongo_client import MongoConnection
+from modes import shared
+from repositories import order_repository
+from repositories.order_repository import ACCOUNT_EMISSION_INDEX, COLLECTION_NAME as ORDERS_COLLECTION
+from services import billing_service, legacy_service
+
+SERVICES = {
+    "taxDocument": billing_service,
+    "legacy": legacy_service,
+}
+
+_PROJECTION = {
+    "orderId": 1,
+    "emissionDate": 1,
+    "referenceOrder": 1,
+    "seller.account": 1,
+    "taxDocument": 1,
+    "billing": 1,
+}
+
+
+# ============================================================================
+# UTILIDADES
+# ============================================================================
+
+
+def _chunks(lst: list, size: int):
+    """Divide una lista en sublistas de hasta `size` elementos."""
+    for i in range(0, len(lst), size):
+        yield lst[i: i + size]
+
+
+def _day_ranges(start_date: str, end_date: str):
+    """Genera tuplas (day_start UTC, day_end UTC) para cada día del rango."""
+    current = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    end = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    while current < end:
+        yield current, current + timedelta(days=1)
+        current += timedelta(days=1)
+
+
+def _resolve_path(relative_path: str) -> Path:
+    p = Path(relative_path)
+    return p if p.is_absolute() else _SCRIPT_DIR / relative_path
+
+
+def _sample_days(days: list, n: int) -> list:
+    """n días repartidos uniformemente en el rango (todos si n = 0 o n >= días)."""
+    if n <= 0 or n >= len(days):
+        return days
+    step = len(days) / n
+    return [days[int(i * step)] for i in range(n)]
+
+
+def _candidate_filter(mode_name: str, accounts: list, day_start, day_end) -> dict:
+    """Filtro de OS candidatas del modo (el mismo que usan los cursores de cada modo)."""
+    query = {
+        "emissionDate": {"$gte": day_start, "$lt": day_end},
+        "billing.status": {"$ne": "BILLED"},
+        "seller.account": {"$in": accounts},
+    }
+    if mode_name == "taxDocument":
+        query["taxDocument"] = {"$exists": True, "$ne": None}
+    return query
+
+
+def _fmt_duration(seconds: float) -> str:
+    h, rem = divmod(int(seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def _rate(part: int, total: int) -> float:
+    return part / total if total else 0.0
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+
+def run(mode_name: str):
+    """Estima la carga del modo `mode_name` para el rango y cuentas ya recopilados por run.py."""
+    service = SERVICES[mode_name]
+    days = list(_day_ranges(config.START_DATE, config.END_DATE))
+    sampled_days = _sample_days(days, config.ESTIMATE_DAYS_SAMPLE)
+    account_batches = list(_chunks(config.ACCOUNTS_FILTER, config.ACCOUNT_BATCH_SIZE))
+    rng = random.Random(f"{config.START_DATE}-{config.END_DATE}")
+
+    print("=" * 65)
+    print(f"=== ESTIMACIÓN: billing-initial-load [{mode_name}] ===")
+    print("=" * 65)
+    print(f"  Rango            : {config.START_DATE} → {config.END_DATE} ({len(days)} días, {len(sampled_days)} muestreados)")
+    print(f"  Cuentas          : {len(config.ACCOUNTS_FILTER)} en {len(account_batches)} lotes de {config.ACCOUNT_BATCH_SIZE}")
+    print(f"  Muestra          : {config.ESTIMATE_EXACT_COUNTS} conteos exactos | hasta {config.ESTIMATE_SAMPLE_ORDERS} OS")
+    print("  Sin escrituras (process_batch en DRY_RUN sobre la muestra)")
+    print("=" * 65)
+
+    snapshot_path = _resolve_path(config.ORACLE_EXTRACT_PATH)
+    if config.ORACLE_EXTRACT_CACHE != "off":
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    oracle_pool_cm = shared.open_oracle_pool(_ORACLE_CLIENT_ID)
+
+    started = time.monotonic()
+    with MongoConnection(uri=config.MONGO_URI, database=config.MONGO_DATABASE) as mongo_db:
+        with extract_cache.open_snapshot(
+            snapshot_path,
+            config.ORACLE_EXTRACT_CACHE,
+            config.ORACLE_EXTRACT_MAX_AGE_HOURS,
+            source_dsn=config.ORACLE_DSN,
+        ), oracle_pool_cm as oracle_pool:
+            orders_col = mongo_db[ORDERS_COLLECTION]
+
+            # ── Paso 1: conteos solo-índice por día y lote de cuentas ─────────
+            print("\n[1/4] Conteos solo-índice por día y lote de cuentas ...")
+            index_counts = {}   # (day_idx, batch_idx) → OS en el índice
+            count_ms = []
+            for day_idx, (day_start, day_end) in enumerate(sampled_days):
+                day_total = 0
+                for batch_idx, accounts in enumerate(account_batches):
+                    start = time.perf_counter()
+                    count = order_repository.count_orders(
+                        orders_col,
+                        {"seller.account": {"$in": accounts}, "emissionDate": {"$gte": day_start, "$lt": day_end}},
+                        ACCOUNT_EMISSION_INDEX,
+                    )
+                    count_ms.append((time.perf_counter() - start) * 1000)
+                    index_counts[(day_idx, batch_idx)] = count
+                    day_total += count
+                print(f"  {day_start.strftime('%Y-%m-%d')}: {day_total} OS en el índice")
+
+            # ── Paso 2: proporción de candidatas en pares muestreados ─────────
+            print("\n[2/4] Conteos exactos con el filtro del modo ...")
+            non_empty = [pair for pair, count in index_counts.items() if count > 0]
+            sampled_pairs = rng.sample(non_empty, min(config.ESTIMATE_EXACT_COUNTS, len(non_empty)))
+            exact_total = 0
+            index_total_sampled_pairs = 0
+            for day_idx, batch_idx in sampled_pairs:
+                day_start, day_end = sampled_days[day_idx]
+                exact_total += order_repository.count_orders(
+                    orders_col,
+                    _candidate_filter(mode_name, account_batches[batch_idx], day_start, day_end),
+                    ACCOUNT_EMISSION_INDEX,
+                )
+                index_total_sampled_pairs += index_counts[(day_idx, batch_idx)]
+            candidate_ratio = _rate(exact_total, index_total_sampled_pairs)
+            print(f"  {exact_total}/{index_total_sampled_pairs} OS candidatas ({candidate_ratio * 100:.1f}%)")
+
+            # ── Paso 3: muestra de OS candidatas ──────────────────────────────
+            # Cada par aporta OS consecutivas en el orden del índice (cuenta, fecha), así
+            # que la muestra conserva juntas las OS de una misma cuenta y factura.
+            print("\n[3/4] Lectura de la muestra de OS ...")
+            per_pair = math.ceil(config.ESTIMATE_SAMPLE_ORDERS / len(sampled_pairs)) if sampled_pairs else 0
+            sample = []
+            scan_ms = 0.0
+            for day_idx, batch_idx in sampled_pairs:
+                day_start, day_end = sampled_days[day_idx]
+                start = time.perf_counter()
+                cursor = orders_col.find(
+                    _candidate_filter(mode_name, account_batches[batch_idx], day_start, day_end),
+                    _PROJECTION,
+                    batch_size=per_pair,
+                ).hint(ACCOUNT_EMISSION_INDEX).limit(per_pair)
+                docs = list(cursor)
+                scan_ms += (time.perf_counter() - start) * 1000
+                sample.extend(docs)
+                if len(sample) >= config.ESTIMATE_SAMPLE_ORDERS:
+                    break
+            sample = sample[: config.ESTIMATE_SAMPLE_ORDERS]
+            print(f"  {len(sample)} OS leídas en {scan_ms:.0f} ms")
+
+            # ── Paso 4: process_batch en DRY_RUN sobre la muestra ─────────────
+            print("\n[4/4] Procesamiento DRY_RUN de la muestra (consultas Oracle + MongoDB) ...")
+            process_ms = 0.0
+            oracle_ms = {}
+            statuses = {}
+            proforma_actions = {}
+            invoice_actions = {}
+            proformas_created = set()
+            invoices_created = set()
+            for batch in _chunks(sample, config.BATCH_SIZE):
+                start = time.perf_counter()
+                results, write_stats = service.process_batch(batch, mongo_db, oracle_pool, True)
+                process_ms += (time.perf_counter() - start) * 1000
+                for name, ms in (write_stats.get("oracle_ms") or {}).items():
+                    oracle_ms[name] = oracle_ms.get(name, 0.0) + ms
+                for r in results:
+                    statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+                    proforma_actions[r["proforma_action"]] = proforma_actions.get(r["proforma_action"], 0) + 1
+                    invoice_actions[r["invoice_action"]] = invoice_actions.get(r["invoice_action"], 0) + 1
+                    if r.get("proforma_created"):
+                        proformas_created.add((r.get("account"), r["proforma_created"].get("proformaSerie")))
+                    if r.get("invoice_created"):
+                        invoices_created.add(r["invoice_created"].get("siiFolio"))
+            print(f"  {len(sample)} OS procesadas en {process_ms:.0f} ms")
+
+    # ── Proyección ───────────────────────────────────────────────────────────
+    n_sample = len(sample)
+    index_total = sum(index_counts.values()) * len(days) / len(sampled_days) if sampled_days else 0
+    candidates = round(index_total * candidate_ratio)
+    to_update = sum(n for s, n in statuses.items() if s == "DRY_RUN")
+    projected = {
+        "candidates": candidates,
+        "orders_to_update": round(candidates * _rate(to_update, n_sample)),
+        "proformas_to_create": round(candidates * _rate(len(proformas_created), n_sample)),
+        "invoices_to_create": round(candidates * _rate(len(invoices_created), n_sample)),
+    }
+
+    scan_ms_per_order = _rate(scan_ms, n_sample)
+    process_ms_per_order = _rate(process_ms, n_sample)
+    write_ms_per_order = config.ESTIMATE_WRITE_MS_PER_ORDER
+    avg_count_ms = sum(count_ms) / len(count_ms) if count_ms else 0.0
+    # Por lote de cuentas: conteos de plan_partitions (SCAN_PARTITION_SLOTS repartidos en los cursores)
+    counts_per_account_batch = 1 + (
+        config.SCAN_PARTITION_SLOTS / config.SCAN_PARALLEL_CURSORS if config.SCAN_PARALLEL_CURSORS > 1 else 0
+    )
+    overhead_ms = len(days) * len(account_batches) * avg_count_ms * counts_per_account_batch
+    work_ms = candidates * (scan_ms_per_order + process_ms_per_order + write_ms_per_order)
+    runtime = {str(w): round((work_ms + overhead_ms) / 1000 / w, 1) for w in config.ESTIMATE_WORKERS}
+
+    report = {
+        "mode": mode_name,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+        "date_range": {"from": config.START_DATE, "to": config.END_DATE, "days": len(days), "sampled_days": len(sampled_days)},
+        "accounts": {"count": len(config.ACCOUNTS_FILTER), "account_batches": len(account_batches)},
+        "sample": {
+            "index_counts_per_sampled_day": round(sum(index_counts.values()) / len(sampled_days), 1) if sampled_days else 0,
+            "exact_count_pairs": len(sampled_pairs),
+            "candidate_ratio": round(candidate_ratio, 4),
+            "orders": n_sample,
+            "statuses": statuses,
+            "proforma_actions": proforma_actions,
+            "invoice_actions": invoice_actions,
+            "proformas_created": len(proformas_created),
+            "invoices_created": len(invoices_created),
+        },
+        "costs_ms_per_order": {
+            "scan": round(scan_ms_per_order, 3),
+            "process": round(process_ms_per_order, 3),
+            "oracle": {name: round(_rate(ms, n_sample), 3) for name, ms in oracle_ms.items()},
+            "write_assumed": write_ms_per_order,
+        },
+        "index_count_ms_avg": round(avg_count_ms, 1),
+        "projection": projected,
+        "runtime_seconds_by_workers": runtime,
+    }
+
+    _print_report(report)
+    _save_report(report)
+
+
+def _print_report(report: dict):
+    sample = report["sample"]
+    costs = report["costs_ms_per_order"]
+    projected = report["projection"]
+    print()
+    print("=" * 65)
+    print(f"=== ESTIMACIÓN [{report['mode']}] ===")
+    print(f"  OS candidatas (proy.)    : {projected['candidates']} ({sample['candidate_ratio'] * 100:.1f}% del índice)")
+    print(f"  OS a actualizar          : {projected['orders_to_update']}")
+    print(f"  Proformas a crear        : {projected['proformas_to_create']}  (cota superior)")
+    print(f"  Invoices a crear         : {projected['invoices_to_create']}")
+    print(f"  Muestra                  : {sample['orders']} OS | proformas {sample['proforma_actions']} | invoices {sample['invoice_actions']}")
+    oracle = ", ".join(f"{name} {ms}" for name, ms in costs["oracle"].items()) or "-"
+    print(
+        f"  Costo por OS (ms)        : escaneo {costs['scan']} | proceso {costs['process']} (Oracle: {oracle}) | "
+        f"escritura {costs['write_assumed']} (supuesto)"
+    )
+    for workers, seconds in report["runtime_seconds_by_workers"].items():
+        print(f"  Tiempo con {workers:>2} proceso(s) : {_fmt_duration(seconds)}")
+    print("  (escalamiento lineal entre procesos: cota inferior del tiempo real)")
+    print("=" * 65)
+
+
+def _save_report(report: dict):
+    logs_dir = _resolve_path(config.LOGS_DIR)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_file = logs_dir / f"estimate_{report['mode']}_{timestamp}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nEstimación guardada en: {report_file}")
@@ -18,7 +18,7 @@ Flujo:
     4. Muestra progreso en consola y genera log JSON al finalizar.
 """
 
-import json
+import os
 import sys
 import time
 from datetime import datetime, timedelta, timezone
@@ -26,10 +26,18 @@ from pathlib import Path
 
 _SCRIPT_DIR = Path(__file__).parent.parent  # billing-initial-load/
 
+# CLIENT_IDENTIFIER de las sesiones Oracle del pool (permite sumar sus métricas de parseo)
+_ORACLE_CLIENT_ID = f"billing-initial-load-legacy-{os.getpid()}"
+
 import config
+import extract_cache
+import query_logger
+import result_log
 from common.mongo.mongo_client import MongoConnection
-from common.oracle.oracle_client import OracleConnection
+from modes import shared
+from repositories import legacy_repository
 from repositories.order_repository import COLLECTION_NAME as ORDERS_COLLECTION
+from services import applied_index, batch_tuner, index_advisor, order_scanner, progress_estimator
 from services import legacy_service
 
 
@@ -72,10 +80,20 @@ def _print_initial_summary(total_days: int):
     if config.DRY_RUN and config.DRY_RUN_LIMIT > 0:
         print(f"  Límite/día    : {config.DRY_RUN_LIMIT} registros")
     print(f"  Tamaño lote   : {config.BATCH_SIZE} OS")
+    if config.ADAPTIVE_BATCHING:
+        print(
+            f"  Ajuste lotes  : OS {config.BATCH_SIZE_MIN}-{config.BATCH_SIZE_MAX} (objetivo {config.BATCH_TARGET_MS} ms/lote) | "
+            f"cuentas {config.ACCOUNT_BATCH_SIZE_MIN}-{config.ACCOUNT_BATCH_SIZE_MAX} (objetivo {config.ACCOUNT_BATCH_TARGET_S} s/lote)"
+        )
+    print(f"  Progreso      : {config.PROGRESS_ESTIMATE}")
     print(f"  Cuentas       : {len(config.ACCOUNTS_FILTER)} ({config.ACCOUNTS_FILE})")
     _uri_safe = ("...@" + config.MONGO_URI.split("@")[-1] if "@" in config.MONGO_URI else config.MONGO_URI)
     print(f"  MongoDB       : {_uri_safe} / {config.MONGO_DATABASE}")
     print(f"  Oracle DSN    : {config.ORACLE_DSN}")
+    if config.ORACLE_EXTRACT_CACHE != "off":
+        print(f"  Snapshot      : {config.ORACLE_EXTRACT_CACHE} ({config.ORACLE_EXTRACT_PATH})")
+    print(f"  Lookup Oracle : {config.ORACLE_LOOKUP_STRATEGY}")
+    print(f"  Pool Oracle   : {config.ORACLE_POOL_MIN}-{config.ORACLE_POOL_MAX} conexiones | stmt cache {config.ORACLE_STMT_CACHE_SIZE} | arraysize {config.ORACLE_ARRAYSIZE}")
     print(f"  Colecciones   : orders, proformas, proformaRequests")
     print("=" * 65)
     print()
@@ -114,12 +132,64 @@ def _print_final_summary(stats: dict, elapsed: float):
     print(f"  Proformas creadas        : {stats['proformas_created']}")
     if config.DRY_RUN:
         print(f"  (Modo DRY_RUN: sin escrituras)")
+    pool = stats.get("oracle_pool")
+    if pool:
+        print(
+            f"  Pool Oracle              : {pool['acquires']} préstamos | espera prom {pool['acquire_wait_avg_ms']} ms "
+            f"(máx {pool['acquire_wait_max_ms']} ms) | {pool['opened']}/{pool['max_size']} conexiones"
+        )
+        print(f"  Filas/round-trip         : {pool['rows_per_round_trip']} ({pool['rows']} filas / ~{pool['round_trips_est']} round-trips)")
+    dedupe = stats.get("dedupe")
+    if dedupe:
+        full_note = " | límite LEGACY_DEDUPE_MAX_KEYS alcanzado" if dedupe["full"] else ""
+        print(
+            f"  Reescrituras evitadas    : {dedupe['updates_skipped']} OS | {dedupe['series_skipped']} "
+            f"consultas de serie omitidas ({dedupe['pairs']} pares registrados{full_note})"
+        )
+    writer_stats = stats.get("mongo_writer")
+    if writer_stats:
+        print(
+            f"  Escritor Mongo           : {writer_stats['bulk_writes']} bulk_write + {writer_stats['insert_manys']} insert_many "
+            f"({writer_stats['ops_per_write']} ops/escritura) | latencia prom {writer_stats['write_ms_avg']} ms "
+            f"(máx {writer_stats['write_ms_max']} ms) | cola máx {writer_stats['queue_depth_max']}"
+        )
+        if writer_stats["write_errors"]:
+            print(f"  Escritor Mongo           : {writer_stats['write_errors']} operaciones con error (ver summary.mongo_writer.errors)")
+    extract = stats.get("oracle_extract")
+    if extract:
+        print(
+            f"  Snapshot Oracle          : {extract['mode']} | {extract['keys_from_snapshot']} claves desde snapshot | "
+            f"{extract['keys_from_oracle']} a Oracle"
+        )
+    tuning = stats.get("batch_tuning")
+    if tuning and tuning["batch_size"]["enabled"]:
+        bs, ab = tuning["batch_size"], tuning["account_batch_size"]
+        print(
+            f"  Tamaño de lote           : OS {bs['final']} (rango {bs['min_used']}-{bs['max_used']}, {bs['adjustments']} ajustes) | "
+            f"cuentas {ab['final']} (rango {ab['min_used']}-{ab['max_used']}, {ab['adjustments']} ajustes)"
+        )
+    index_check = stats.get("index_check")
+    if index_check:
+        problems = f"{len(index_check['problems'])} problema(s)" if index_check["problems"] else "sin problemas"
+        usage = index_check.get("usage")
+        used = ", ".join(
+            f"{collection}.{name} {ops}" for collection, per_index in usage.items() for name, ops in per_index.items()
+        ) if usage else "sin $indexStats"
+        print(f"  Índices MongoDB          : {problems} | usos: {used or '-'}")
+    profile = stats.get("query_profile")
+    if profile and profile["top"]:
+        print(f"  Queries más lentas       : {profile['shapes']} formas, {profile['total_ms'] / 1000:.1f} s en total (ver summary.query_profile)")
+        for shape in profile["top"][:3]:
+            print(f"    {shape['pct_time']:>5.1f}% | {shape['calls']} x {shape['avg_ms']} ms | {shape['shape'][:90]}")
+    parse = stats.get("oracle_parse")
+    if parse:
+        print(f"  Parses Oracle (hard/tot) : {parse['parse_hard']}/{parse['parse_total']} ({config.ORACLE_LOOKUP_STRATEGY})")
     print(f"  Throughput               : {rate:.1f} OS/s")
     print(f"  Tiempo total             : {elapsed_str}")
     print("=" * 65)
 
 
-def _save_log(stats: dict, all_results: list, elapsed: float):
+def _save_log(stats: dict, all_results: result_log.ResultLog, elapsed: float):
     logs_dir = _resolve_path(config.LOGS_DIR)
     logs_dir.mkdir(parents=True, exist_ok=True)
 
@@ -134,6 +204,7 @@ def _save_log(stats: dict, all_results: list, elapsed: float):
         "dry_run": config.DRY_RUN,
         "date_range": {"from": config.START_DATE, "to": config.END_DATE},
         "accounts_filter": {"file": config.ACCOUNTS_FILE, "accounts": config.ACCOUNTS_FILTER},
+        "oracle_lookup_strategy": config.ORACLE_LOOKUP_STRATEGY,
         "summary": {
             "days_processed": stats["days"],
             "total_candidates": stats["total_candidates"],
@@ -143,12 +214,20 @@ def _save_log(stats: dict, all_results: list, elapsed: float):
             "skipped_already_billed": stats["skipped_already_billed"],
             "errors": stats["errors"],
             "proformas_created": stats["proformas_created"],
+            "oracle_parse": stats["oracle_parse"],
+            "oracle_pool": stats["oracle_pool"],
+            "oracle_extract": stats["oracle_extract"],
+            "mongo_writer": stats["mongo_writer"],
+            "query_profile": stats["query_profile"],
+            "batch_tuning": stats["batch_tuning"],
+            "index_check": stats["index_check"],
+            "results_by_status": dict(all_results.status_counts),
+            "dedupe": stats["dedupe"],
         },
-        "results": all_results,
     }
 
-    with open(log_file, "w", encoding="utf-8") as f:
-        json.dump(log_data, f, indent=2, ensure_ascii=False, default=str)
+    # Los resultados por OS se leen desde el spool en disco (ver result_log.py)
+    all_results.write_log(log_file, log_data)
 
     print(f"\nLog guardado en: {log_file}")
 
@@ -205,16 +284,53 @@ def run():
         "errors": 0,
         "proformas_created": 0,
         "orders_modified": 0,
+        "oracle_parse": None,
+        "oracle_pool": None,
+        "oracle_extract": None,
+        "mongo_writer": None,
+        "query_profile": None,
+        "batch_tuning": None,
+        "index_check": None,
+        "dedupe": None,
     }
-    all_results = []
+    # Resultados por OS: se vuelcan a un spool JSONL en logs/ en vez de acumularse en memoria
+    spool_name = f"billing-initial-load_legacy_{datetime.now().strftime('%Y%m%d_%H%M%S')}.results.jsonl.part"
+    all_results = result_log.ResultLog(_resolve_path(config.LOGS_DIR) / spool_name)
     start_time = time.monotonic()
 
+    # Tamaños de lote ajustados según la latencia medida (services/batch_tuner.py)
+    batch_sizer = batch_tuner.SizeController(
+        "BATCH_SIZE", config.BATCH_SIZE, config.BATCH_SIZE_MIN, config.BATCH_SIZE_MAX,
+        config.BATCH_TARGET_MS, "ms", enabled=config.ADAPTIVE_BATCHING,
+    )
+    account_sizer = batch_tuner.SizeController(
+        "ACCOUNT_BATCH_SIZE", config.ACCOUNT_BATCH_SIZE, config.ACCOUNT_BATCH_SIZE_MIN, config.ACCOUNT_BATCH_SIZE_MAX,
+        config.ACCOUNT_BATCH_TARGET_S, "s", enabled=config.ADAPTIVE_BATCHING,
+    )
+
+    # Pares (orderId, factura) ya aplicados en la ejecución (compartido entre lotes y días)
+    applied = applied_index.AppliedIndex(config.LEGACY_DEDUPE_MAX_KEYS) if config.LEGACY_DEDUPE else None
+
+    # En replay no se abre el pool: todas las consultas se resuelven desde el snapshot
+    snapshot_path = _resolve_path(config.ORACLE_EXTRACT_PATH)
+    if config.ORACLE_EXTRACT_CACHE != "off":
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    oracle_pool_cm = shared.open_oracle_pool(_ORACLE_CLIENT_ID)
+
     with MongoConnection(uri=config.MONGO_URI, database=config.MONGO_DATABASE) as mongo_db:
-        with OracleConnection(
-            dsn=config.ORACLE_DSN,
-            user=config.ORACLE_USER,
-            password=config.ORACLE_PASSWORD,
-        ) as oracle_conn:
+        with extract_cache.open_snapshot(
+            snapshot_path,
+            config.ORACLE_EXTRACT_CACHE,
+            config.ORACLE_EXTRACT_MAX_AGE_HOURS,
+            source_dsn=config.ORACLE_DSN,
+        ), oracle_pool_cm as oracle_pool, shared.open_writer(mongo_db) as writer:
+
+            stats["index_check"] = shared.check_indexes(
+                mongo_db, "legacy", days[0], config.ACCOUNTS_FILTER[: account_sizer.size]
+            )
+            index_usage_before = stats["index_check"].pop("usage_before") if stats["index_check"] else None
+
+            parse_before = shared.read_parse_stats(oracle_pool, _ORACLE_CLIENT_ID)
 
             for day_idx, (day_start, day_end) in enumerate(days, 1):
                 day_label = day_start.strftime("%Y-%m-%d")
@@ -222,17 +338,26 @@ def run():
                 print(f"\n[Día {day_idx}/{total_days}] ({day_pct:.0f}%) {day_label} → {day_end.strftime('%Y-%m-%d')}")
 
                 orders_col = mongo_db[ORDERS_COLLECTION]
-                account_batches = list(_chunks(config.ACCOUNTS_FILTER, config.ACCOUNT_BATCH_SIZE))
+                day_account_batch_size = account_sizer.size
+                account_batches = list(_chunks(config.ACCOUNTS_FILTER, day_account_batch_size))
 
-                # Conteo rápido del día para progreso
+                # Total del día para el % de progreso (estrategia en config.PROGRESS_ESTIMATE)
                 count_filter = {
                     "emissionDate": {"$gte": day_start, "$lt": day_end},
                     "billing.status": {"$ne": "BILLED"},
                     "seller.account": {"$in": config.ACCOUNTS_FILTER},
                 }
-                day_total = orders_col.count_documents(count_filter)
-                print(f"  OS candidatas del día : {day_total}")
-                print(f"  Lotes de cuentas      : {len(account_batches)} ({config.ACCOUNT_BATCH_SIZE} cuentas/lote)")
+                progress = progress_estimator.DayProgress(
+                    orders_col,
+                    count_filter,
+                    account_batches,
+                    config.PROGRESS_ESTIMATE,
+                    sample_ratio=config.PROGRESS_SAMPLE_RATIO,
+                    workers=config.PROGRESS_COUNT_WORKERS,
+                    seed=day_label,
+                )
+                print(f"  OS candidatas del día : {progress.describe()}")
+                print(f"  Lotes de cuentas      : {len(account_batches)} ({day_account_batch_size} cuentas/lote)")
 
                 from repositories.order_repository import get_orders_cursor_legacy
 
@@ -243,12 +368,34 @@ def run():
                 batch_num = 0
                 day_limit_reached = False
 
-                for acc_batch in account_batches:
+                for acc_idx, acc_batch in enumerate(account_batches):
                     if day_limit_reached:
                         break
-
-                    cursor = get_orders_cursor_legacy(
-                        orders_col, day_start, day_end, acc_batch, config.BATCH_SIZE
+                    progress.start_account_batch(acc_idx)
+                    acc_start = time.monotonic()
+
+                    partitions = order_scanner.plan_partitions(
+                        orders_col,
+                        acc_batch,
+                        day_start,
+                        day_end,
+                        config.SCAN_PARALLEL_CURSORS,
+                        config.SCAN_PARTITION_TARGET,
+                        config.SCAN_PARTITION_SLOTS,
+                        expected_total=progress.total()[0],
+                    )
+                    if len(partitions) > 1:
+                        print(
+                            f"  Lote de cuentas {acc_idx + 1}: {len(partitions)} sub-rangos de emissionDate "
+                            f"({min(len(partitions), config.SCAN_PARALLEL_CURSORS)} cursores en paralelo)"
+                        )
+                    cursor = order_scanner.iter_partitioned(
+                        lambda start, end: get_orders_cursor_legacy(
+                            orders_col, start, end, acc_batch, config.BATCH_SIZE
+                        ),
+                        partitions,
+                        config.SCAN_PARALLEL_CURSORS,
+                        config.SCAN_QUEUE_SIZE,
                     )
 
                     for doc in cursor:
@@ -260,11 +407,12 @@ def run():
                         batch.append(doc)
                         day_processed += 1
 
-                        if len(batch) >= config.BATCH_SIZE:
+                        if len(batch) >= batch_sizer.size:
                             batch_num += 1
+                            batch_start = time.monotonic()
                             try:
                                 batch_results, write_stats = legacy_service.process_batch(
-                                    batch, mongo_db, oracle_conn, config.DRY_RUN
+                                    batch, mongo_db, oracle_pool, config.DRY_RUN, writer, applied
                                 )
                             except Exception as e:
                                 print(f"  [ERROR] Lote {batch_num}: {e}")
@@ -279,6 +427,13 @@ def run():
                                 batch = []
                                 continue
 
+                            tuning = batch_sizer.observe(len(batch), (time.monotonic() - batch_start) * 1000)
+
+                            async_modified, async_errors = shared.collect_writes(writer, applied=applied)
+                            write_stats["orders_modified"] += async_modified
+                            stats["errors"] += async_errors
+                            day_errors += async_errors
+
                             _accumulate(stats, batch_results)
                             stats["orders_modified"] += write_stats["orders_modified"]
                             all_results.extend(batch_results)
@@ -292,21 +447,30 @@ def run():
                             elapsed = time.monotonic() - start_time
                             total_done = stats["updated"] + stats["updated_no_proforma"]
                             rate_per_s = total_done / elapsed if elapsed > 0 else 0
-                            day_progress_pct = day_processed / day_total * 100 if day_total > 0 else 0
                             proforma_note = f" | {batch_proformas} proformas creadas" if batch_proformas else ""
                             print(
-                                f"  Lote {batch_num} | {day_processed}/{day_total} OS ({day_progress_pct:.0f}%) | "
+                                f"  Lote {batch_num} | {progress.fmt(day_processed)} | "
                                 f"{day_updated} actualizadas | {day_errors} errores | "
-                                f"{rate_per_s:.1f} OS/s{proforma_note}"
+                                f"{rate_per_s:.1f} OS/s{proforma_note}{shared.fmt_oracle_ms(write_stats.get('oracle_ms'))}"
                             )
+                            if tuning:
+                                print(f"  [ajuste] {tuning}")
                             batch = []
 
+                    cursor.close()
+
+                    # Solo lotes de cuentas completos: el último del día suele ser más chico
+                    if not day_limit_reached and len(acc_batch) == day_account_batch_size:
+                        tuning = account_sizer.observe(len(acc_batch), time.monotonic() - acc_start)
+                        if tuning:
+                            print(f"  [ajuste] {tuning} (aplica desde el día siguiente)")
+
                 # Procesar lote restante del día
                 if batch:
                     batch_num += 1
                     try:
                         batch_results, write_stats = legacy_service.process_batch(
-                            batch, mongo_db, oracle_conn, config.DRY_RUN
+                            batch, mongo_db, oracle_pool, config.DRY_RUN, writer, applied
                         )
                     except Exception as e:
                         print(f"  [ERROR] Lote {batch_num} (final): {e}")
@@ -330,14 +494,35 @@ def run():
                         else:
                             day_updated += write_stats["orders_modified"]
 
-                day_progress_pct = day_processed / day_total * 100 if day_total > 0 else 0
+                # Fin de día: esperar las escrituras encoladas para reportar el día completo
+                async_modified, async_errors = shared.collect_writes(writer, flush=True, applied=applied)
+                stats["orders_modified"] += async_modified
+                day_updated += async_modified
+                stats["errors"] += async_errors
+                day_errors += async_errors
+
                 limit_note = f" (límite DRY_RUN {config.DRY_RUN_LIMIT})" if day_limit_reached else ""
                 print(
-                    f"  → {day_processed}/{day_total} OS procesadas ({day_progress_pct:.0f}%) | "
+                    f"  → {progress.fmt(day_processed)} procesadas | "
                     f"{day_updated} actualizadas{limit_note}"
                 )
+                progress.close()
                 stats["days"] += 1
 
+            stats["oracle_parse"] = legacy_repository.diff_parse_stats(
+                parse_before, shared.read_parse_stats(oracle_pool, _ORACLE_CLIENT_ID)
+            )
+            stats["oracle_pool"] = oracle_pool.stats() if oracle_pool is not None else None
+            stats["oracle_extract"] = extract_cache.stats()
+            stats["dedupe"] = applied.stats() if applied is not None else None
+            if writer is not None:
+                writer.flush()
+                stats["mongo_writer"] = writer.stats()
+            stats["query_profile"] = query_logger.profile_report(config.QUERY_PROFILE_TOP_N)
+            stats["batch_tuning"] = {"batch_size": batch_sizer.stats(), "account_batch_size": account_sizer.stats()}
+            if stats["index_check"]:
+                stats["index_check"]["usage"] = index_advisor.usage_delta(mongo_db, index_usage_before)
+
     elapsed = time.monotonic() - start_time
     _print_final_summary(stats, elapsed)
     _save_log(stats, all_results, elapsed)
@@ -0,0 +1,121 @@
+"""
+Utilidades comunes de los modos de ejecución (taxDocument, legacy y --estimate).
+
+Cada modo las llama con su nombre y su CLIENT_IDENTIFIER de Oracle; el resto de la
+configuración se lee de config.
+
+  open_oracle_pool   → OraclePool del modo (nullcontext en replay del snapshot)
+  open_writer        → escritor async de orders/invoices (nullcontext si no aplica)
+  collect_writes     → escrituras confirmadas por el escritor desde la última llamada
+  read_parse_stats   → contadores de parseo de las sesiones del pool
+  check_indexes      → verificación previa de índices según MONGO_INDEX_CHECK
+  fmt_oracle_ms      → desglose de tiempos Oracle para la línea de progreso del lote
+"""
+
+import sys
+from contextlib import nullcontext
+
+import config
+from common.oracle.oracle_client import OraclePool
+from repositories import legacy_repository
+from services import index_advisor, mongo_writer
+
+
+def open_oracle_pool(client_identifier: str):
+    """Pool Oracle del modo; en replay no se abre (todo se resuelve desde el snapshot)."""
+    if config.ORACLE_EXTRACT_CACHE == "replay":
+        return nullcontext()
+    return OraclePool(
+        dsn=config.ORACLE_DSN,
+        user=config.ORACLE_USER,
+        password=config.ORACLE_PASSWORD,
+        min_size=config.ORACLE_POOL_MIN,
+        max_size=config.ORACLE_POOL_MAX,
+        stmt_cache_size=config.ORACLE_STMT_CACHE_SIZE,
+        arraysize=config.ORACLE_ARRAYSIZE,
+        prefetchrows=config.ORACLE_PREFETCH_ROWS,
+        client_identifier=client_identifier,
+    )
+
+
+def open_writer(mongo_db):
+    """Escritor async de orders/invoices; nullcontext (writer None) en DRY_RUN o si está desactivado."""
+    if config.DRY_RUN or not config.MONGO_ASYNC_WRITER:
+        return nullcontext()
+    return mongo_writer.BackgroundWriter(
+        mongo_db,
+        max_ops=config.MONGO_WRITER_MAX_OPS,
+        max_queue=config.MONGO_WRITER_QUEUE_BATCHES,
+        max_wait_ms=config.MONGO_WRITER_MAX_WAIT_MS,
+        write_concern=config.MONGO_BULK_WRITE_CONCERN,
+    )
+
+
+def collect_writes(writer, flush: bool = False, applied=None) -> tuple[int, int]:
+    """
+    Retorna (orders_modified, errores de escritura) confirmados por el escritor async
+    desde la última llamada. Con flush=True espera antes a que se escriba lo encolado.
+    Con applied (modo legacy) registra los pares y facturas de los lotes cuya escritura
+    se confirmó.
+    """
+    if writer is None:
+        return 0, 0
+    if flush:
+        writer.flush()
+    confirmed = writer.take_confirmed()
+    if applied is not None:
+        for pairs, facturas in confirmed["tags"]:
+            applied.mark_applied(pairs, facturas)
+    return confirmed["orders_modified"], confirmed["write_errors"]
+
+
+def read_parse_stats(oracle_pool, client_identifier: str) -> dict | None:
+    """Contadores de parseo de las sesiones del pool (None sin pool, en modo replay)."""
+    if oracle_pool is None:
+        return None
+    with oracle_pool.acquire() as stats_conn, stats_conn.cursor() as stats_cursor:
+        return legacy_repository.get_parse_stats(stats_cursor, client_identifier)
+
+
+def check_indexes(mongo_db, mode_name: str, first_day: tuple, first_accounts: list) -> dict | None:
+    """
+    Verificación previa de índices (services/index_advisor.py) con el primer día y el
+    primer lote de cuentas. None si MONGO_INDEX_CHECK = "off".
+
+    Raises:
+        RuntimeError: Si falta un índice usado con hint (MISSING), en "warn" y "strict",
+            o si hay cualquier problema en "strict".
+    """
+    if config.MONGO_INDEX_CHECK == "off":
+        return None
+    report = index_advisor.check(mongo_db, mode_name, first_day[0], first_day[1], first_accounts)
+    index_advisor.print_report(report)
+    # Un índice faltante con hint no es un aviso: el cursor fallaría dentro de los hilos
+    # de escaneo a mitad del rango. Con cualquier nivel distinto de "off" no se ejecuta.
+    missing = [entry["expected"] for entry in report["shapes"] if entry["status"] == "MISSING"]
+    if missing:
+        raise RuntimeError(
+            f"Faltan índices que las consultas fuerzan con hint: {', '.join(missing)}.\n"
+            "  Crea los índices indicados (ver README) antes de ejecutar."
+        )
+    if report["problems"]:
+        if config.MONGO_INDEX_CHECK == "strict":
+            raise RuntimeError(
+                f"Verificación de índices con {len(report['problems'])} problema(s) y MONGO_INDEX_CHECK = \"strict\".\n"
+                "  Crea los índices indicados o usa MONGO_INDEX_CHECK = \"warn\" (ver config.py)."
+            )
+        if sys.stdin.isatty():
+            from run import prompt_yes_no
+            if not prompt_yes_no("¿Continuar con estos problemas de índices?", False):
+                print("\nEjecución cancelada por el usuario.")
+                sys.exit(0)
+    print()
+    return report
+
+
+def fmt_oracle_ms(oracle_ms: dict) -> str:
+    """Formatea el desglose de tiempos de las consultas Oracle del lote."""
+    if not oracle_ms:
+        return ""
+    parts = ", ".join(f"{name} {ms:.0f}ms" for name, ms in oracle_ms.items())
+    return f" | Oracle: {parts}"
@@ -1,16 +1,39 @@
 """
-Utilidad de logging de queries para billing-initial-load.
+Utilidad de logging y profiling de queries para billing-initial-load.
 
-Activar con QUERY_LOGGING = True en config.py.
-Imprime cada query Oracle o MongoDB antes de ejecutarse.
+Logging: activar con QUERY_LOGGING = True en config.py. Imprime cada query Oracle o
+MongoDB antes de ejecutarse.
+
+Profiling: activar con QUERY_PROFILE = True en config.py. Los repositorios envuelven
+cada llamada con profile_oracle / profile_mongo / profile_cursor, que registran por
+"forma" de query (SQL normalizado, o colección + operación + filtro sin valores):
+llamadas, duración, filas/documentos, bytes y cantidad de parámetros. En la primera
+ejecución de cada forma se puede capturar además:
+  - MongoDB: explain() del cursor con su hint (QUERY_PROFILE_EXPLAIN).
+  - Oracle:  estadísticas de V$SQL de la sentencia (QUERY_PROFILE_ORACLE_STATS).
+profile_report() retorna las N formas más lentas para el log de la ejecución.
+
+Con ambos desactivados las llamadas solo pagan un chequeo de config.
 """
 
 import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import bson
 
 import config
 
 _MAX_PARAMS_DISPLAY = 20  # si hay más de N params, muestra solo los primeros N
 
+# IN (:1, :2, ..., :n) de la estrategia "in_list" → una sola forma por sentencia
+_IN_LIST_RE = re.compile(r"IN \(:\d+(?:, :\d+)*\)")
+
+_profile_lock = threading.Lock()
+_profiles = {}
+
 
 def _fmt_params(params: list) -> str:
     if not params:
@@ -47,3 +70,242 @@ def log_mongo(collection: str, operation: str, filter_doc: dict = None, projecti
     if projection is not None:
         parts.append(f"           projection: {_fmt_doc(projection)}")
     print("\n".join(parts))
+
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+
+class _Call:
+    """Métricas de una llamada; el repositorio completa rows/bytes antes de salir del with."""
+
+    __slots__ = ("shape", "rows", "bytes", "first")
+
+    def __init__(self, shape: str, first: bool):
+        self.shape = shape
+        self.rows = 0
+        self.bytes = 0
+        self.first = first
+
+    def add_rows(self, rows: list):
+        """Suma filas Oracle (tuplas) y un estimado de sus bytes."""
+        self.rows += len(rows)
+        self.bytes += sum(len(str(v)) for row in rows for v in row if v is not None)
+
+    def add_docs(self, docs: list):
+        """Suma documentos MongoDB y su tamaño BSON."""
+        self.rows += len(docs)
+        self.bytes += sum(len(bson.encode(d)) for d in docs)
+
+    def set_details(self, details: dict | None):
+        """Adjunta el explain / estadísticas Oracle de la primera ejecución de la forma."""
+        if details is not None:
+            with _profile_lock:
+                _profiles[self.shape]["details"] = details
+
+
+class _NoCall:
+    """Reemplazo sin costo de _Call cuando el profiling está desactivado."""
+
+    first = False
+
+    def add_rows(self, rows):
+        pass
+
+    def add_docs(self, docs):
+        pass
+
+    def set_details(self, details):
+        pass
+
+
+_NO_CALL = _NoCall()
+
+
+def _mongo_shape(value):
+    """Filtro MongoDB sin valores: conserva claves y operadores ($in, $gte, ...)."""
+    if isinstance(value, dict):
+        return {k: _mongo_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return ["?"] if value else []
+    return "?"
+
+
+def _begin(shape: str) -> _Call:
+    with _profile_lock:
+        first = shape not in _profiles
+        if first:
+            _profiles[shape] = {
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "first_ms": None,
+                "rows": 0, "bytes": 0, "params": 0, "params_max": 0, "details": None,
+            }
+    return _Call(shape, first)
+
+
+def _record(call: _Call, elapsed_ms: float, params: int):
+    with _profile_lock:
+        p = _profiles[call.shape]
+        p["calls"] += 1
+        p["total_ms"] += elapsed_ms
+        p["max_ms"] = max(p["max_ms"], elapsed_ms)
+        if p["first_ms"] is None:
+            p["first_ms"] = elapsed_ms
+        p["rows"] += call.rows
+        p["bytes"] += call.bytes
+        p["params"] += params
+        p["params_max"] = max(p["params_max"], params)
+
+
+@contextmanager
+def profile_oracle(sql: str, params: list = None):
+    """
+    Registra una ejecución Oracle. Uso:
+
+        with query_logger.profile_oracle(sql, chunk) as call:
+            cursor.execute(sql, binds)
+            rows = cursor.fetchall()
+            call.add_rows(rows)
+    """
+    log_oracle(sql, params)
+    if not config.QUERY_PROFILE:
+        yield _NO_CALL
+        return
+    call = _begin("ORACLE " + _IN_LIST_RE.sub("IN (:n)", " ".join(sql.split())))
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        _record(call, (time.perf_counter() - start) * 1000, len(params or []))
+
+
+@contextmanager
+def profile_mongo(collection: str, operation: str, filter_doc: dict = None, projection: dict = None, params: int = 0):
+    """Registra una operación MongoDB que se resuelve dentro del with (find a lista, insert, bulk_write, count)."""
+    log_mongo(collection, operation, filter_doc, projection)
+    if not config.QUERY_PROFILE:
+        yield _NO_CALL
+        return
+    call = _begin(f"MONGO {collection}.{operation} {_fmt_doc(_mongo_shape(filter_doc or {}))}")
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        _record(call, (time.perf_counter() - start) * 1000, params)
+
+
+class _ProfiledCursor:
+    """
+    Cursor MongoDB que mide el tiempo de cada next() (red + decodificación, no el
+    tiempo del consumidor) y registra la forma al agotarse o cerrarse.
+    """
+
+    def __init__(self, cursor, call: _Call, params: int):
+        self._cursor = cursor
+        self._it = iter(cursor)
+        self._call = call
+        self._params = params
+        self._ms = 0.0
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            doc = next(self._it)
+        except StopIteration:
+            self._ms += (time.perf_counter() - start) * 1000
+            self._finish()
+            raise
+        self._ms += (time.perf_counter() - start) * 1000
+        self._call.rows += 1
+        self._call.bytes += len(bson.encode(doc))
+        return doc
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            _record(self._call, self._ms, self._params)
+
+    def close(self):
+        self._finish()
+        close = getattr(self._cursor, "close", None)
+        if close:
+            close()
+
+
+def profile_cursor(cursor, collection: str, operation: str, filter_doc: dict, projection: dict = None, explain=None, params: int = 0):
+    """
+    Envuelve un cursor MongoDB para registrarlo al iterarlo.
+
+    Args:
+        explain: Función (verbosity) → documento explain. Se llama solo en la primera
+                 ejecución de la forma y si QUERY_PROFILE_EXPLAIN no es "off".
+    """
+    log_mongo(collection, operation, filter_doc, projection)
+    if not config.QUERY_PROFILE:
+        return cursor
+    call = _begin(f"MONGO {collection}.{operation} {_fmt_doc(_mongo_shape(filter_doc or {}))}")
+    if call.first and explain is not None and config.QUERY_PROFILE_EXPLAIN != "off":
+        try:
+            call.set_details(summarize_explain(explain(config.QUERY_PROFILE_EXPLAIN)))
+        except Exception as e:
+            call.set_details({"explain_error": str(e)})
+    return _ProfiledCursor(cursor, call, params)
+
+
+def wants_oracle_stats(call) -> bool:
+    """True si hay que capturar las estadísticas V$SQL de esta llamada (primera de su forma)."""
+    return call.first and config.QUERY_PROFILE_ORACLE_STATS
+
+
+def summarize_explain(explain: dict) -> dict:
+    """Resume un explain: etapas del plan ganador e índice usado, y executionStats si vienen."""
+    planner = explain.get("queryPlanner") or {}
+    plan = planner.get("winningPlan") or {}
+    stages = []
+    index_name = None
+    while plan:
+        stages.append(plan.get("stage"))
+        index_name = index_name or plan.get("indexName")
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or {}
+    summary = {"stages": stages, "index": index_name}
+    execution = explain.get("executionStats")
+    if execution:
+        summary.update({
+            "n_returned": execution.get("nReturned"),
+            "keys_examined": execution.get("totalKeysExamined"),
+            "docs_examined": execution.get("totalDocsExamined"),
+            "execution_ms": execution.get("executionTimeMillis"),
+        })
+    return summary
+
+
+def profile_report(top_n: int = 15) -> dict | None:
+    """Formas de query ordenadas por tiempo total (top N), o None si QUERY_PROFILE está desactivado."""
+    if not config.QUERY_PROFILE:
+        return None
+    with _profile_lock:
+        items = [(shape, dict(p)) for shape, p in _profiles.items() if p["calls"]]
+    items.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+    total_ms = sum(p["total_ms"] for _, p in items)
+    top = []
+    for shape, p in items[:top_n]:
+        top.append({
+            "shape": shape,
+            "calls": p["calls"],
+            "total_ms": round(p["total_ms"], 1),
+            "pct_time": round(p["total_ms"] / total_ms * 100, 1) if total_ms else 0,
+            "avg_ms": round(p["total_ms"] / p["calls"], 1),
+            "max_ms": round(p["max_ms"], 1),
+            "first_ms": round(p["first_ms"], 1),
+            "rows": p["rows"],
+            "avg_rows": round(p["rows"] / p["calls"], 1),
+            "bytes": p["bytes"],
+            "avg_params": round(p["params"] / p["calls"], 1),
+            "max_params": p["params_max"],
+            "details": p["details"],
+        })
+    return {"shapes": len(items), "total_ms": round(total_ms, 1), "top": top}
@@ -38,8 +38,11 @@ def find_existing_sii_folios(collection, sii_folios: list, invoice_type: str = N
     if invoice_type is not None:
         query_filter["type"] = invoice_type
 
-    query_logger.log_mongo(COLLECTION_NAME, "find", query_filter, {"siiFolio": 1, "_id": 0})
-    docs = collection.find(query_filter, {"siiFolio": 1, "_id": 0})
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "find", query_filter, {"siiFolio": 1, "_id": 0}, params=len(clean)
+    ) as call:
+        docs = list(collection.find(query_filter, {"siiFolio": 1, "_id": 0}))
+        call.add_docs(docs)
     return {doc["siiFolio"] for doc in docs}
 
 
@@ -59,6 +62,9 @@ def save_many(collection, invoice_docs: list) -> int:
     if not invoice_docs:
         return 0
 
-    query_logger.log_mongo(COLLECTION_NAME, f"insert_many ({len(invoice_docs)} docs)")
-    result = collection.insert_many(invoice_docs, ordered=False)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "insert_many", {"count": len(invoice_docs)}, params=len(invoice_docs)
+    ) as call:
+        result = collection.insert_many(invoice_docs, ordered=False)
+        call.add_docs(invoice_docs)
     return len(result.inserted_ids)
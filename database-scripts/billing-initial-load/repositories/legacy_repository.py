@@ -6,15 +6,49 @@ Tablas Oracle:
   - OSER:  costos de OS (retries, additionalCharges) por EEVV_NMR_ID
   - CLHL:  datos de empresa (CLHL_NMBR_JURIDICO)
 
-Todas las consultas batch usan bind variables dinámicas (:1, :2, ...) para
-evitar SQL injection y respetar el límite de 1000 items por cláusula IN.
+Las consultas batch bindean la lista de claves según config.ORACLE_LOOKUP_STRATEGY:
+  - "collection": la lista completa va en un único bind de tipo colección
+                  (SYS.ODCIVARCHAR2LIST) y se filtra con IN (SELECT ... FROM TABLE(:1)).
+                  El texto SQL es estable para cualquier tamaño de lote, por lo que
+                  Oracle reutiliza el cursor compartido (soft parse) y el statement
+                  cache del driver.
+  - "in_list":    bind variables dinámicas (:1, :2, ...) en la cláusula IN, en trozos
+                  de 1000 (límite Oracle). Genera un SQL distinto por cada largo de lote.
+
+En ambos casos el troceo es interno: los llamadores pasan la lista completa.
+
+run_concurrent_lookups pasa además por el snapshot local (extract_cache) cuando
+config.ORACLE_EXTRACT_CACHE lo activa: en "replay" las consultas no llegan a Oracle.
 """
 
 import decimal
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import oracledb
+
+import config
+import extract_cache
 import query_logger
 
+# Tipo colección predefinido en Oracle: VARRAY(32767) OF VARCHAR2(4000).
+KEY_LIST_TYPE = "SYS.ODCIVARCHAR2LIST"
+
+# Máximo de claves por ejecución según la estrategia
+_MAX_ITEMS_PER_EXECUTE = {
+    "collection": 32767,  # capacidad del VARRAY
+    "in_list": 1000,      # límite Oracle de la cláusula IN
+}
+
+# Predicado estable para la estrategia "collection". El hint CARDINALITY evita que
+# el optimizador asuma 8168 filas para TABLE() y descarte los índices por clave.
+_COLLECTION_PREDICATE = "IN (SELECT /*+ CARDINALITY(k 1000) */ k.COLUMN_VALUE FROM TABLE(:1) k)"
+
+# Cache del tipo colección por conexión (gettype implica un round-trip)
+_key_list_types = weakref.WeakKeyDictionary()
+
 
 def _to_int(value) -> int:
     """Convierte Decimal/None/float a int de forma segura."""
@@ -34,26 +68,110 @@ def _to_iso_str(value) -> str | None:
     return str(value)
 
 
+def _key_list_type(connection):
+    """Retorna (y cachea por conexión) el tipo colección usado para bindear claves."""
+    key_type = _key_list_types.get(connection)
+    if key_type is None:
+        key_type = connection.gettype(KEY_LIST_TYPE)
+        _key_list_types[connection] = key_type
+    return key_type
+
+
+def _fetch_by_keys(cursor, sql_template: str, keys: list) -> list:
+    """
+    Ejecuta `sql_template` filtrando por `keys` y retorna todas las filas.
+
+    `sql_template` contiene el marcador {keys} en la posición del predicado IN
+    (ej: "WHERE EEVV_NMR_ID {keys}"). Las claves se envían como strings; Oracle
+    aplica la misma conversión implícita que con la lista IN tradicional.
+    """
+    strategy = config.ORACLE_LOOKUP_STRATEGY
+    max_items = _MAX_ITEMS_PER_EXECUTE[strategy]
+    rows = []
+    for i in range(0, len(keys), max_items):
+        chunk = [str(k) for k in keys[i: i + max_items]]
+        if strategy == "collection":
+            sql = sql_template.format(keys=_COLLECTION_PREDICATE)
+            params = [_key_list_type(cursor.connection).newobject(chunk)]
+        else:
+            placeholders = ", ".join([f":{j + 1}" for j in range(len(chunk))])
+            sql = sql_template.format(keys=f"IN ({placeholders})")
+            params = chunk
+        with query_logger.profile_oracle(sql, chunk) as call:
+            cursor.execute(sql, params)
+            chunk_rows = cursor.fetchall()
+            call.add_rows(chunk_rows)
+        if query_logger.wants_oracle_stats(call):
+            call.set_details(get_last_sql_stats(cursor))
+        rows.extend(chunk_rows)
+    return rows
+
+
+def run_concurrent_lookups(oracle_pool, lookups: dict) -> tuple[dict, dict]:
+    """
+    Ejecuta consultas batch independientes en paralelo, cada una con su propia
+    conexión del pool.
+
+    Args:
+        oracle_pool: OraclePool abierto (common.oracle.oracle_client).
+        lookups:     {nombre: (función batch_find_*, lista de claves)}. Las entradas
+                     con lista vacía se resuelven a {} sin consultar Oracle.
+
+    Con el snapshot local activo (extract_cache) solo se consultan a Oracle las claves
+    que no están en él, y su resultado se guarda. En "replay" oracle_pool puede ser None.
+
+    Returns:
+        Tupla (resultados {nombre: dict}, tiempos {nombre: ms}). El tiempo de cada
+        consulta incluye la espera por una conexión libre del pool.
+    """
+    results = {}
+    pending = {}
+    for name, (fn, keys) in lookups.items():
+        results[name], missing = extract_cache.lookup(fn.__name__, keys)
+        if missing:
+            pending[name] = (fn, missing)
+    timings = {}
+
+    def _run(fn, keys):
+        start = time.perf_counter()
+        with oracle_pool.acquire() as conn:
+            with conn.cursor() as cursor:
+                data = fn(cursor, keys)
+        return data, (time.perf_counter() - start) * 1000
+
+    fetched = {}
+    if len(pending) == 1:
+        name, (fn, keys) = next(iter(pending.items()))
+        fetched[name], timings[name] = _run(fn, keys)
+    elif pending:
+        with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="oracle") as executor:
+            futures = {name: executor.submit(_run, fn, keys) for name, (fn, keys) in pending.items()}
+            for name, future in futures.items():
+                fetched[name], timings[name] = future.result()
+
+    for name, data in fetched.items():
+        fn, keys = pending[name]
+        extract_cache.store(fn.__name__, keys, data, _SNAPSHOT_KEY_OF.get(fn.__name__))
+        results[name].update(data)
+    return results, timings
+
+
 def batch_find_dcbt(cursor, reference_orders: list) -> dict:
     """
     Consulta DCBT_NMR_FAC_PF y DCBT_NMR_FAC_REAL para un lote de EEVV_NMR_ID.
 
-    Máx. 1000 items por llamada (límite Oracle IN clause).
     Retorna: {eevv_nmr_id: {"dcbt_nmr_fac_pf": str, "dcbt_nmr_fac_real": str|None}}.
     """
     if not reference_orders:
         return {}
 
-    placeholders = ", ".join([f":{i + 1}" for i in range(len(reference_orders))])
     sql = (
-        f"SELECT EEVV_NMR_ID, DCBT_NMR_FAC_PF, DCBT_NMR_FAC_REAL "
-        f"FROM DCBT "
-        f"WHERE EEVV_NMR_ID IN ({placeholders})"
+        "SELECT EEVV_NMR_ID, DCBT_NMR_FAC_PF, DCBT_NMR_FAC_REAL "
+        "FROM DCBT "
+        "WHERE EEVV_NMR_ID {keys}"
     )
-    query_logger.log_oracle(sql, reference_orders)
-    cursor.execute(sql, reference_orders)
     result = {}
-    for row in cursor.fetchall():
+    for row in _fetch_by_keys(cursor, sql, reference_orders):
         eevv_id = str(row[0]) if row[0] is not None else None
         dcbt_nmr = str(row[1]) if row[1] is not None else None
         if eevv_id and dcbt_nmr:
@@ -68,25 +186,21 @@ def batch_find_oser(cursor, reference_orders: list) -> dict:
     """
     Consulta costos OSER para un lote de EEVV_NMR_ID.
 
-    Máx. 1000 items por llamada.
     Retorna: {eevv_nmr_id: {"retries": int, "additional_charges": int}}.
     """
     if not reference_orders:
         return {}
 
-    placeholders = ", ".join([f":{i + 1}" for i in range(len(reference_orders))])
     sql = (
-        f"SELECT "
-        f"    EEVV_NMR_ID, "
-        f"    (NVL(oser_vlor_gasto_carrier_pp, 0) + NVL(oser_vlor_gasto_carrier_cc, 0)) AS retries, "
-        f"    (NVL(oser_vlor_varios_pp, 0) + NVL(oser_vlor_varios_cc, 0)) AS additional_charges "
-        f"FROM OSER "
-        f"WHERE EEVV_NMR_ID IN ({placeholders})"
+        "SELECT "
+        "    EEVV_NMR_ID, "
+        "    (NVL(oser_vlor_gasto_carrier_pp, 0) + NVL(oser_vlor_gasto_carrier_cc, 0)) AS retries, "
+        "    (NVL(oser_vlor_varios_pp, 0) + NVL(oser_vlor_varios_cc, 0)) AS additional_charges "
+        "FROM OSER "
+        "WHERE EEVV_NMR_ID {keys}"
     )
-    query_logger.log_oracle(sql, reference_orders)
-    cursor.execute(sql, reference_orders)
     result = {}
-    for row in cursor.fetchall():
+    for row in _fetch_by_keys(cursor, sql, reference_orders):
         eevv_id = str(row[0]) if row[0] is not None else None
         if eevv_id:
             result[eevv_id] = {
@@ -103,14 +217,12 @@ def batch_find_proforma_data_bulk(cursor, facturas: list) -> dict:
     Agrupa por DCBT_NMR_FAC_PF y CLHL_NMBR_JURIDICO para obtener resultados
     individuales por cada factura.
 
-    Máx. 1000 items por llamada.
     Retorna: {dcbt_nmr_fac_pf: dict} con los mismos campos que find_proforma_data.
     """
     if not facturas:
         return {}
 
-    placeholders = ", ".join([f":{i + 1}" for i in range(len(facturas))])
-    sql = f"""
+    sql = """
         SELECT
             DCBT_NMR_FAC_PF,
             SUM(CASE OSER.OSER_TIPO_MULTIOS WHEN 0 THEN 1 ELSE 0 END) AS monobulto,
@@ -127,13 +239,11 @@ def batch_find_proforma_data_bulk(cursor, facturas: list) -> dict:
         INNER JOIN OSER ON OSER.EEVV_NMR_ID = DCBT.EEVV_NMR_ID
         INNER JOIN CLHL ON OSER.CLHL_CDG_EMBA = CLHL.CLHL_CDG
                        AND OSER.CLHL_SCRS_EMBA = CLHL.CLHL_SCRS
-        WHERE DCBT_NMR_FAC_PF IN ({placeholders})
+        WHERE DCBT_NMR_FAC_PF {keys}
         GROUP BY DCBT_NMR_FAC_PF, CLHL_NMBR_JURIDICO
     """
-    query_logger.log_oracle(sql, facturas)
-    cursor.execute(sql, facturas)
     result = {}
-    for row in cursor.fetchall():
+    for row in _fetch_by_keys(cursor, sql, facturas):
         dcbt_nmr = str(row[0]) if row[0] is not None else None
         if dcbt_nmr:
             result[dcbt_nmr] = {
@@ -159,23 +269,19 @@ def batch_find_order_series(cursor, facturas: list) -> dict:
     Permite actualizar masivamente todas las órdenes asociadas a las facturas del lote,
     incluyendo órdenes que no formaban parte del batch de MongoDB original.
 
-    Máx. 1000 items por llamada.
     Retorna: {eevv_nmr_serie (orderId): dcbt_nmr_fac_pf}
     """
     if not facturas:
         return {}
 
-    placeholders = ", ".join([f":{i + 1}" for i in range(len(facturas))])
     sql = (
-        f"SELECT EEVV.EEVV_NMR_SERIE, DCBT.DCBT_NMR_FAC_PF "
-        f"FROM DCBT "
-        f"INNER JOIN EEVV ON EEVV.EEVV_NMR_ID = DCBT.EEVV_NMR_ID "
-        f"WHERE DCBT.DCBT_NMR_FAC_PF IN ({placeholders})"
+        "SELECT EEVV.EEVV_NMR_SERIE, DCBT.DCBT_NMR_FAC_PF "
+        "FROM DCBT "
+        "INNER JOIN EEVV ON EEVV.EEVV_NMR_ID = DCBT.EEVV_NMR_ID "
+        "WHERE DCBT.DCBT_NMR_FAC_PF {keys}"
     )
-    query_logger.log_oracle(sql, facturas)
-    cursor.execute(sql, facturas)
     result = {}
-    for row in cursor.fetchall():
+    for row in _fetch_by_keys(cursor, sql, facturas):
         serie = str(row[0]) if row[0] is not None else None
         dcbt_nmr = str(row[1]) if row[1] is not None else None
         if serie and dcbt_nmr:
@@ -183,6 +289,13 @@ def batch_find_order_series(cursor, facturas: list) -> dict:
     return result
 
 
+# Consultas cuyo resultado no está indexado por la clave consultada: para el
+# snapshot local se indica de qué clave de entrada viene cada fila.
+_SNAPSHOT_KEY_OF = {
+    "batch_find_order_series": lambda serie, dcbt_nmr: dcbt_nmr,
+}
+
+
 def find_proforma_data(cursor, dcbt_nmr_fac_pf: str) -> dict | None:
     """
     Consulta los datos completos de una proforma desde el legado.
@@ -210,9 +323,12 @@ def find_proforma_data(cursor, dcbt_nmr_fac_pf: str) -> dict | None:
         WHERE DCBT_NMR_FAC_PF = :1
         GROUP BY CLHL_NMBR_JURIDICO
     """
-    query_logger.log_oracle(sql, [dcbt_nmr_fac_pf])
-    cursor.execute(sql, [dcbt_nmr_fac_pf])
-    row = cursor.fetchone()
+    with query_logger.profile_oracle(sql, [dcbt_nmr_fac_pf]) as call:
+        cursor.execute(sql, [dcbt_nmr_fac_pf])
+        row = cursor.fetchone()
+        call.add_rows([row] if row is not None else [])
+    if query_logger.wants_oracle_stats(call):
+        call.set_details(get_last_sql_stats(cursor))
     if row is None:
         return None
 
@@ -237,24 +353,20 @@ def batch_find_invoice_data(cursor, dcbt_nmr_fac_reals: list) -> dict:
     La tabla OAPV almacena atributos clave-valor por OS; el código 'FOLIO_SII'
     corresponde al folio SII de la factura. DEMV contiene la ruta del documento.
 
-    Máx. 1000 items por llamada (límite Oracle IN clause).
     Retorna: {dcbt_nmr_fac_real: {"sii_folio": str, "sii_document_path": str|None}}
     """
     if not dcbt_nmr_fac_reals:
         return {}
 
-    placeholders = ", ".join([f":{i + 1}" for i in range(len(dcbt_nmr_fac_reals))])
     sql = (
-        f"SELECT OAPV.EEVV_NMR_ID, OAPV_VALOR, DEMV_RUTA_WEB "
-        f"FROM OAPV "
-        f"JOIN DEMV ON OAPV.EEVV_NMR_ID = DEMV.EEVV_NMR_ID "
-        f"WHERE OAPV.EEVV_NMR_ID IN ({placeholders}) "
-        f"AND OAPV.OAPC_CDG = 'FOLIO_SII'"
+        "SELECT OAPV.EEVV_NMR_ID, OAPV_VALOR, DEMV_RUTA_WEB "
+        "FROM OAPV "
+        "JOIN DEMV ON OAPV.EEVV_NMR_ID = DEMV.EEVV_NMR_ID "
+        "WHERE OAPV.EEVV_NMR_ID {keys} "
+        "AND OAPV.OAPC_CDG = 'FOLIO_SII'"
     )
-    query_logger.log_oracle(sql, dcbt_nmr_fac_reals)
-    cursor.execute(sql, dcbt_nmr_fac_reals)
     result = {}
-    for row in cursor.fetchall():
+    for row in _fetch_by_keys(cursor, sql, dcbt_nmr_fac_reals):
         eevv_id = str(row[0]) if row[0] is not None else None
         if eevv_id:
             result[eevv_id] = {
@@ -262,3 +374,97 @@ def batch_find_invoice_data(cursor, dcbt_nmr_fac_reals: list) -> dict:
                 "sii_document_path": str(row[2]) if row[2] is not None else None,
             }
     return result
+
+
+# ============================================================================
+# MÉTRICAS DE PARSEO (sesión actual)
+# ============================================================================
+
+_PARSE_STAT_NAMES = {
+    "parse count (total)": "parse_total",
+    "parse count (hard)": "parse_hard",
+    "parse time elapsed": "parse_time_cs",
+}
+
+
+def get_parse_stats(cursor, client_identifier: str = None) -> dict | None:
+    """
+    Lee los contadores de parseo de Oracle.
+
+    Sin client_identifier lee solo la sesión actual (V$MYSTAT). Con client_identifier
+    suma todas las sesiones con ese CLIENT_IDENTIFIER (V$SESSTAT + V$SESSION), que es
+    como se identifican las conexiones de un OraclePool.
+
+    Permite medir el ahorro de hard parses entre estrategias de lookup.
+    Retorna None si el usuario no tiene acceso a las vistas V$.
+    Retorna: {"parse_total": int, "parse_hard": int, "parse_time_cs": int}
+    """
+    names = ", ".join(f"'{n}'" for n in _PARSE_STAT_NAMES)
+    if client_identifier:
+        sql = (
+            "SELECT SN.NAME, SUM(SS.VALUE) "
+            "FROM V$SESSTAT SS "
+            "JOIN V$STATNAME SN ON SN.STATISTIC# = SS.STATISTIC# "
+            "JOIN V$SESSION S ON S.SID = SS.SID "
+            f"WHERE S.CLIENT_IDENTIFIER = :1 AND SN.NAME IN ({names}) "
+            "GROUP BY SN.NAME"
+        )
+        params = [client_identifier]
+    else:
+        sql = (
+            "SELECT SN.NAME, MS.VALUE "
+            "FROM V$MYSTAT MS "
+            "JOIN V$STATNAME SN ON SN.STATISTIC# = MS.STATISTIC# "
+            f"WHERE SN.NAME IN ({names})"
+        )
+        params = []
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    except oracledb.DatabaseError:
+        return None
+    return {_PARSE_STAT_NAMES[name]: _to_int(value) for name, value in rows}
+
+
+def get_last_sql_stats(cursor) -> dict | None:
+    """
+    Estadísticas de V$SQL de la última sentencia ejecutada en la sesión del cursor
+    (PREV_SQL_ID de V$SESSION). Son acumuladas en la instancia para ese SQL_ID, no
+    solo de esta ejecución. Usado por el profiler de query_logger en la primera
+    ejecución de cada forma de query.
+
+    Retorna None si el usuario no tiene acceso a V$SESSION / V$SQL.
+    """
+    sql = (
+        "SELECT Q.SQL_ID, Q.PLAN_HASH_VALUE, Q.EXECUTIONS, Q.ROWS_PROCESSED, "
+        "       Q.BUFFER_GETS, Q.DISK_READS, Q.ELAPSED_TIME, Q.CPU_TIME "
+        "FROM V$SESSION S "
+        "JOIN V$SQL Q ON Q.SQL_ID = S.PREV_SQL_ID AND Q.CHILD_NUMBER = S.PREV_CHILD_NUMBER "
+        "WHERE S.SID = SYS_CONTEXT('USERENV', 'SID')"
+    )
+    try:
+        with cursor.connection.cursor() as stats_cursor:
+            stats_cursor.execute(sql)
+            row = stats_cursor.fetchone()
+    except oracledb.DatabaseError:
+        return None
+    if row is None:
+        return None
+    executions = _to_int(row[2]) or 1
+    return {
+        "sql_id": row[0],
+        "plan_hash_value": _to_int(row[1]),
+        "executions": _to_int(row[2]),
+        "rows_per_exec": round(_to_int(row[3]) / executions, 1),
+        "buffer_gets_per_exec": round(_to_int(row[4]) / executions, 1),
+        "disk_reads_per_exec": round(_to_int(row[5]) / executions, 1),
+        "elapsed_ms_per_exec": round(_to_int(row[6]) / executions / 1000, 2),
+        "cpu_ms_per_exec": round(_to_int(row[7]) / executions / 1000, 2),
+    }
+
+
+def diff_parse_stats(before: dict | None, after: dict | None) -> dict | None:
+    """Retorna la diferencia after - before de get_parse_stats (None si falta alguno)."""
+    if before is None or after is None:
+        return None
+    return {key: after.get(key, 0) - before.get(key, 0) for key in _PARSE_STAT_NAMES.values()}
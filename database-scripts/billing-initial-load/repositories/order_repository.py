@@ -4,7 +4,9 @@ Repositorio de acceso a la colección orders para billing-initial-load.
 Colección: orders
 
 Operaciones:
-  - get_orders_cursor:   cursor paginado por emissionDate para OS candidatas
+  - get_orders_cursor:   cursor paginado por emissionDate para OS candidatas (opcionalmente por cuentas)
+  - get_orders_cursor_legacy: cursor por lote de cuentas del modo legacy (sin filtro taxDocument)
+  - count_orders:        conteo de OS para estimar el progreso (opcionalmente con hint)
   - bulk_write_billing:  actualización masiva del subdocumento billing
 """
 
@@ -15,8 +17,35 @@ import query_logger
 
 COLLECTION_NAME = "orders"
 
-
-def get_orders_cursor(collection, start_dt: datetime, end_dt: datetime, batch_size: int = 1000):
+# Índice compuesto usado por los cursores por lote de cuentas. Sus dos primeros
+# campos (seller.account, emissionDate) permiten conteos solo-índice.
+ACCOUNT_EMISSION_INDEX = [
+    ("seller.account", 1),
+    ("emissionDate", 1),
+    ("billing.deliveryDate", 1),
+    ("billing.proformaId", 1),
+    ("state", 1),
+    ("_id", 1),
+]
+
+
+def _explain(collection, query: dict, projection: dict, hint: list = None):
+    """Función (verbosity) → explain del find, para el profiler de query_logger."""
+    def _run(verbosity: str) -> dict:
+        find = {"find": collection.name, "filter": query, "projection": projection}
+        if hint:
+            find["hint"] = dict(hint)
+        return collection.database.command({"explain": find, "verbosity": verbosity})
+    return _run
+
+
+def get_orders_cursor(
+    collection,
+    start_dt: datetime,
+    end_dt: datetime,
+    batch_size: int = 1000,
+    accounts: list = None,
+):
     """
     Retorna un cursor de OS candidatas para el rango [start_dt, end_dt).
 
@@ -24,6 +53,7 @@ def get_orders_cursor(collection, start_dt: datetime, end_dt: datetime, batch_si
       - emissionDate >= start_dt y < end_dt  (usa el índice emissionDate)
       - taxDocument presente y no nulo
       - billing.status != "BILLED" (incluye OS sin campo billing)
+      - seller.account en accounts, si se entrega (fuerza ACCOUNT_EMISSION_INDEX)
 
     Proyección mínima para reducir transferencia de datos.
 
@@ -32,6 +62,7 @@ def get_orders_cursor(collection, start_dt: datetime, end_dt: datetime, batch_si
         start_dt:   Inicio del intervalo (inclusive), datetime UTC.
         end_dt:     Fin del intervalo (exclusive), datetime UTC.
         batch_size: Tamaño del lote de red con MongoDB.
+        accounts:   Lista de accounts a filtrar (opcional, cursor por lote de cuentas).
     """
     query = {
         "emissionDate": {"$gte": start_dt, "$lt": end_dt},
@@ -46,8 +77,19 @@ def get_orders_cursor(collection, start_dt: datetime, end_dt: datetime, batch_si
         "taxDocument": 1,
         "billing": 1,
     }
-    query_logger.log_mongo(COLLECTION_NAME, "find", query, projection)
-    return collection.find(query, projection, batch_size=batch_size)
+    if accounts is None:
+        return query_logger.profile_cursor(
+            collection.find(query, projection, batch_size=batch_size),
+            COLLECTION_NAME, "find", query, projection,
+            explain=_explain(collection, query, projection),
+        )
+    query["seller.account"] = {"$in": accounts}
+    return query_logger.profile_cursor(
+        collection.find(query, projection, batch_size=batch_size).hint(ACCOUNT_EMISSION_INDEX),
+        COLLECTION_NAME, "find", query, projection,
+        explain=_explain(collection, query, projection, ACCOUNT_EMISSION_INDEX),
+        params=len(accounts),
+    )
 
 
 def get_orders_cursor_legacy(
@@ -87,15 +129,33 @@ def get_orders_cursor_legacy(
         "seller.account": 1,
         "billing": 1,
     }
-    query_logger.log_mongo(COLLECTION_NAME, "find", query, projection)
-    return collection.find(query, projection, batch_size=batch_size).hint([
-        ("seller.account", 1),
-        ("emissionDate", 1),
-        ("billing.deliveryDate", 1),
-        ("billing.proformaId", 1),
-        ("state", 1),
-        ("_id", 1),
-    ])
+    return query_logger.profile_cursor(
+        collection.find(query, projection, batch_size=batch_size).hint(ACCOUNT_EMISSION_INDEX),
+        COLLECTION_NAME, "find", query, projection,
+        explain=_explain(collection, query, projection, ACCOUNT_EMISSION_INDEX),
+        params=len(accounts),
+    )
+
+
+def count_orders(collection, query: dict, hint: list = None) -> int:
+    """
+    Cuenta las OS que cumplen el filtro.
+
+    Con hint=ACCOUNT_EMISSION_INDEX y un filtro que solo use seller.account y
+    emissionDate, MongoDB resuelve el conteo recorriendo solo el índice.
+
+    Args:
+        collection: Colección pymongo de orders.
+        query:      Filtro de conteo.
+        hint:       Índice a forzar (opcional).
+    """
+    with query_logger.profile_mongo(COLLECTION_NAME, "count_documents", query) as call:
+        if hint:
+            count = collection.count_documents(query, hint=hint)
+        else:
+            count = collection.count_documents(query)
+        call.rows = count
+    return count
 
 
 def bulk_write_billing(collection, updates: list) -> dict:
@@ -130,6 +190,9 @@ def bulk_write_billing(collection, updates: list) -> dict:
 
         operations.append(UpdateOne({"orderId": order_id}, {"$set": set_doc}))
 
-    query_logger.log_mongo(COLLECTION_NAME, f"bulk_write ({len(updates)} ops)", {"orderId": "$in [batch]"})
-    result = collection.bulk_write(operations, ordered=False)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "bulk_write", {"orderId": "$in [batch]"}, params=len(operations)
+    ) as call:
+        result = collection.bulk_write(operations, ordered=False)
+        call.rows = result.modified_count
     return {"matched": result.matched_count, "modified": result.modified_count}
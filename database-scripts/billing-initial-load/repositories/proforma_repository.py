@@ -44,8 +44,12 @@ def find_by_accounts(collection, accounts: list) -> list:
         "siiFolio": 1,
         "createdAt": 1,
     }
-    query_logger.log_mongo(COLLECTION_NAME, "find", {"account": {"$in": clean}}, projection)
-    return list(collection.find({"account": {"$in": clean}}, projection))
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "find", {"account": {"$in": clean}}, projection, params=len(clean)
+    ) as call:
+        docs = list(collection.find({"account": {"$in": clean}}, projection))
+        call.add_docs(docs)
+    return docs
 
 
 def save(collection, proforma_doc: dict) -> str:
@@ -59,8 +63,11 @@ def save(collection, proforma_doc: dict) -> str:
     Returns:
         Hex string del ObjectId insertado.
     """
-    query_logger.log_mongo(COLLECTION_NAME, "insert_one", {"account": proforma_doc.get("account"), "proformaSerie": proforma_doc.get("proformaSerie")})
-    result = collection.insert_one(proforma_doc)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "insert_one", {"account": proforma_doc.get("account"), "proformaSerie": proforma_doc.get("proformaSerie")}, params=1
+    ) as call:
+        result = collection.insert_one(proforma_doc)
+        call.add_docs([proforma_doc])
     return str(result.inserted_id)
 
 
@@ -79,6 +86,9 @@ def save_many(collection, proforma_docs: list) -> list:
     """
     if not proforma_docs:
         return []
-    query_logger.log_mongo(COLLECTION_NAME, "insert_many", {"count": len(proforma_docs)})
-    result = collection.insert_many(proforma_docs, ordered=False)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "insert_many", {"count": len(proforma_docs)}, params=len(proforma_docs)
+    ) as call:
+        result = collection.insert_many(proforma_docs, ordered=False)
+        call.add_docs(proforma_docs)
     return [str(oid) for oid in result.inserted_ids]
@@ -20,8 +20,11 @@ def save(collection, request_doc: dict) -> None:
         collection:   Colección pymongo de proformaRequests.
         request_doc:  Documento construido con build_proforma_request().
     """
-    query_logger.log_mongo(COLLECTION_NAME, "insert_one", {"requestId": request_doc.get("requestId")})
-    collection.insert_one(request_doc)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "insert_one", {"requestId": request_doc.get("requestId")}, params=1
+    ) as call:
+        collection.insert_one(request_doc)
+        call.add_docs([request_doc])
 
 
 def save_many(collection, request_docs: list) -> None:
@@ -34,5 +37,8 @@ def save_many(collection, request_docs: list) -> None:
     """
     if not request_docs:
         return
-    query_logger.log_mongo(COLLECTION_NAME, "insert_many", {"count": len(request_docs)})
-    collection.insert_many(request_docs, ordered=False)
+    with query_logger.profile_mongo(
+        COLLECTION_NAME, "insert_many", {"count": len(request_docs)}, params=len(request_docs)
+    ) as call:
+        collection.insert_many(request_docs, ordered=False)
+        call.add_docs(request_docs)
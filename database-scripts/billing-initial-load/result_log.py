@@ -0,0 +1,82 @@
+"""
+Resultados por OS de una ejecución, volcados a disco a medida que se procesan.
+
+Antes los modos guardaban un dict por OS (con billing_applied y las copias de
+proforma_created / invoice_created) en una lista hasta el final de la ejecución; para
+un mes de datos eso eran varios GB de memoria. ResultLog escribe cada resultado como
+una línea JSON en un archivo de spool (<log>.results.jsonl.part) y en memoria solo
+mantiene el conteo por status. Al final, write_log arma el log JSON con el mismo
+formato de siempre (summary + "results": [...]) leyendo el spool línea a línea.
+
+Si la ejecución se corta antes del final, el spool queda en logs/ con los resultados
+procesados hasta ese momento.
+
+Uso:
+    with ResultLog(logs_dir / "billing-initial-load_legacy_20260110_143200.results.jsonl.part") as results:
+        results.extend(batch_results)
+        ...
+        results.write_log(log_file, log_data)   # log_data sin "results"
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+
+def _dumps_line(result: dict) -> str:
+    return json.dumps(result, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class ResultLog:
+    """
+    Args:
+        spool_path: Archivo JSONL temporal; se borra al escribir el log final.
+    """
+
+    def __init__(self, spool_path: Path):
+        self.spool_path = Path(spool_path)
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        self._spool = open(self.spool_path, "w", encoding="utf-8")
+        self.count = 0
+        self.status_counts = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._spool.closed:
+            self._spool.close()
+        return False
+
+    def append(self, result: dict):
+        self._spool.write(_dumps_line(result))
+        self._spool.write("\n")
+        self.count += 1
+        self.status_counts[result.get("status")] += 1
+
+    def extend(self, results: list):
+        for result in results:
+            self.append(result)
+
+    def write_log(self, log_file: Path, log_data: dict):
+        """
+        Escribe log_data + "results" (leídos del spool) en log_file con indent=2, igual
+        que json.dump del log completo, y borra el spool.
+        """
+        self._spool.close()
+        head = json.dumps({**log_data, "results": []}, indent=2, ensure_ascii=False, default=str)
+        tail = "[]\n}"
+        with open(log_file, "w", encoding="utf-8") as out:
+            out.write(head[: -len(tail)])
+            if not self.count:
+                out.write(tail)
+            else:
+                out.write("[\n")
+                with open(self.spool_path, encoding="utf-8") as spool:
+                    for i, line in enumerate(spool):
+                        if i:
+                            out.write(",\n")
+                        text = json.dumps(json.loads(line), indent=2, ensure_ascii=False)
+                        out.write("    " + text.replace("\n", "\n    "))
+                out.write("\n  ]\n}")
+        self.spool_path.unlink()
@@ -4,6 +4,9 @@ Punto de entrada para billing-initial-load.
 Uso:
     python ./database-scripts/billing-initial-load/run.py
     python ./database-scripts/billing-initial-load/run.py --mode taxDocument
+    python ./database-scripts/billing-initial-load/run.py --mode legacy --progress index
+    python ./database-scripts/billing-initial-load/run.py --mode legacy --estimate
+    python ./database-scripts/billing-initial-load/run.py --mode legacy --index-check strict
 """
 
 import argparse
@@ -46,6 +49,8 @@ if _env_file.exists():
                     os.environ[_key] = _val
 
 import config
+from services.progress_estimator import STRATEGIES as PROGRESS_STRATEGIES
+from services.index_advisor import LEVELS as INDEX_CHECK_LEVELS
 
 # ── Registro de modos ─────────────────────────────────────────────────────────
 # Agregar nuevos modos aquí: "nombre": "modes.nombre_modulo"
@@ -141,9 +146,10 @@ def load_accounts_from_file(file_path: str) -> list:
 # ============================================================================
 
 
-def collect_user_input():
+def collect_user_input(ask_dry_run: bool = True):
     """Recopila fechas, archivo de cuentas y opciones DRY_RUN.
     Si stdin no es interactivo, usa los valores de config.py directamente.
+    Con ask_dry_run=False (--estimate, que nunca escribe) no pregunta por DRY_RUN.
     """
     interactive = sys.stdin.isatty()
 
@@ -173,7 +179,7 @@ def collect_user_input():
     config.ACCOUNTS_FILTER = load_accounts_from_file(config.ACCOUNTS_FILE)
 
     # ── DRY_RUN (solo si terminal interactiva) ────────────────────────────────
-    if interactive:
+    if interactive and ask_dry_run:
         config.DRY_RUN = prompt_yes_no("¿Activar modo DRY_RUN?", config.DRY_RUN)
         if config.DRY_RUN:
             config.DRY_RUN_LIMIT = prompt_int(
@@ -187,12 +193,69 @@ def collect_user_input():
 
 def validate_config():
     """Valida variables de entorno y parámetros requeridos."""
-    for var in ("MONGO_URI", "MONGO_DATABASE", "ORACLE_DSN", "ORACLE_USER", "ORACLE_PASSWORD"):
+    required = ["MONGO_URI", "MONGO_DATABASE"]
+    if config.ORACLE_EXTRACT_CACHE != "replay":
+        required += ["ORACLE_DSN", "ORACLE_USER", "ORACLE_PASSWORD"]
+    for var in required:
         if not getattr(config, var, None):
             raise ValueError(
                 f"{var} no está definida. Agrégala en el archivo .env de la raíz del repo.\n"
                 f"  Ruta esperada: {repo_root / '.env'}"
             )
+    if config.ORACLE_LOOKUP_STRATEGY not in ("collection", "in_list"):
+        raise ValueError(
+            f"ORACLE_LOOKUP_STRATEGY inválida: '{config.ORACLE_LOOKUP_STRATEGY}'.\n"
+            "  Valores permitidos: collection, in_list (ver config.py)."
+        )
+    if config.ORACLE_EXTRACT_CACHE not in ("off", "record", "replay"):
+        raise ValueError(
+            f"ORACLE_EXTRACT_CACHE inválida: '{config.ORACLE_EXTRACT_CACHE}'.\n"
+            "  Valores permitidos: off, record, replay (ver config.py)."
+        )
+    if config.PROGRESS_ESTIMATE not in PROGRESS_STRATEGIES:
+        raise ValueError(
+            f"PROGRESS_ESTIMATE inválida: '{config.PROGRESS_ESTIMATE}'.\n"
+            f"  Valores permitidos: {', '.join(PROGRESS_STRATEGIES)} (ver config.py)."
+        )
+    if not 0 < config.PROGRESS_SAMPLE_RATIO <= 1:
+        raise ValueError("PROGRESS_SAMPLE_RATIO debe estar entre 0 (excluido) y 1.")
+    if config.SCAN_PARALLEL_CURSORS < 1 or config.SCAN_PARTITION_TARGET < 1 or config.SCAN_QUEUE_SIZE < 1:
+        raise ValueError("SCAN_PARALLEL_CURSORS, SCAN_PARTITION_TARGET y SCAN_QUEUE_SIZE deben ser mayores que 0.")
+    if config.MONGO_WRITER_MAX_OPS < 1 or config.MONGO_WRITER_QUEUE_BATCHES < 1 or config.MONGO_WRITER_MAX_WAIT_MS < 1:
+        raise ValueError("MONGO_WRITER_MAX_OPS, MONGO_WRITER_QUEUE_BATCHES y MONGO_WRITER_MAX_WAIT_MS deben ser mayores que 0.")
+    if config.QUERY_PROFILE_EXPLAIN not in ("off", "queryPlanner", "executionStats"):
+        raise ValueError(
+            f"QUERY_PROFILE_EXPLAIN inválida: '{config.QUERY_PROFILE_EXPLAIN}'.\n"
+            "  Valores permitidos: off, queryPlanner, executionStats (ver config.py)."
+        )
+    if config.MONGO_INDEX_CHECK not in INDEX_CHECK_LEVELS:
+        raise ValueError(
+            f"MONGO_INDEX_CHECK inválida: '{config.MONGO_INDEX_CHECK}'.\n"
+            f"  Valores permitidos: {', '.join(INDEX_CHECK_LEVELS)} (ver config.py)."
+        )
+    if config.QUERY_PROFILE_TOP_N < 1:
+        raise ValueError("QUERY_PROFILE_TOP_N debe ser mayor que 0.")
+    if not 0 < config.BATCH_SIZE_MIN <= config.BATCH_SIZE <= config.BATCH_SIZE_MAX:
+        raise ValueError("Se requiere 0 < BATCH_SIZE_MIN <= BATCH_SIZE <= BATCH_SIZE_MAX (ver config.py).")
+    if not 0 < config.ACCOUNT_BATCH_SIZE_MIN <= config.ACCOUNT_BATCH_SIZE <= config.ACCOUNT_BATCH_SIZE_MAX:
+        raise ValueError(
+            "Se requiere 0 < ACCOUNT_BATCH_SIZE_MIN <= ACCOUNT_BATCH_SIZE <= ACCOUNT_BATCH_SIZE_MAX (ver config.py)."
+        )
+    if config.BATCH_TARGET_MS <= 0 or config.ACCOUNT_BATCH_TARGET_S <= 0:
+        raise ValueError("BATCH_TARGET_MS y ACCOUNT_BATCH_TARGET_S deben ser mayores que 0.")
+    if config.ESTIMATE_EXACT_COUNTS < 1 or config.ESTIMATE_SAMPLE_ORDERS < 1 or config.ESTIMATE_DAYS_SAMPLE < 0:
+        raise ValueError(
+            "ESTIMATE_EXACT_COUNTS y ESTIMATE_SAMPLE_ORDERS deben ser mayores que 0 y ESTIMATE_DAYS_SAMPLE >= 0."
+        )
+    if not config.ESTIMATE_WORKERS or any(w < 1 for w in config.ESTIMATE_WORKERS):
+        raise ValueError("ESTIMATE_WORKERS debe ser una lista de enteros mayores que 0 (ej: [1, 2, 4, 8]).")
+    if config.LEGACY_DEDUPE_MAX_KEYS < 1:
+        raise ValueError("LEGACY_DEDUPE_MAX_KEYS debe ser mayor que 0.")
+    if config.MONGO_BULK_WRITE_CONCERN is not None and not isinstance(config.MONGO_BULK_WRITE_CONCERN, dict):
+        raise ValueError(
+            "MONGO_BULK_WRITE_CONCERN debe ser None o un dict de WriteConcern.\n"
+            '  Ejemplo: {"w": 1, "j": False} (ver config.py).'
+        )
     if not config.ACCOUNTS_FILE:
         raise ValueError(
             "ACCOUNTS_FILE no está definida. Ingresa la ruta al archivo de cuentas.\n"
@@ -251,13 +314,36 @@ def main():
         metavar="MODO",
         help=f"Modo de ejecución. Opciones: {', '.join(MODES.keys())}",
     )
+    parser.add_argument(
+        "--progress",
+        choices=PROGRESS_STRATEGIES,
+        help=f"Estimación del total diario para el progreso (default: {config.PROGRESS_ESTIMATE}).",
+    )
+    parser.add_argument(
+        "--index-check",
+        choices=INDEX_CHECK_LEVELS,
+        help=f"Verificación previa de índices MongoDB (default: {config.MONGO_INDEX_CHECK}).",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Estima OS, proformas, invoices y tiempo de ejecución a partir de una muestra, sin escribir.",
+    )
     args = parser.parse_args()
+    if args.progress:
+        config.PROGRESS_ESTIMATE = args.progress
+    if args.index_check:
+        config.MONGO_INDEX_CHECK = args.index_check
 
     mode_name = args.mode if args.mode else _select_mode_interactive()
 
-    collect_user_input()
+    collect_user_input(ask_dry_run=not args.estimate)
     validate_config()
 
+    if args.estimate:
+        importlib.import_module("modes.estimate").run(mode_name)
+        return
+
     mode_module = importlib.import_module(MODES[mode_name])
     mode_module.run()
 
@@ -0,0 +1,65 @@
+"""
+Índice de la ejecución con los billing legacy ya aplicados, para no reescribirlos.
+
+En modo legacy cada lote consulta EEVV_NMR_SERIE de todas sus facturas y actualiza
+también las OS hermanas que no venían en el lote. Las mismas facturas reaparecen en
+lotes y días siguientes, así que sin este índice las mismas OS se reconstruyen y se
+reescriben (y se vuelve a consultar su serie en Oracle) una y otra vez.
+
+  - Pares (orderId, DCBT_NMR_FAC_PF) escritos con proforma: el billing legacy solo
+    depende de la proforma de la factura, así que volver a escribirlo no cambia nada.
+  - Facturas cuya serie completa ya se aplicó con proforma: no se vuelve a consultar
+    batch_find_order_series para ellas.
+
+Los pares escritos sin proforma no se registran: un lote posterior puede encontrar
+(o crear) la proforma y debe reescribirlos. Por lo mismo, una factura con alguna OS del
+lote escrita sin proforma no se registra como completa. Con el escritor async, pares y
+facturas se registran recién cuando el escritor confirma la escritura del lote.
+Es un set exacto (sin falsos positivos);
+al llegar a max_keys deja de registrar y el resto de la ejecución solo reescribe de más.
+"""
+
+import threading
+
+
+class AppliedIndex:
+    """
+    Args:
+        max_keys: Pares (orderId, factura) registrados como máximo (limita la memoria).
+    """
+
+    def __init__(self, max_keys: int = 5_000_000):
+        self._max_keys = max_keys
+        self._pairs = set()
+        self._facturas = set()
+        self._lock = threading.Lock()
+        self._stats = {"updates_skipped": 0, "series_skipped": 0, "full": False}
+
+    def pending_facturas(self, facturas: list) -> list:
+        """Retorna las facturas cuya serie aún no se aplicó completa (cuenta las omitidas)."""
+        with self._lock:
+            pending = [f for f in facturas if f not in self._facturas]
+            self._stats["series_skipped"] += len(facturas) - len(pending)
+        return pending
+
+    def skip(self, order_id: str, dcbt_nmr: str) -> bool:
+        """True si el billing de (orderId, factura) ya se escribió con proforma en esta ejecución."""
+        with self._lock:
+            if (order_id, dcbt_nmr) in self._pairs:
+                self._stats["updates_skipped"] += 1
+                return True
+        return False
+
+    def mark_applied(self, pairs: list, facturas: list = ()):
+        """Registra pares (orderId, factura) escritos con proforma y facturas con la serie aplicada."""
+        with self._lock:
+            if self._stats["full"]:
+                return
+            self._pairs.update(pairs)
+            self._facturas.update(facturas)
+            if len(self._pairs) >= self._max_keys:
+                self._stats["full"] = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pairs": len(self._pairs), "facturas": len(self._facturas)}
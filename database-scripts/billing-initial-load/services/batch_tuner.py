@@ -0,0 +1,101 @@
+"""
+Ajuste de tamaños de lote durante la ejecución según la latencia medida.
+
+El mejor BATCH_SIZE / ACCOUNT_BATCH_SIZE depende del rendimiento de los IN de Oracle,
+de la latencia de los bulk_write de MongoDB y del mix de cuentas del día, así que en
+vez de fijarlos en config.py cada modo usa un SizeController por tamaño:
+
+  - Lote de OS:      objetivo BATCH_TARGET_MS por process_batch. Se ajusta después de
+                     cada lote completo.
+  - Lote de cuentas: objetivo ACCOUNT_BATCH_TARGET_S por lote de cuentas (planificación
+                     + escaneo + procesamiento). Se mide durante el día y el nuevo tamaño
+                     aplica desde el día siguiente (los lotes de cuentas del día ya
+                     están repartidos para la estimación de progreso).
+
+El controlador estima el costo por unidad (ms por OS, s por cuenta) con un promedio
+móvil exponencial y propone target / costo_por_unidad, limitado a [mínimo, máximo] y a
+un factor MAX_STEP por ajuste. Cambios menores a DEADBAND se ignoran para no oscilar.
+"""
+
+from datetime import datetime, timezone
+
+_SMOOTHING = 0.5        # peso de la última medición en el promedio móvil
+_MAX_STEP = 2.0         # un ajuste a lo más duplica o divide a la mitad el tamaño
+_DEADBAND = 0.15        # cambios relativos menores se ignoran
+_MAX_DECISIONS_KEPT = 200
+
+
+class SizeController:
+    """
+    Args:
+        name:     Nombre para logs (ej: "BATCH_SIZE").
+        initial:  Tamaño inicial (el de config.py).
+        min_size: Tamaño mínimo.
+        max_size: Tamaño máximo.
+        target:   Latencia objetivo por lote, en la misma unidad que observe(elapsed).
+        unit:     Unidad de la latencia para los logs ("ms" o "s").
+        enabled:  Si es False el tamaño queda fijo en initial.
+    """
+
+    def __init__(self, name: str, initial: int, min_size: int, max_size: int, target: float, unit: str, enabled: bool = True):
+        self.name = name
+        self.size = initial
+        self._min = min_size
+        self._max = max_size
+        self._target = target
+        self._unit = unit
+        self._enabled = enabled
+        self._per_unit = None
+        self._observations = 0
+        self._decisions = []
+        self._adjustments = 0
+        self._history = [initial]
+
+    def observe(self, size: int, elapsed: float) -> str | None:
+        """
+        Registra la latencia de un lote de `size` unidades y ajusta el tamaño.
+
+        Returns:
+            Texto de la decisión si el tamaño cambió (para imprimir), None si no.
+        """
+        if not self._enabled or size <= 0 or elapsed <= 0:
+            return None
+        self._observations += 1
+        per_unit = elapsed / size
+        self._per_unit = per_unit if self._per_unit is None else (
+            _SMOOTHING * per_unit + (1 - _SMOOTHING) * self._per_unit
+        )
+
+        ideal = self._target / self._per_unit
+        ideal = max(self.size / _MAX_STEP, min(self.size * _MAX_STEP, ideal))
+        new_size = int(max(self._min, min(self._max, round(ideal))))
+        if new_size == self.size or abs(new_size - self.size) / self.size < _DEADBAND:
+            return None
+
+        decision = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "from": self.size,
+            "to": new_size,
+            f"last_{self._unit}": round(elapsed, 1),
+            f"target_{self._unit}": self._target,
+        }
+        self._adjustments += 1
+        if len(self._decisions) < _MAX_DECISIONS_KEPT:
+            self._decisions.append(decision)
+        self.size = new_size
+        self._history.append(new_size)
+        return (
+            f"{self.name} {decision['from']} → {new_size} "
+            f"(último lote {elapsed:.1f} {self._unit}, objetivo {self._target} {self._unit})"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._enabled,
+            "final": self.size,
+            "min_used": min(self._history),
+            "max_used": max(self._history),
+            "observations": self._observations,
+            "adjustments": self._adjustments,
+            "decisions": self._decisions,
+        }
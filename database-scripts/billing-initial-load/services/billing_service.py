@@ -3,7 +3,7 @@ Servicio de billing para billing-initial-load.
 
 Orquesta la lógica de consolidación para un lote de órdenes de servicio:
   1. Separa OS candidatas de las que se deben skipear (ya BILLED o sin taxDocument).
-  2. Consulta Oracle en lote: DCBT (número de proforma) y OSER (costos).
+  2. Consulta Oracle en lote y en paralelo: DCBT (número de proforma) y OSER (costos).
   3. Resuelve proformas: busca en MongoDB por accounts, crea las faltantes.
   4. Verifica invoices existentes por siiFolio.
   5. Construye billing + invoice por cada OS candidata.
@@ -47,18 +47,22 @@ def _make_skip_result(order: dict, status: str, reason: str) -> dict:
     }
 
 
-def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
+def process_batch(batch: list, mongo_db, oracle_pool, dry_run: bool, writer=None) -> tuple[list, dict]:
     """
     Procesa un lote de órdenes y aplica la lógica de billing.
 
     Args:
         batch:       Lista de documentos de orders desde MongoDB.
         mongo_db:    Base de datos pymongo (db object).
-        oracle_conn: Conexión Oracle activa (oracledb.Connection).
+        oracle_pool: Pool Oracle abierto (common.oracle.oracle_client.OraclePool).
         dry_run:     Si True, simula sin escribir en MongoDB.
+        writer:      BackgroundWriter opcional (services.mongo_writer). Si se entrega, el
+                     bulk_write de orders y el insert_many de invoices se encolan y
+                     orders_matched/orders_modified se confirman después vía el writer.
 
     Returns:
-        Lista de result dicts con el detalle de cada OS procesada.
+        Tupla (results, write_stats). write_stats incluye orders_matched, orders_modified
+        y oracle_ms ({consulta: ms} de las consultas Oracle del lote).
     """
     results = []
     candidates = []
@@ -75,15 +79,18 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         candidates.append(order)
 
     if not candidates:
-        return results
+        return results, {"orders_matched": 0, "orders_modified": 0, "oracle_ms": {}}
 
-    # ── Paso 2: consultas Oracle en lote ─────────────────────────────────────
+    # ── Paso 2: consultas Oracle en lote (DCBT y OSER son independientes) ────
     reference_orders = [o.get("referenceOrder", "") for o in candidates]
     valid_refs = [r for r in reference_orders if r]
 
-    with oracle_conn.cursor() as cursor:
-        dcbt_map = legacy_repository.batch_find_dcbt(cursor, valid_refs)
-        oser_map = legacy_repository.batch_find_oser(cursor, valid_refs)
+    lookups, oracle_ms = legacy_repository.run_concurrent_lookups(oracle_pool, {
+        "dcbt": (legacy_repository.batch_find_dcbt, valid_refs),
+        "oser": (legacy_repository.batch_find_oser, valid_refs),
+    })
+    dcbt_map = lookups["dcbt"]
+    oser_map = lookups["oser"]
 
     # ── Paso 3: lookup masivo de proformas en MongoDB por accounts (R-07) ────
     proformas_col = mongo_db[proforma_repository.COLLECTION_NAME]
@@ -110,27 +117,28 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
     missing_dcbt_ids = set()
     for order in candidates:
         ref = order.get("referenceOrder", "")
-        dcbt_nmr = dcbt_map.get(ref)
+        dcbt_nmr = (dcbt_map.get(ref) or {}).get("dcbt_nmr_fac_pf")
         account = (order.get("seller") or {}).get("account", "")
         if dcbt_nmr and (account, str(dcbt_nmr)) not in proforma_map:
             missing_dcbt_ids.add(str(dcbt_nmr))
 
-    proforma_data_map = {}
-    if missing_dcbt_ids:
-        with oracle_conn.cursor() as cursor:
-            for dcbt_nmr in missing_dcbt_ids:
-                pf_data = legacy_repository.find_proforma_data(cursor, dcbt_nmr)
-                if pf_data:
-                    proforma_data_map[dcbt_nmr] = pf_data
+    # Una sola consulta batch (en vez de una por factura) para que también pase por
+    # el snapshot local cuando está activo.
+    lookups, pf_ms = legacy_repository.run_concurrent_lookups(oracle_pool, {
+        "proforma_data": (legacy_repository.batch_find_proforma_data_bulk, list(missing_dcbt_ids)),
+    })
+    oracle_ms.update(pf_ms)
+    proforma_data_map = lookups["proforma_data"]
 
     # ── Paso 5: verificar invoices existentes ────────────────────────────────
     sii_folios_in_batch = [
-        (o.get("taxDocument") or {}).get("siiDocumentId", "")
-        for o in candidates
+        f for f in ((o.get("taxDocument") or {}).get("siiDocumentId", "") for o in candidates) if f
     ]
-    existing_folios = invoice_repository.find_existing_sii_folios(
-        invoices_col, [f for f in sii_folios_in_batch if f]
-    )
+    # Los encolados se leen ANTES de consultar Mongo: si su insert_many termina entre
+    # ambas lecturas, la consulta a Mongo ya lo ve (al revés quedaría fuera de las dos).
+    queued_folios = writer.queued_sii_folios(sii_folios_in_batch) if writer is not None else set()
+    existing_folios = invoice_repository.find_existing_sii_folios(invoices_col, sii_folios_in_batch)
+    existing_folios |= queued_folios
 
     # ── Paso 6: construir billing + invoice por cada candidata ───────────────
     billing_updates = []
@@ -143,7 +151,7 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         tax_doc = order.get("taxDocument") or {}
         sii_folio = tax_doc.get("siiDocumentId", "")
 
-        dcbt_nmr = dcbt_map.get(ref_order)
+        dcbt_nmr = (dcbt_map.get(ref_order) or {}).get("dcbt_nmr_fac_pf")
         oser_data = oser_map.get(ref_order, {})
 
         proforma_doc = None
@@ -222,8 +230,10 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         results.append(result)
 
     # ── Paso 7: escrituras masivas en MongoDB ────────────────────────────────
-    write_stats = {"orders_matched": 0, "orders_modified": 0}
-    if not dry_run:
+    write_stats = {"orders_matched": 0, "orders_modified": 0, "oracle_ms": oracle_ms}
+    if not dry_run and writer is not None:
+        writer.submit(billing_updates, invoices_to_create)
+    elif not dry_run:
         if billing_updates:
             mongo_result = order_repository.bulk_write_billing(orders_col, billing_updates)
             write_stats["orders_matched"] = mongo_result["matched"]
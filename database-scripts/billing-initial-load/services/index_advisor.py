@@ -0,0 +1,258 @@
+"""
+Verificación previa de índices MongoDB para las consultas de billing-initial-load.
+
+El cursor de orders fuerza .hint(ACCOUNT_EMISSION_INDEX) y los conteos de progreso y
+de particionado usan el mismo hint; los lookups de proformas (account) e invoices
+(siiFolio, + type en legacy) suponen índices que nadie verificaba. Un índice faltante
+recién se notaba horas después: el hint falla con un error, y sin hint la consulta
+pasa a COLLSCAN y el lote tarda minutos.
+
+check() se ejecuta al inicio de cada modo, antes de procesar el primer lote:
+  1. index_information() de cada colección que toca la ejecución, y por cada forma
+     de consulta el índice que la cubre (exacto si la consulta usa hint, o con los
+     campos requeridos como prefijo).
+  2. explain (queryPlanner) de un filtro representativo de cada forma (primer día del
+     rango, primer lote de cuentas): etapas del plan ganador e índice usado.
+  3. $indexStats de esas colecciones, para reportar al final de la ejecución cuántas
+     veces se usó cada índice (usage_delta).
+
+Problemas reportados:
+  - MISSING:     una forma con hint no tiene su índice exacto (la consulta fallará).
+  - COLLSCAN:    el plan ganador recorre la colección completa.
+  - OTHER_INDEX: el plan usa un índice distinto al esperado (sin hint).
+  - NO_INDEX:    no hay un índice con los campos requeridos como prefijo.
+"""
+
+from datetime import datetime, timezone
+
+import query_logger
+from repositories import invoice_repository, order_repository, proforma_repository
+
+LEVELS = ("off", "warn", "strict")
+
+# Tipo de invoice de las facturas legacy (ver legacy_service, Paso de invoices)
+_LEGACY_INVOICE_TYPE = "12"
+
+
+def _key_fields(keys) -> list:
+    return [field for field, _ in keys]
+
+
+def _norm_direction(direction):
+    """1 / -1 como int (el servidor puede retornar 1.0); "text", "hashed", ... sin cambios."""
+    return int(direction) if isinstance(direction, (int, float)) else direction
+
+
+def _fmt_keys(keys) -> str:
+    return "{" + ", ".join(f"{field}: {_norm_direction(direction)}" for field, direction in keys) + "}"
+
+
+def _shapes(mode_name: str, day_start: datetime, day_end: datetime, accounts: list) -> list:
+    """
+    Formas de consulta de la ejecución con un filtro representativo.
+
+    Cada forma: collection, operation, filter, projection, keys (índice esperado),
+    hinted (la consulta fuerza ese índice) y used_by (descripción para el reporte).
+    """
+    emission = {"$gte": day_start, "$lt": day_end}
+    orders_filter = {
+        "emissionDate": emission,
+        "billing.status": {"$ne": "BILLED"},
+        "seller.account": {"$in": accounts},
+    }
+    orders_projection = {"orderId": 1, "emissionDate": 1, "referenceOrder": 1, "seller.account": 1, "billing": 1}
+    if mode_name == "taxDocument":
+        orders_filter["taxDocument"] = {"$exists": True, "$ne": None}
+        orders_projection["taxDocument"] = 1
+    invoices_filter = {"siiFolio": {"$in": ["0"]}}
+    if mode_name == "legacy":
+        invoices_filter["type"] = _LEGACY_INVOICE_TYPE
+
+    return [
+        {
+            "collection": order_repository.COLLECTION_NAME,
+            "operation": "find",
+            "filter": orders_filter,
+            "projection": orders_projection,
+            "keys": order_repository.ACCOUNT_EMISSION_INDEX,
+            "hinted": True,
+            "used_by": "cursor por lote de cuentas",
+        },
+        {
+            "collection": order_repository.COLLECTION_NAME,
+            "operation": "count",
+            "filter": {"seller.account": {"$in": accounts}, "emissionDate": emission},
+            "projection": None,
+            "keys": order_repository.ACCOUNT_EMISSION_INDEX,
+            "hinted": True,
+            "used_by": "conteos solo-índice (progreso y sub-rangos)",
+        },
+        {
+            "collection": proforma_repository.COLLECTION_NAME,
+            "operation": "find",
+            "filter": {"account": {"$in": accounts}},
+            "projection": {"_id": 1, "account": 1, "proformaSerie": 1},
+            "keys": [("account", 1)],
+            "hinted": False,
+            "used_by": "proformas por cuentas del lote",
+        },
+        {
+            "collection": invoice_repository.COLLECTION_NAME,
+            "operation": "find",
+            "filter": invoices_filter,
+            "projection": {"siiFolio": 1, "_id": 0},
+            "keys": [("siiFolio", 1)],
+            "hinted": False,
+            "used_by": "siiFolios existentes",
+        },
+    ]
+
+
+def _find_index(indexes: dict, keys: list, exact: bool) -> str | None:
+    """Nombre del índice con esas claves (exacto) o con esos campos como prefijo."""
+    wanted = [(field, _norm_direction(direction)) for field, direction in keys]
+    wanted_fields = _key_fields(keys)
+    prefix_match = None
+    for name, info in indexes.items():
+        index_keys = [(field, _norm_direction(direction)) for field, direction in info.get("key", [])]
+        if index_keys == wanted:
+            return name
+        if not exact and prefix_match is None and _key_fields(index_keys)[: len(wanted_fields)] == wanted_fields:
+            prefix_match = name
+    return prefix_match
+
+
+def _covers(indexes: dict, index_name: str | None, keys: list) -> bool:
+    """True si index_name tiene los campos de keys como prefijo."""
+    info = indexes.get(index_name) if index_name else None
+    if info is None:
+        return False
+    return _key_fields(info.get("key", []))[: len(keys)] == _key_fields(keys)
+
+
+def _explain(mongo_db, shape: dict) -> dict:
+    if shape["operation"] == "count":
+        command = {"count": shape["collection"], "query": shape["filter"]}
+    else:
+        command = {"find": shape["collection"], "filter": shape["filter"], "projection": shape["projection"]}
+    if shape["hinted"]:
+        command["hint"] = dict(shape["keys"])
+    return mongo_db.command({"explain": command, "verbosity": "queryPlanner"})
+
+
+def index_usage(mongo_db, collections: list) -> dict | None:
+    """accesses.ops por índice ({colección: {índice: ops}}), o None si $indexStats no está permitido."""
+    usage = {}
+    try:
+        for name in collections:
+            usage[name] = {
+                stat["name"]: int(stat["accesses"]["ops"])
+                for stat in mongo_db[name].aggregate([{"$indexStats": {}}])
+            }
+    except Exception:
+        return None
+    return usage
+
+
+def usage_delta(mongo_db, before: dict | None) -> dict | None:
+    """Usos de cada índice desde el snapshot de check() (solo índices con usos)."""
+    if before is None:
+        return None
+    after = index_usage(mongo_db, list(before))
+    if after is None:
+        return None
+    delta = {}
+    for collection, per_index in after.items():
+        used = {
+            name: ops - before[collection].get(name, 0)
+            for name, ops in per_index.items()
+            if ops - before[collection].get(name, 0) > 0
+        }
+        delta[collection] = dict(sorted(used.items(), key=lambda item: item[1], reverse=True))
+    return delta
+
+
+def check(mongo_db, mode_name: str, day_start: datetime, day_end: datetime, accounts: list) -> dict:
+    """
+    Verifica índices y planes de las formas de consulta del modo.
+
+    Args:
+        mongo_db:  Base de datos MongoDB.
+        mode_name: "taxDocument" o "legacy".
+        day_start: Inicio del primer día del rango (filtro representativo).
+        day_end:   Fin del primer día del rango.
+        accounts:  Primer lote de cuentas (filtro representativo).
+
+    Returns:
+        Reporte con indexes (por colección), shapes (índice esperado, encontrado y plan),
+        problems (lista de textos) y usage_before ($indexStats al inicio).
+    """
+    shapes = _shapes(mode_name, day_start, day_end, accounts)
+    collections = list(dict.fromkeys(shape["collection"] for shape in shapes))
+    indexes = {name: mongo_db[name].index_information() for name in collections}
+
+    problems = []
+    checked = []
+    for shape in shapes:
+        found = _find_index(indexes[shape["collection"]], shape["keys"], exact=shape["hinted"])
+        label = f"{shape['collection']}.{shape['operation']} ({shape['used_by']})"
+        entry = {
+            "collection": shape["collection"],
+            "operation": shape["operation"],
+            "used_by": shape["used_by"],
+            "expected": _fmt_keys(shape["keys"]),
+            "hinted": shape["hinted"],
+            "index": found,
+            "plan": None,
+            "status": "OK",
+        }
+        checked.append(entry)
+
+        if found is None and shape["hinted"]:
+            entry["status"] = "MISSING"
+            problems.append(
+                f"{label}: falta el índice {entry['expected']}; la consulta usa hint y fallará."
+            )
+            continue
+        if found is None:
+            entry["status"] = "NO_INDEX"
+            problems.append(f"{label}: no hay un índice con prefijo {entry['expected']}.")
+
+        try:
+            plan = query_logger.summarize_explain(_explain(mongo_db, shape))
+        except Exception as e:
+            entry["plan"] = {"explain_error": str(e)}
+            problems.append(f"{label}: explain falló ({e}).")
+            continue
+        entry["plan"] = plan
+
+        if "COLLSCAN" in plan["stages"]:
+            entry["status"] = "COLLSCAN"
+            problems.append(f"{label}: el plan recorre la colección completa (COLLSCAN).")
+        elif found is not None and not _covers(indexes[shape["collection"]], plan["index"], shape["keys"]):
+            entry["status"] = "OTHER_INDEX"
+            problems.append(f"{label}: el plan usa {plan['index']} en vez de {found}.")
+
+    return {
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+        "indexes": {
+            name: {index_name: _fmt_keys(info.get("key", [])) for index_name, info in per_collection.items()}
+            for name, per_collection in indexes.items()
+        },
+        "shapes": checked,
+        "problems": problems,
+        "usage_before": index_usage(mongo_db, collections),
+    }
+
+
+def print_report(report: dict):
+    print("  Índices MongoDB:")
+    for entry in report["shapes"]:
+        plan = entry["plan"] or {}
+        stages = " > ".join(s for s in plan.get("stages", []) if s) or "-"
+        print(
+            f"    [{entry['status']:<11}] {entry['collection']}.{entry['operation']:<5} "
+            f"{entry['index'] or entry['expected']} | {stages}"
+        )
+    for problem in report["problems"]:
+        print(f"    ⚠  {problem}")
@@ -10,16 +10,19 @@ Flujo por lote:
      La lista DISTINCT de facturas se deriva de los valores del mapa resultante.
   3. Cargar proformas MongoDB por accounts del lote → map (account, dcbt_nmr) → proforma.
   4. Detectar facturas sin proforma existente.
-  5. Consultar Oracle batch: datos de proforma para las faltantes.
+  5. Consultar Oracle en paralelo (consultas independientes entre sí, cada una con
+     su propia conexión del pool):
+       - datos de proforma para las facturas faltantes,
+       - OAPV/DEMV: siiFolio + siiDocumentPath por DCBT_NMR_FAC_REAL,
+       - EEVV_NMR_SERIE → DCBT_NMR_FAC_PF para TODAS las facturas del lote
+         (esto puede actualizar más órdenes que las del batch original), salvo las
+         que el AppliedIndex de la ejecución ya aplicó completas.
   6. Crear proformas faltantes en MongoDB.
-  6b. Recopilar DCBT_NMR_FAC_REAL del batch.
-  6c. Consultar Oracle OAPV/DEMV: siiFolio + siiDocumentPath por DCBT_NMR_FAC_REAL.
-  6d. Pre-calcular siiFolios del batch (regla: proforma existente con siiFolio → usarlo; si no, Oracle).
-  6e. Verificar en MongoDB qué invoices ya existen (filtrando por siiFolio + type='12').
-  7. Consultar Oracle: EEVV_NMR_SERIE → DCBT_NMR_FAC_PF para TODAS las facturas del lote.
-     Esto puede actualizar más órdenes que las del batch original.
-  8. Construir billing + invoice legacy para cada orden con su proforma.
-  9. bulk_write masivo sobre orders + insert_many invoices.
+  6b. Pre-calcular siiFolios del batch (regla: proforma existente con siiFolio → usarlo; si no, Oracle).
+  6c. Verificar en MongoDB qué invoices ya existen (filtrando por siiFolio + type='12').
+  7. Construir billing + invoice legacy para cada orden con su proforma.
+  8. bulk_write masivo sobre orders + insert_many invoices. Los pares (orderId, factura)
+     que el AppliedIndex ya registró como escritos con proforma no se reescriben.
 
 Statuses de resultado:
   - UPDATED:                  Billing actualizado con proforma asociada.
@@ -57,24 +60,26 @@ def _make_skip_result(order: dict, status: str, reason: str) -> dict:
     }
 
 
-def _chunks(lst: list, size: int):
-    """Divide una lista en sublistas de hasta `size` elementos (límite Oracle IN)."""
-    for i in range(0, len(lst), size):
-        yield lst[i: i + size]
-
-
-def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
+def process_batch(batch: list, mongo_db, oracle_pool, dry_run: bool, writer=None, applied=None) -> tuple[list, dict]:
     """
     Procesa un lote de órdenes en modo legacy y aplica la lógica de billing.
 
     Args:
         batch:       Lista de documentos de orders desde MongoDB.
         mongo_db:    Base de datos pymongo (db object).
-        oracle_conn: Conexión Oracle activa (oracledb.Connection).
+        oracle_pool: Pool Oracle abierto (common.oracle.oracle_client.OraclePool).
         dry_run:     Si True, simula sin escribir en MongoDB.
+        writer:      BackgroundWriter opcional (services.mongo_writer). Si se entrega, el
+                     bulk_write de orders y el insert_many de invoices se encolan y
+                     orders_matched/orders_modified se confirman después vía el writer.
+        applied:     AppliedIndex opcional (services.applied_index) compartido por toda la
+                     ejecución: omite reescrituras y consultas de serie ya aplicadas. Con
+                     writer, lo aplicado por el lote viaja como tag del submit y se registra
+                     cuando take_confirmed() lo confirma (ver modes/legacy._collect_writes).
 
     Returns:
-        Lista de result dicts con el detalle de cada OS procesada.
+        Tupla (results, write_stats). write_stats incluye orders_matched, orders_modified
+        y oracle_ms ({consulta: ms} de las consultas Oracle del lote).
     """
     results = []
     candidates = []
@@ -88,7 +93,7 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         candidates.append(order)
 
     if not candidates:
-        return results
+        return results, {"orders_matched": 0, "orders_modified": 0, "oracle_ms": {}}
 
     # ── Paso 2: obtener referenceOrders válidos del lote ─────────────────────
     reference_orders = [o.get("referenceOrder", "") for o in candidates]
@@ -119,11 +124,11 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
     # Consulta Oracle: DCBT_NMR_FAC_PF + DCBT_NMR_FAC_REAL por referenceOrder.
     # Su resultado también sirve para derivar all_facturas (DISTINCT DCBT_NMR_FAC_PF),
     # eliminando la necesidad de batch_find_dcbt_distinct como query separada.
-    ref_to_dcbt = {}  # {ref: {"dcbt_nmr_fac_pf": str, "dcbt_nmr_fac_real": str|None}}
-    if valid_refs:
-        with oracle_conn.cursor() as cursor:
-            for chunk in _chunks(valid_refs, 1000):
-                ref_to_dcbt.update(legacy_repository.batch_find_dcbt(cursor, chunk))
+    # ref_to_dcbt: {ref: {"dcbt_nmr_fac_pf": str, "dcbt_nmr_fac_real": str|None}}
+    lookups, oracle_ms = legacy_repository.run_concurrent_lookups(oracle_pool, {
+        "dcbt": (legacy_repository.batch_find_dcbt, valid_refs),
+    })
+    ref_to_dcbt = lookups["dcbt"]
 
     # all_facturas: DISTINCT DCBT_NMR_FAC_PF derivado del paso anterior (evita query extra a Oracle)
     all_facturas = list({
@@ -144,15 +149,29 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         if account and (account, dcbt_nmr) not in proforma_map:
             missing_facturas.add(dcbt_nmr)
 
-    # ── Paso 5: consultar Oracle batch para proformas faltantes ──────────────
-    proforma_data_map = {}
-    if missing_facturas:
-        missing_list = list(missing_facturas)
-        with oracle_conn.cursor() as cursor:
-            for chunk in _chunks(missing_list, 1000):
-                proforma_data_map.update(
-                    legacy_repository.batch_find_proforma_data_bulk(cursor, chunk)
-                )
+    # DCBT_NMR_FAC_REAL del batch (clave de OAPV/DEMV)
+    all_dcbt_nmr_reals = list({
+        dcbt_data["dcbt_nmr_fac_real"]
+        for dcbt_data in ref_to_dcbt.values()
+        if dcbt_data.get("dcbt_nmr_fac_real")
+    })
+
+    # ── Paso 5: consultas Oracle independientes, en paralelo ─────────────────
+    #   proforma_data: datos de proforma para las facturas faltantes
+    #   invoice_data:  {dcbt_nmr_fac_real: {"sii_folio": str, "sii_document_path": str|None}}
+    #   order_series:  {orderId: dcbt_nmr} para las facturas del lote cuya serie no se
+    #                  aplicó completa en un lote anterior; puede recuperar más órdenes
+    #                  que las del batch original.
+    series_facturas = applied.pending_facturas(all_facturas) if applied is not None else all_facturas
+    lookups, wave_ms = legacy_repository.run_concurrent_lookups(oracle_pool, {
+        "proforma_data": (legacy_repository.batch_find_proforma_data_bulk, list(missing_facturas)),
+        "invoice_data": (legacy_repository.batch_find_invoice_data, all_dcbt_nmr_reals),
+        "order_series": (legacy_repository.batch_find_order_series, series_facturas),
+    })
+    oracle_ms.update(wave_ms)
+    proforma_data_map = lookups["proforma_data"]
+    invoice_data_map = lookups["invoice_data"]
+    order_series_map = lookups["order_series"]
 
     # ── Paso 6: crear proformas faltantes en MongoDB ──────────────────────────
     # Para crear la proforma necesitamos el account, que obtenemos a través del
@@ -199,23 +218,7 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
             proforma_map[(account, dcbt_nmr)] = new_proforma
             created_dcbt_nmrs.add(dcbt_nmr)
 
-    # ── Paso 6b: recopilar todos los DCBT_NMR_FAC_REAL del batch ─────────────
-    all_dcbt_nmr_reals = list({
-        dcbt_data["dcbt_nmr_fac_real"]
-        for dcbt_data in ref_to_dcbt.values()
-        if dcbt_data.get("dcbt_nmr_fac_real")
-    })
-
-    # ── Paso 6c: consultar Oracle: siiFolio + siiDocumentPath ────────────────
-    invoice_data_map = {}  # {dcbt_nmr_fac_real: {"sii_folio": str, "sii_document_path": str|None}}
-    if all_dcbt_nmr_reals:
-        with oracle_conn.cursor() as cursor:
-            for chunk in _chunks(all_dcbt_nmr_reals, 1000):
-                invoice_data_map.update(
-                    legacy_repository.batch_find_invoice_data(cursor, chunk)
-                )
-
-    # ── Paso 6d: pre-calcular siiFolios del batch para chequeo de existencia ──
+    # ── Paso 6b: pre-calcular siiFolios del batch para chequeo de existencia ──
     # Regla:
     #   - Si la proforma EXISTÍA (FOUND) y tiene siiFolio → usar proforma.siiFolio
     #   - En cualquier otro caso (proforma CREATED o sin siiFolio) → usar Oracle
@@ -237,23 +240,18 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         if sii_folio_pre:
             all_sii_folios_in_batch.add(sii_folio_pre)
 
-    # ── Paso 6e: verificar invoices existentes en MongoDB ────────────────────
+    # ── Paso 6c: verificar invoices existentes en MongoDB ────────────────────
+    # Los encolados en el writer se leen antes de consultar Mongo (ver billing_service, Paso 5).
+    queued_folios = (
+        writer.queued_sii_folios(list(all_sii_folios_in_batch), invoice_type="12")
+        if writer is not None else set()
+    )
     existing_folios = invoice_repository.find_existing_sii_folios(
         invoices_col, list(all_sii_folios_in_batch), invoice_type="12"
     )
+    existing_folios |= queued_folios
 
-    # ── Paso 7: mapeo orderId → dcbt_nmr para TODAS las facturas del lote ─────
-    # Este paso puede recuperar más órdenes que las del batch original
-    # (todas las órdenes Oracle asociadas a esas facturas).
-    order_series_map = {}  # {orderId: dcbt_nmr}
-    if all_facturas:
-        with oracle_conn.cursor() as cursor:
-            for chunk in _chunks(all_facturas, 1000):
-                order_series_map.update(
-                    legacy_repository.batch_find_order_series(cursor, chunk)
-                )
-
-    # Mapa plano dcbt_nmr → proforma_doc para las órdenes extra (paso 7).
+    # Mapa plano dcbt_nmr → proforma_doc para las órdenes extra (order_series_map).
     # En ese caso no tenemos el account de la orden, pero sí sabemos que la
     # proforma existe en proforma_map porque fue creada o encontrada en este batch.
     # Cada dcbt_nmr identifica unívocamente a una proforma.
@@ -261,9 +259,11 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
     for (_, dcbt_nmr_key), proforma_doc_val in proforma_map.items():
         dcbt_to_proforma_doc[dcbt_nmr_key] = proforma_doc_val
 
-    # ── Paso 8: construir billing + invoice y acumular updates masivos ───────
+    # ── Paso 7: construir billing + invoice y acumular updates masivos ───────
     billing_updates = []
     invoices_to_create = []
+    applied_pairs = []   # (orderId, dcbt_nmr) escritos con proforma en este lote
+    facturas_without_proforma = set()   # facturas con alguna OS del lote escrita sin proforma
 
     # Procesar las órdenes del batch original
     for order in candidates:
@@ -286,11 +286,22 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
                 proforma_action = "CREATED" if dcbt_nmr in created_dcbt_nmrs else "FOUND"
             else:
                 proforma_action = "NOT_FOUND"
+            if not proforma_doc:
+                # Cuenta distinta o vacía, o proforma no encontrada: la serie de la factura
+                # queda pendiente para que un lote posterior reescriba esta OS con proforma.
+                facturas_without_proforma.add(dcbt_nmr)
 
         billing_doc = entities.build_billing_legacy(order, proforma_doc)
 
-        if not dry_run:
+        # El billing legacy solo depende de la proforma: si un lote anterior ya lo
+        # escribió con proforma (p. ej. como OS extra de la factura) no se reescribe.
+        already_applied = bool(
+            applied is not None and proforma_doc and applied.skip(order_id, dcbt_nmr)
+        )
+        if not dry_run and not already_applied:
             billing_updates.append({"orderId": order_id, "billing": billing_doc})
+        if proforma_doc and not already_applied:
+            applied_pairs.append((order_id, dcbt_nmr))
 
         # ── Invoice ──────────────────────────────────────────────────────────
         # Resolver siiFolio: usar el de la proforma si existía y lo tiene;
@@ -318,6 +329,9 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         if dry_run:
             status_val = "DRY_RUN"
             reason = "Modo DRY_RUN activo"
+        elif proforma_doc and already_applied:
+            status_val = "UPDATED"
+            reason = "Billing ya aplicado con proforma en un lote anterior (sin reescritura)"
         elif proforma_doc:
             status_val = "UPDATED"
             reason = "Billing actualizado con proforma"
@@ -346,12 +360,14 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
 
         results.append(result)
 
-    # Procesar órdenes adicionales descubiertas en paso 7 (no estaban en el batch)
+    # Procesar órdenes adicionales descubiertas en order_series_map (no estaban en el batch)
     batch_order_ids = {o.get("orderId", "") for o in candidates}
     extra_updates = []
     for order_id, dcbt_nmr in order_series_map.items():
         if order_id in batch_order_ids:
             continue  # ya procesada arriba
+        if applied is not None and applied.skip(order_id, dcbt_nmr):
+            continue  # ya escrita con proforma en un lote anterior
 
         # Para órdenes extra no tenemos el account directamente.
         # Usamos el mapa plano dcbt_nmr → proforma_doc para garantizar que
@@ -361,10 +377,23 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
 
         if not dry_run:
             extra_updates.append({"orderId": order_id, "billing": billing_doc})
-
-    # ── Paso 9: escrituras masivas en MongoDB ─────────────────────────────────
-    write_stats = {"orders_matched": 0, "orders_modified": 0}
-    if not dry_run:
+        if proforma_doc:
+            applied_pairs.append((order_id, dcbt_nmr))
+
+    # Una factura queda completa cuando se consultó su serie, tiene proforma y todas sus
+    # OS (las del lote y las extra) se escriben con ella.
+    complete_facturas = [
+        f for f in series_facturas
+        if f in dcbt_to_proforma_doc and f not in facturas_without_proforma
+    ]
+    applied_tag = (applied_pairs, complete_facturas) if applied is not None else None
+
+    # ── Paso 8: escrituras masivas en MongoDB ─────────────────────────────────
+    write_stats = {"orders_matched": 0, "orders_modified": 0, "oracle_ms": oracle_ms}
+    if not dry_run and writer is not None:
+        # Lo aplicado se registra cuando el writer confirma la escritura (take_confirmed)
+        writer.submit(billing_updates + extra_updates, invoices_to_create, tag=applied_tag)
+    elif not dry_run:
         all_updates = billing_updates + extra_updates
         if all_updates:
             mongo_result = order_repository.bulk_write_billing(orders_col, all_updates)
@@ -373,4 +402,9 @@ def process_batch(batch: list, mongo_db, oracle_conn, dry_run: bool) -> list:
         if invoices_to_create:
             invoice_repository.save_many(invoices_col, invoices_to_create)
 
+    # Sin writer, registrar lo aplicado recién después de escribir: si el lote falla
+    # antes, el siguiente intento no lo omite.
+    if applied_tag is not None and (dry_run or writer is None):
+        applied.mark_applied(*applied_tag)
+
     return results, write_stats
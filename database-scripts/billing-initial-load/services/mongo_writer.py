@@ -0,0 +1,290 @@
+"""
+Escritor en segundo plano para las escrituras masivas de billing-initial-load.
+
+process_batch encola los updates de billing (orders) y las invoices nuevas en vez
+de esperar el acknowledge de MongoDB; un hilo las junta entre lotes y las envía en
+bulk_write / insert_many de hasta max_ops operaciones. Así la lectura del cursor y
+las consultas Oracle del lote siguiente no esperan a las escrituras del anterior.
+
+Las proformas (y sus proformaRequests) siguen siendo síncronas: su _id se necesita
+en el mismo lote para construir el billing.
+
+Uso:
+    with BackgroundWriter(mongo_db, max_ops=5000) as writer:
+        ...process_batch(batch, mongo_db, oracle_pool, dry_run, writer=writer)
+        confirmed = writer.take_confirmed()   # matched/modified/errores y tags confirmados
+        writer.flush()                        # fin de día: espera lo pendiente
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+from repositories import invoice_repository, order_repository
+
+_STOP = object()
+_MAX_ERRORS_KEPT = 20
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Submit:
+    """Operaciones de un submit aún sin escribir; su tag se confirma si todas se escriben sin error."""
+
+    def __init__(self, tag, pending: int):
+        self.tag = tag
+        self.pending = pending
+        self.failed = False
+
+
+class BackgroundWriter:
+    """
+    Junta updates de orders e inserts de invoices de varios lotes y los escribe en un hilo.
+
+    Args:
+        mongo_db:         Base de datos pymongo.
+        max_ops:          Operaciones por bulk_write / insert_many.
+        max_queue:        Lotes encolados como máximo; con la cola llena submit() bloquea
+                          (backpressure para no acumular memoria si Mongo va más lento).
+        max_wait_ms:      Tiempo máximo que un lote espera en el hilo antes de escribirse
+                          aunque no se haya llegado a max_ops.
+        write_concern:    Dict para WriteConcern (ej: {"w": 1, "j": False}) o None para el
+                          default de la conexión.
+    """
+
+    def __init__(self, mongo_db, max_ops: int = 5000, max_queue: int = 4, max_wait_ms: int = 500, write_concern: dict = None):
+        wc = WriteConcern(**write_concern) if write_concern else None
+        self._orders_col = mongo_db[order_repository.COLLECTION_NAME]
+        self._invoices_col = mongo_db[invoice_repository.COLLECTION_NAME]
+        if wc is not None:
+            self._orders_col = self._orders_col.with_options(write_concern=wc)
+            self._invoices_col = self._invoices_col.with_options(write_concern=wc)
+
+        self._max_ops = max_ops
+        self._max_wait_s = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._updates = []
+        self._invoices = []
+        # siiFolios encolados y aún no escritos: un lote posterior puede consultar invoices
+        # en Mongo antes de que se escriban, así que los servicios los suman a los folios
+        # existentes. Se cuentan (un folio puede venir en más de un lote) y se descuentan
+        # al terminar el insert_many de su bloque: una vez escrito, Mongo ya responde.
+        # Por eso los servicios leen queued_sii_folios ANTES de consultar Mongo.
+        self._queued_folios = Counter()
+        self._queued_folio_types = Counter()
+        self._confirmed = self._empty_confirmed()
+        self._stats = {
+            "submits": 0,
+            "bulk_writes": 0,
+            "insert_manys": 0,
+            "ops_written": 0,
+            "write_ms_total": 0.0,
+            "write_ms_max": 0.0,
+            "queue_depth_max": 0,
+            "queue_depth_total": 0,
+            "submit_wait_ms_total": 0.0,
+            "write_errors": 0,
+            "errors": [],
+        }
+
+    # ── Ciclo de vida ────────────────────────────────────────────────────────
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    # ── API para el loop de procesamiento ────────────────────────────────────
+
+    def submit(self, updates: list, invoices: list, tag=None):
+        """
+        Encola los updates de billing e invoices de un lote (bloquea si la cola está llena).
+
+        tag es opcional y opaco: cuando todas las operaciones del submit se escribieron sin
+        error aparece en take_confirmed()["tags"] (p. ej. lo aplicado por el lote, que solo
+        se registra una vez confirmado).
+        """
+        if not updates and not invoices:
+            if tag is not None:
+                with self._lock:
+                    self._confirmed["tags"].append(tag)
+            return
+        with self._lock:
+            for doc in invoices:
+                self._queued_folios[doc.get("siiFolio")] += 1
+                self._queued_folio_types[(doc.get("siiFolio"), doc.get("type"))] += 1
+        depth = self._queue.qsize()
+        start = time.perf_counter()
+        self._queue.put((_Submit(tag, len(updates) + len(invoices)), updates, invoices))
+        waited = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["submits"] += 1
+            self._stats["queue_depth_total"] += depth
+            self._stats["queue_depth_max"] = max(self._stats["queue_depth_max"], depth)
+            self._stats["submit_wait_ms_total"] += waited
+
+    def queued_sii_folios(self, sii_folios: list, invoice_type: str = None) -> set:
+        """
+        Retorna los siiFolios de la lista encolados como invoice y aún no escritos (opcionalmente por type).
+
+        Debe llamarse antes de find_existing_sii_folios: un folio que se libera entre ambas
+        llamadas ya está escrito cuando se consulta Mongo.
+        """
+        with self._lock:
+            if invoice_type is None:
+                return {f for f in sii_folios if f in self._queued_folios}
+            return {f for f in sii_folios if (f, invoice_type) in self._queued_folio_types}
+
+    def flush(self):
+        """Bloquea hasta que todo lo encolado hasta ahora esté escrito (p. ej. fin de día)."""
+        marker = _Flush()
+        self._queue.put(marker)
+        marker.done.wait()
+
+    def take_confirmed(self) -> dict:
+        """Retorna y reinicia los matched/modified/errores y tags confirmados desde la última llamada."""
+        with self._lock:
+            confirmed = self._confirmed
+            self._confirmed = self._empty_confirmed()
+        return confirmed
+
+    @staticmethod
+    def _empty_confirmed() -> dict:
+        return {"orders_matched": 0, "orders_modified": 0, "write_errors": 0, "tags": []}
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        writes = s["bulk_writes"] + s["insert_manys"]
+        return {
+            "submits": s["submits"],
+            "bulk_writes": s["bulk_writes"],
+            "insert_manys": s["insert_manys"],
+            "ops_written": s["ops_written"],
+            "ops_per_write": round(s["ops_written"] / writes, 1) if writes else 0,
+            "write_ms_avg": round(s["write_ms_total"] / writes, 1) if writes else 0,
+            "write_ms_max": round(s["write_ms_max"], 1),
+            "queue_depth_avg": round(s["queue_depth_total"] / s["submits"], 2) if s["submits"] else 0,
+            "queue_depth_max": s["queue_depth_max"],
+            "submit_wait_ms_total": round(s["submit_wait_ms_total"], 1),
+            "write_errors": s["write_errors"],
+            "errors": s["errors"],
+        }
+
+    # ── Hilo escritor ────────────────────────────────────────────────────────
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._max_wait_s)
+            except queue.Empty:
+                self._write_pending()
+                continue
+
+            if item is _STOP:
+                self._write_pending()
+                return
+            if isinstance(item, _Flush):
+                self._write_pending()
+                item.done.set()
+                continue
+
+            submitted, updates, invoices = item
+            self._updates.extend((update, submitted) for update in updates)
+            self._invoices.extend((doc, submitted) for doc in invoices)
+            if len(self._updates) >= self._max_ops or len(self._invoices) >= self._max_ops:
+                self._write_pending()
+
+    def _write_pending(self):
+        updates, self._updates = self._updates, []
+        invoices, self._invoices = self._invoices, []
+        for i in range(0, len(updates), self._max_ops):
+            chunk = updates[i: i + self._max_ops]
+            docs = [update for update, _ in chunk]
+            failed = self._timed("bulk_writes", len(docs), lambda: order_repository.bulk_write_billing(self._orders_col, docs))
+            self._settle(chunk, failed)
+        for i in range(0, len(invoices), self._max_ops):
+            chunk = invoices[i: i + self._max_ops]
+            docs = [doc for doc, _ in chunk]
+            failed = self._timed("insert_manys", len(docs), lambda: invoice_repository.save_many(self._invoices_col, docs))
+            self._release_folios(docs)
+            self._settle(chunk, failed)
+
+    def _settle(self, chunk: list, failed: set):
+        """Descuenta las operaciones escritas de cada submit y confirma los tags completos sin error."""
+        with self._lock:
+            for position, (_, submitted) in enumerate(chunk):
+                submitted.pending -= 1
+                if position in failed:
+                    submitted.failed = True
+                if submitted.pending == 0 and not submitted.failed and submitted.tag is not None:
+                    self._confirmed["tags"].append(submitted.tag)
+
+    def _release_folios(self, invoices: list):
+        """Descuenta los siiFolios de un bloque ya escrito (o fallido) de los pendientes."""
+        with self._lock:
+            for doc in invoices:
+                folio = doc.get("siiFolio")
+                folio_type = (folio, doc.get("type"))
+                self._queued_folios[folio] -= 1
+                if self._queued_folios[folio] <= 0:
+                    del self._queued_folios[folio]
+                self._queued_folio_types[folio_type] -= 1
+                if self._queued_folio_types[folio_type] <= 0:
+                    del self._queued_folio_types[folio_type]
+
+    def _timed(self, kind: str, n_ops: int, write) -> set:
+        """Ejecuta una escritura y registra sus métricas. Retorna las posiciones fallidas del bloque."""
+        start = time.perf_counter()
+        result = None
+        failed_at = set()
+        error = None
+        try:
+            result = write()
+        except BulkWriteError as e:
+            details = e.details or {}
+            failed_at = {err.get("index") for err in details.get("writeErrors", [])}
+            result = {"matched": details.get("nMatched", 0), "modified": details.get("nModified", 0)}
+            error = f"{kind}: {len(failed_at)} operaciones fallidas ({e})"
+        except Exception as e:
+            failed_at = set(range(n_ops))
+            error = f"{kind}: {e}"
+        failed = len(failed_at)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats[kind] += 1
+            self._stats["ops_written"] += n_ops - failed
+            self._stats["write_ms_total"] += elapsed
+            self._stats["write_ms_max"] = max(self._stats["write_ms_max"], elapsed)
+            if failed:
+                self._stats["write_errors"] += failed
+                self._confirmed["write_errors"] += failed
+                if len(self._stats["errors"]) < _MAX_ERRORS_KEPT:
+                    self._stats["errors"].append(error)
+            if kind == "bulk_writes" and isinstance(result, dict):
+                self._confirmed["orders_matched"] += result["matched"]
+                self._confirmed["orders_modified"] += result["modified"]
+        return failed_at
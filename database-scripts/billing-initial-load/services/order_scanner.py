@@ -0,0 +1,172 @@
+"""
+Escaneo particionado de las OS de un día para días con mucho volumen.
+
+En vez de un único cursor por lote de cuentas, el día se divide en sub-rangos de
+emissionDate dimensionados según la cardinalidad estimada (conteos solo-índice
+por tramo horario) y cada sub-rango se lee con su propio cursor en un hilo. Los
+documentos se entregan al loop de procesamiento por una cola acotada, en el orden
+en que llegan: el procesamiento por lotes no depende del orden de las OS.
+
+  plan_partitions   → sub-rangos [inicio, fin) del día para un lote de cuentas
+  iter_partitioned  → generador que mezcla los cursores de todos los sub-rangos
+"""
+
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from repositories import order_repository
+
+_DONE = object()
+
+
+class _WorkerError:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def plan_partitions(
+    collection,
+    accounts: list,
+    day_start,
+    day_end,
+    max_cursors: int,
+    target_per_partition: int,
+    slots: int = 24,
+    expected_total: int | None = None,
+) -> list:
+    """
+    Divide [day_start, day_end) en sub-rangos con una cantidad similar de OS.
+
+    Cuenta las OS de cada tramo (slots tramos iguales) con conteos solo-índice sobre
+    seller.account + emissionDate y agrupa tramos consecutivos hasta ~total/N OS, con
+    N = ceil(total / target_per_partition). Un tramo nunca se divide, así que un
+    tramo con un pico muy grande queda como un sub-rango propio.
+
+    Con max_cursors <= 1 retorna el día completo sin contar. Si expected_total (p. ej. el
+    total del día de DayProgress, que acota el del lote) es menor a target_per_partition
+    también retorna el día completo sin contar; si no se conoce, un único conteo del día
+    completo decide antes de contar los tramos. Así un día con pocas OS no paga `slots`
+    conteos por lote de cuentas.
+
+    Returns:
+        Lista de tuplas (inicio, fin) en orden cronológico.
+    """
+    if max_cursors <= 1 or slots <= 1:
+        return [(day_start, day_end)]
+
+    def _count(slot):
+        start, end = slot
+        return order_repository.count_orders(
+            collection,
+            {"seller.account": {"$in": accounts}, "emissionDate": {"$gte": start, "$lt": end}},
+            order_repository.ACCOUNT_EMISSION_INDEX,
+        )
+
+    if expected_total is None:
+        expected_total = _count((day_start, day_end))
+    if expected_total < target_per_partition:
+        return [(day_start, day_end)]
+
+    step = (day_end - day_start) / slots
+    bounds = [day_start + step * i for i in range(slots)] + [day_end]
+    slot_ranges = list(zip(bounds[:-1], bounds[1:]))
+
+    with ThreadPoolExecutor(max_workers=max_cursors, thread_name_prefix="plan") as executor:
+        counts = list(executor.map(_count, slot_ranges))
+
+    total = sum(counts)
+    n_parts = min(slots, math.ceil(total / target_per_partition)) if target_per_partition > 0 else 1
+    if n_parts <= 1:
+        return [(day_start, day_end)]
+
+    per_part = total / n_parts
+    partitions = []
+    part_start = day_start
+    acc = 0
+    for (start, end), count in zip(slot_ranges, counts):
+        acc += count
+        if acc >= per_part and len(partitions) < n_parts - 1:
+            partitions.append((part_start, end))
+            part_start = end
+            acc = 0
+    if part_start < day_end:
+        partitions.append((part_start, day_end))
+    return partitions
+
+
+def iter_partitioned(make_cursor, partitions: list, workers: int, queue_size: int = 5000):
+    """
+    Itera los documentos de todos los sub-rangos con hasta `workers` cursores en paralelo.
+
+    Con un solo sub-rango (o workers <= 1) itera los cursores en serie, sin hilos.
+    Cerrar el generador (close() o dejar de iterarlo) detiene los hilos y cierra
+    sus cursores; un error en un cursor se relanza en el hilo que itera.
+
+    Args:
+        make_cursor: Función (inicio, fin) → cursor iterable de OS del sub-rango.
+        partitions:  Sub-rangos de plan_partitions.
+        workers:     Cursores simultáneos como máximo.
+        queue_size:  Documentos en tránsito como máximo (limita la memoria).
+    """
+    if len(partitions) <= 1 or workers <= 1:
+        for start, end in partitions:
+            yield from make_cursor(start, end)
+        return
+
+    docs = queue.Queue(maxsize=queue_size)
+    pending = queue.SimpleQueue()
+    for partition in partitions:
+        pending.put(partition)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                docs.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker():
+        try:
+            while not stop.is_set():
+                try:
+                    start, end = pending.get_nowait()
+                except queue.Empty:
+                    return
+                cursor = make_cursor(start, end)
+                try:
+                    for doc in cursor:
+                        if not _put(doc):
+                            return
+                finally:
+                    close = getattr(cursor, "close", None)
+                    if close:
+                        close()
+        except Exception as e:
+            _put(_WorkerError(e))
+        finally:
+            _put(_DONE)
+
+    n_threads = min(workers, len(partitions))
+    threads = [threading.Thread(target=_worker, name=f"scan-{i}", daemon=True) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+
+    finished = 0
+    try:
+        while finished < n_threads:
+            item = docs.get()
+            if item is _DONE:
+                finished += 1
+            elif isinstance(item, _WorkerError):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
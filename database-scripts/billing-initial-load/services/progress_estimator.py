@@ -0,0 +1,144 @@
+"""
+Estimación del total de OS del día para el porcentaje de progreso de los modos.
+
+El total solo se usa para mostrar progreso: un count_documents completo sobre
+todas las cuentas del día cuesta casi lo mismo que el escaneo, así que la
+estrategia se elige por ejecución (config.PROGRESS_ESTIMATE o --progress):
+
+  - "exact":      count_documents con el filtro completo antes de escanear (bloquea el día).
+  - "concurrent": conteo exacto por lote de cuentas en hilos de fondo, en paralelo al
+                  escaneo. El % aparece cuando terminan todos los conteos.
+  - "index":      conteo solo-índice (seller.account + emissionDate) de cada lote de
+                  cuentas justo antes de escanearlo; los lotes aún no contados se
+                  proyectan con el promedio. Es cota superior (no filtra billing/taxDocument).
+  - "sample":     conteo exacto de una muestra de cuentas, proyectado al total.
+  - "off":        sin total; solo OS procesadas.
+"""
+
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from repositories import order_repository
+
+STRATEGIES = ("exact", "concurrent", "index", "sample", "off")
+
+
+class DayProgress:
+    """
+    Total estimado de OS de un día y formato de la línea de progreso.
+
+    Args:
+        collection:      Colección pymongo de orders.
+        base_filter:     Filtro del día con "seller.account": {"$in": <todas las cuentas>}.
+        account_batches: Lotes de cuentas en el orden en que se escanearán.
+        strategy:        Una de STRATEGIES.
+        sample_ratio:    Fracción de cuentas a contar en "sample".
+        workers:         Hilos de conteo en "concurrent".
+        seed:            Semilla de la muestra en "sample" (reproducible por día).
+    """
+
+    def __init__(
+        self,
+        collection,
+        base_filter: dict,
+        account_batches: list,
+        strategy: str,
+        sample_ratio: float = 0.1,
+        workers: int = 2,
+        seed=None,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia de progreso inválida: '{strategy}'. Valores permitidos: {', '.join(STRATEGIES)}.")
+        self._collection = collection
+        self._base_filter = base_filter
+        self._account_batches = account_batches
+        self.strategy = strategy
+        self._total = None
+        self._approx = False
+        self._note = ""
+        self._futures = []
+        self._executor = None
+        self._index_counts = {}
+
+        if strategy == "exact":
+            self._total = order_repository.count_orders(collection, base_filter)
+        elif strategy == "concurrent":
+            self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="count")
+            self._futures = [
+                self._executor.submit(order_repository.count_orders, collection, self._batch_filter(accounts))
+                for accounts in account_batches
+            ]
+            self._note = "conteo en segundo plano"
+            if not self._futures:
+                self._total = 0
+        elif strategy == "sample":
+            accounts = [a for batch in account_batches for a in batch]
+            size = min(len(accounts), max(1, math.ceil(len(accounts) * sample_ratio)))
+            sample = random.Random(seed).sample(accounts, size) if accounts else []
+            counted = order_repository.count_orders(
+                collection, {**base_filter, "seller.account": {"$in": sample}}, order_repository.ACCOUNT_EMISSION_INDEX
+            ) if sample else 0
+            self._total = round(counted * len(accounts) / size) if sample else 0
+            self._approx = size < len(accounts)
+            self._note = f"muestra de {size}/{len(accounts)} cuentas"
+        elif strategy == "index":
+            self._approx = True
+            self._note = "cota superior, solo índice"
+        else:
+            self._note = "sin conteo"
+
+    def _batch_filter(self, accounts: list) -> dict:
+        return {**self._base_filter, "seller.account": {"$in": accounts}}
+
+    def _index_filter(self, accounts: list) -> dict:
+        return {"seller.account": {"$in": accounts}, "emissionDate": self._base_filter["emissionDate"]}
+
+    def start_account_batch(self, batch_idx: int):
+        """Avisa que comienza el escaneo de un lote de cuentas (en "index" lo cuenta)."""
+        if self.strategy != "index" or batch_idx in self._index_counts:
+            return
+        self._index_counts[batch_idx] = order_repository.count_orders(
+            self._collection,
+            self._index_filter(self._account_batches[batch_idx]),
+            order_repository.ACCOUNT_EMISSION_INDEX,
+        )
+
+    def total(self) -> tuple[int | None, bool]:
+        """Retorna (total estimado o None si aún no se conoce, es_aproximado)."""
+        if self.strategy == "concurrent" and self._total is None and self._futures:
+            if all(f.done() for f in self._futures):
+                try:
+                    self._total = sum(f.result() for f in self._futures)
+                    self._note = ""
+                except Exception as e:
+                    self._note = f"conteo falló: {e}"
+                self._futures = []
+        if self.strategy == "index" and self._index_counts:
+            counted = sum(self._index_counts.values())
+            pending = len(self._account_batches) - len(self._index_counts)
+            return counted + round(counted / len(self._index_counts) * pending), True
+        return self._total, self._approx
+
+    def describe(self) -> str:
+        """Texto para la línea "OS candidatas del día"."""
+        total, approx = self.total()
+        if total is None:
+            return f"? ({self._note})"
+        suffix = f" ({self._note})" if self._note else ""
+        return f"{'~' if approx else ''}{total}{suffix}"
+
+    def fmt(self, processed: int) -> str:
+        """Formatea "procesadas/total OS (pct%)" según lo que se conozca del total."""
+        total, approx = self.total()
+        if total is None:
+            return f"{processed}/? OS"
+        prefix = "~" if approx else ""
+        pct = min(processed / total * 100, 100) if total > 0 else 0
+        return f"{processed}/{prefix}{total} OS ({prefix}{pct:.0f}%)"
+
+    def close(self):
+        """Cancela los conteos pendientes (p. ej. al cortar el día por DRY_RUN_LIMIT)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -37,6 +37,39 @@ API_TIMEOUT_SECONDS = int(os.getenv("BOLETAS_API_TIMEOUT_SECONDS", "30"))
 # Se puede sobreescribir con BOLETAS_API_MAX_PAGES en .env
 API_MAX_PAGES = int(os.getenv("BOLETAS_API_MAX_PAGES", "1000"))
 
+# Reintentos por página ante timeout, error de conexión, 429 o 5xx, con backoff
+# exponencial con jitter: espera aleatoria entre 0 y min(MAX, BASE * 2^intento) ms.
+# Se pueden sobreescribir con BOLETAS_API_MAX_RETRIES / BOLETAS_API_BACKOFF_BASE_MS /
+# BOLETAS_API_BACKOFF_MAX_MS en .env
+API_MAX_RETRIES = int(os.getenv("BOLETAS_API_MAX_RETRIES", "3"))
+API_BACKOFF_BASE_MS = int(os.getenv("BOLETAS_API_BACKOFF_BASE_MS", "500"))
+API_BACKOFF_MAX_MS = int(os.getenv("BOLETAS_API_BACKOFF_MAX_MS", "10000"))
+
+# Páginas que se descargan por adelantado mientras se procesa la actual.
+# Se puede sobreescribir con BOLETAS_API_PREFETCH_PAGES en .env
+API_PREFETCH_PAGES = int(os.getenv("BOLETAS_API_PREFETCH_PAGES", "2"))
+
+# Caché en disco de las páginas de la API (repositories/boletas_page_cache.py), por
+# URL base + request ID + cursor, comprimida. Las ejecuciones repetidas sobre el mismo
+# request ID leen del disco las páginas ya descargadas.
+# Se puede desactivar con BOLETAS_API_CACHE=false en .env
+API_CACHE_ENABLED = os.getenv("BOLETAS_API_CACHE", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "y",
+)
+API_CACHE_DIR = "./cache"
+
+# Horas de vigencia de cada página en caché (0 = sin vencimiento)
+# Se puede sobreescribir con BOLETAS_API_CACHE_TTL_HOURS en .env
+API_CACHE_TTL_HOURS = float(os.getenv("BOLETAS_API_CACHE_TTL_HOURS", "24"))
+
+# Refresco incremental: si es True, la última página conocida (hasMore=false) se vuelve
+# a pedir y la descarga continúa desde ahí (el request ID pudo sumar documentos).
+# Si es False, una caché completa y vigente se usa sin llamar a la API.
+API_CACHE_REFRESH_TAIL = True
+
 # Si es True, imprime dos líneas por página de API (solicitud + respuesta).
 # Si es False, imprime una sola línea resumida por página.
 API_VERBOSE_PAGE_LOG = os.getenv("BOLETAS_API_VERBOSE_PAGE_LOG", "false").lower() in (
@@ -56,6 +89,47 @@ INPUT_FILE = "SOPORT BTE - MIRO Flex Laboral Scl Ene26.xlsx"
 # Directorio donde se guardará el Excel de salida
 OUTPUT_DIR = "./output"
 
+# Motor de lectura/escritura del Excel (services/excel_processor.py):
+#   "streaming" → lee en modo read_only y escribe un libro nuevo en modo write_only,
+#                 copiando valores y formatos numéricos fila a fila. RAM constante
+#                 (~90 MB con 100k filas vs ~1,6 GB en "full"); no copia estilos ni anchos
+#                 de columna.
+#   "full"      → carga el libro completo, modifica las celdas y lo guarda
+#                 (conserva estilos, colores y anchos de columna).
+EXCEL_ENGINE = "streaming"
+
+# Modo lote (services/batch_processor.py): procesa todos los Excel de reports/ en una
+# sola ejecución, con una única descarga de la API compartida por todos los archivos.
+# En modo interactivo se pregunta si hay más de un Excel en reports/.
+# Se puede activar con BOLETAS_BATCH_MODE=true en .env
+BATCH_MODE = os.getenv("BOLETAS_BATCH_MODE", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+    "y",
+)
+
+# Procesos worker del modo lote (0 = cantidad de CPUs, nunca más que archivos)
+# Se puede sobreescribir con BOLETAS_BATCH_WORKERS en .env
+BATCH_WORKERS = int(os.getenv("BOLETAS_BATCH_WORKERS", "0"))
+
+# ============================================================================
+# CONFIGURACIÓN: ERRORES DE LA API
+# ============================================================================
+
+# Reglas adicionales para clasificar y traducir los mensajes de error de la API
+# (services/error_classifier.py). Se evalúan antes que las reglas por defecto y gana
+# la primera que coincide (re.search). message puede usar {0}, {1}, ... con los
+# grupos del patrón. Ejemplo:
+#   ERROR_RULES = [
+#       {
+#           "category": "PROVIDER_EMAIL_NOT_VALID",
+#           "pattern": r"email: '([^']*)' is not valid",
+#           "message": "Email del proveedor inválido: {0}",
+#       },
+#   ]
+ERROR_RULES = []
+
 # ============================================================================
 # CONFIGURACIÓN: LOGS
 # ============================================================================
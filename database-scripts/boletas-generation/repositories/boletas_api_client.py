@@ -10,11 +10,33 @@ Response (paginada por cursor):
         "pagination": { "limit": 100, "hasMore": true, "nextCursor": "..." }
     }
     Se realizan solicitudes sucesivas con el cursor hasta que hasMore sea false.
+
+Descarga (BoletasPageStream):
+    - Sesión HTTP keep-alive: todas las páginas reutilizan la misma conexión.
+    - Las páginas se entregan a medida que llegan, sin acumular todos los documentos:
+      run.py arma el índice por HESCode página a página.
+    - Un hilo descarga y parsea la página siguiente mientras run.py procesa la actual
+      (hasta prefetch páginas adelantadas). La paginación por cursor obliga a que cada
+      request espere el cuerpo de la página anterior, así que el solapamiento es entre
+      la descarga y el procesamiento, no entre requests.
+    - Reintentos por página ante timeout, error de conexión, 429 y 5xx con backoff
+      exponencial con jitter (en 429 respeta Retry-After).
+    - Latencia, bytes e intentos por página (stats()).
+    - Caché opcional en disco (repositories/boletas_page_cache.py): las páginas ya
+      descargadas se leen del disco y solo se vuelve a pedir la última (refresco
+      incremental).
 """
 
+import queue
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from repositories.boletas_page_cache import BoletasPageCache
 
 
 def _url_with_cursor(url: str, cursor: Optional[str]) -> str:
@@ -93,6 +115,13 @@ def _format_cursor_display(cursor: Optional[str]) -> str:
     return cursor[:24] + "..."
 
 
+def _format_bytes(num_bytes: int) -> str:
+    """Formatea un tamaño en bytes a KB/MB."""
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes / 1024 / 1024:.1f} MB"
+
+
 def _log_page_progress(
     page_number: int,
     cursor_display: str,
@@ -100,47 +129,142 @@ def _log_page_progress(
     total_items: int,
     has_more: bool,
     verbose_page_log: bool,
+    latency_ms: float,
+    num_bytes: int,
+    attempts: int,
+    cached: bool = False,
 ) -> None:
     """Imprime progreso de paginación en modo compacto o detallado."""
+    if cached:
+        detail = "caché"
+    else:
+        retries_label = f" | intentos={attempts}" if attempts > 1 else ""
+        detail = f"{latency_ms:.0f} ms | {_format_bytes(num_bytes)}{retries_label}"
     if verbose_page_log:
-        print(f"  [API] Página {page_number}: solicitando (cursor={cursor_display})")
+        action = "leyendo de caché" if cached else "solicitando"
+        print(f"  [API] Página {page_number}: {action} (cursor={cursor_display})")
         print(
             f"  [API] Página {page_number}: recibidos={page_items} "
-            f"| acumulado={total_items} | has_more={has_more}"
+            f"| acumulado={total_items} | has_more={has_more} | {detail}"
         )
         return
 
     print(
         f"  [API] Página {page_number} (cursor={cursor_display}): "
-        f"recibidos={page_items} | acumulado={total_items} | has_more={has_more}"
+        f"recibidos={page_items} | acumulado={total_items} | has_more={has_more} | {detail}"
     )
 
 
+def create_session() -> requests.Session:
+    """Sesión HTTP con conexión keep-alive reutilizable entre páginas."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _is_retryable(error: requests.RequestException) -> bool:
+    """Timeout, error de conexión, 429 y 5xx se reintentan; otros 4xx no."""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+def _retry_after(error: requests.RequestException) -> Optional[float]:
+    """Segundos del header Retry-After (solo formato numérico), o None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
 def _fetch_page(
+    session: requests.Session,
     base_request_url: str,
     headers: Dict[str, str],
     timeout: int,
     cursor: Optional[str],
-) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-    """Solicita y parsea una página de la API."""
+    max_retries: int = 3,
+    backoff_base_ms: int = 500,
+    backoff_max_ms: int = 10000,
+) -> Dict[str, Any]:
+    """
+    Solicita y parsea una página de la API, reintentando errores transitorios.
+
+    Returns:
+        {"items", "next_cursor", "latency_ms", "bytes", "attempts"}
+    """
     url = _url_with_cursor(base_request_url, cursor)
-    response = requests.get(url, headers=headers, timeout=timeout)
-    response.raise_for_status()
-    body = response.json()
-    return _parse_page_body(body)
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            body = response.json()
+        except requests.RequestException as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                wait_s = min(retry_after, backoff_max_ms / 1000)
+            else:
+                wait_s = random.uniform(0, min(backoff_max_ms, backoff_base_ms * 2 ** attempt)) / 1000
+            print(f"  [API] Reintento {attempt + 1}/{max_retries} en {wait_s:.1f}s: {str(e)[:120]}")
+            time.sleep(wait_s)
+            attempt += 1
+            continue
+        latency_ms = (time.perf_counter() - start) * 1000
+        items, next_cursor = _parse_page_body(body)
+        return {
+            "items": items,
+            "next_cursor": next_cursor,
+            "latency_ms": latency_ms,
+            "bytes": len(response.content),
+            "attempts": attempt + 1,
+        }
 
 
-def fetch_boletas_data(
-    base_url: str,
-    request_id: str,
-    endpoint: str,
-    timeout: int = 30,
-    max_pages: int = 1000,
-    verbose_page_log: bool = False,
-) -> List[Dict[str, Any]]:
+def _wrap_request_error(error: requests.RequestException, base_request_url: str, timeout: int) -> requests.RequestException:
+    """Traduce una excepción de requests a un mensaje con la URL consultada."""
+    if isinstance(error, requests.exceptions.Timeout):
+        return requests.RequestException(
+            f"Timeout al consultar la API (>{timeout}s): {base_request_url}"
+        )
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return requests.RequestException(
+            f"Error de conexión al consultar la API: {base_request_url}\nDetalle: {error}"
+        )
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else "?"
+        return requests.RequestException(
+            f"Error HTTP {status} al consultar la API: {base_request_url}\nDetalle: {error}"
+        )
+    return requests.RequestException(
+        f"Error inesperado al consultar la API: {base_request_url}\nDetalle: {error}"
+    )
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[idx], 1)
+
+
+class BoletasPageStream:
     """
-    Consulta la API para obtener la lista de boletas, recorriendo todas las páginas
-    cuando la API usa paginación por cursor.
+    Recorre las páginas de la API de un request ID y las entrega a medida que llegan.
+
+    Cada página entregada es un dict con: number, cursor (con el que se pidió),
+    items, next_cursor (None en la última), latency_ms, bytes, attempts y cached
+    (True si se leyó de la caché; attempts = 0).
 
     Args:
         base_url: URL base de la API
@@ -149,72 +273,224 @@ def fetch_boletas_data(
         timeout: Timeout en segundos por petición
         max_pages: Máximo de páginas permitidas para evitar loops infinitos
         verbose_page_log: Si es True, imprime dos líneas por página (solicitud + respuesta)
+        max_retries: Reintentos por página ante timeout / conexión / 429 / 5xx
+        backoff_base_ms: Backoff del primer reintento; se duplica en cada intento
+        backoff_max_ms: Tope del backoff
+        prefetch: Páginas que se descargan por adelantado mientras se procesa la actual
+        cache: Caché en disco de páginas (None = sin caché)
+        refresh_tail: Con caché, vuelve a pedir la última página conocida (hasMore=false)
+            y continúa desde ahí; False sirve una cadena completa solo desde la caché
 
-    Returns:
-        Lista de todos los documentos JSON (todas las páginas concatenadas)
-
-    Raises:
-        requests.RequestException: Si falla la petición HTTP
-        ValueError: Si la respuesta no tiene el formato esperado
+    Raises (al iterar):
+        requests.RequestException: Si falla la petición HTTP (agotados los reintentos)
+        ValueError: Si la respuesta no tiene el formato esperado o la paginación no avanza
     """
-    base_request_url = f"{base_url.rstrip('/')}{endpoint}{request_id}"
-    headers = {"accept": "application/json"}
-    all_data: List[Dict[str, Any]] = []
-    cursor: Optional[str] = None
-    seen_cursors = set()
 
-    try:
+    def __init__(
+        self,
+        base_url: str,
+        request_id: str,
+        endpoint: str,
+        timeout: int = 30,
+        max_pages: int = 1000,
+        verbose_page_log: bool = False,
+        max_retries: int = 3,
+        backoff_base_ms: int = 500,
+        backoff_max_ms: int = 10000,
+        prefetch: int = 2,
+        cache: Optional[BoletasPageCache] = None,
+        refresh_tail: bool = True,
+    ):
+        self.base_request_url = f"{base_url.rstrip('/')}{endpoint}{request_id}"
+        self._headers = {"accept": "application/json"}
+        self._timeout = timeout
+        self._max_pages = max_pages
+        self._verbose_page_log = verbose_page_log
+        self._max_retries = max_retries
+        self._backoff_base_ms = backoff_base_ms
+        self._backoff_max_ms = backoff_max_ms
+        self._prefetch = max(1, prefetch)
+        self._cache = cache
+        self._refresh_tail = refresh_tail
+        self.pages = 0
+        self.cached_pages = 0
+        self.documents = 0
+        self.bytes = 0
+        self.retries = 0
+        self._latencies_ms: List[float] = []
+
+    def _produce(self, pages: "queue.Queue", stop: threading.Event):
+        """Hilo de descarga: pone cada página (o la excepción) en la cola; None al terminar."""
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            with create_session() as session:
+                self._fetch_all(session, put, stop)
+        except requests.RequestException as e:
+            put(_wrap_request_error(e, self.base_request_url, self._timeout))
+        except Exception as e:
+            put(e)
+
+    def _fetch_all(self, session: requests.Session, put, stop: threading.Event):
+        cursor: Optional[str] = None
+        seen_cursors = set()
         page_number = 0
-        while True:
+        total_items = 0
+        while not stop.is_set():
             page_number += 1
-            cursor_display = _format_cursor_display(cursor)
-            items, next_cursor = _fetch_page(
-                base_request_url=base_request_url,
-                headers=headers,
-                timeout=timeout,
-                cursor=cursor,
-            )
-            all_data.extend(items)
-            has_more = next_cursor is not None
+            page = self._cached_page(cursor)
+            if page is None:
+                page = _fetch_page(
+                    session=session,
+                    base_request_url=self.base_request_url,
+                    headers=self._headers,
+                    timeout=self._timeout,
+                    cursor=cursor,
+                    max_retries=self._max_retries,
+                    backoff_base_ms=self._backoff_base_ms,
+                    backoff_max_ms=self._backoff_max_ms,
+                )
+                page["cached"] = False
+            items, next_cursor = page["items"], page["next_cursor"]
+            total_items += len(items)
             _log_page_progress(
                 page_number=page_number,
-                cursor_display=cursor_display,
+                cursor_display=_format_cursor_display(cursor),
                 page_items=len(items),
-                total_items=len(all_data),
-                has_more=has_more,
-                verbose_page_log=verbose_page_log,
+                total_items=total_items,
+                has_more=next_cursor is not None,
+                verbose_page_log=self._verbose_page_log,
+                latency_ms=page["latency_ms"],
+                num_bytes=page["bytes"],
+                attempts=page["attempts"],
+                cached=page["cached"],
             )
-
             _validate_pagination_state(
                 page_number=page_number,
-                max_pages=max_pages,
+                max_pages=self._max_pages,
                 items=items,
                 cursor=cursor,
                 next_cursor=next_cursor,
                 seen_cursors=seen_cursors,
             )
-
+            if self._cache is not None and not page["cached"]:
+                self._cache.put(cursor, items, next_cursor)
+            page["number"] = page_number
+            page["cursor"] = cursor
+            if not put(page):
+                return
             if next_cursor is None:
-                break
-
+                put(None)
+                return
             seen_cursors.add(next_cursor)
             cursor = next_cursor
-        return all_data
 
-    except requests.exceptions.Timeout:
-        raise requests.RequestException(
-            f"Timeout al consultar la API (>{timeout}s): {base_request_url}"
-        )
-    except requests.exceptions.ConnectionError as e:
-        raise requests.RequestException(
-            f"Error de conexión al consultar la API: {base_request_url}\nDetalle: {e}"
-        )
-    except requests.exceptions.HTTPError as e:
-        status = e.response.status_code if e.response is not None else "?"
-        raise requests.RequestException(
-            f"Error HTTP {status} al consultar la API: {base_request_url}\nDetalle: {e}"
-        )
-    except requests.exceptions.RequestException as e:
-        raise requests.RequestException(
-            f"Error inesperado al consultar la API: {base_request_url}\nDetalle: {e}"
+    def _cached_page(self, cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Página de la caché si se puede usar (la última se vuelve a pedir con refresh_tail)."""
+        if self._cache is None:
+            return None
+        cached = self._cache.get(cursor)
+        if cached is None or (cached["next_cursor"] is None and self._refresh_tail):
+            return None
+        return {
+            "items": cached["items"],
+            "next_cursor": cached["next_cursor"],
+            "latency_ms": 0.0,
+            "bytes": 0,
+            "attempts": 0,
+            "cached": True,
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        pages: "queue.Queue" = queue.Queue(maxsize=self._prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(pages, stop), name="boletas-api", daemon=True
         )
+        producer.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                self.pages += 1
+                self.documents += len(page["items"])
+                if page["cached"]:
+                    self.cached_pages += 1
+                else:
+                    self.bytes += page["bytes"]
+                    self.retries += page["attempts"] - 1
+                    self._latencies_ms.append(page["latency_ms"])
+                yield page
+        finally:
+            # Si el consumidor corta antes (error o break), el hilo deja de descargar
+            stop.set()
+            producer.join(timeout=self._timeout + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Páginas (total y de caché), documentos, bytes, reintentos y latencia p50/p95/máx."""
+        latencies = sorted(self._latencies_ms)
+        return {
+            "pages": self.pages,
+            "cached_pages": self.cached_pages,
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "latency_ms_p50": _percentile(latencies, 50),
+            "latency_ms_p95": _percentile(latencies, 95),
+            "latency_ms_max": round(latencies[-1], 1) if latencies else None,
+        }
+
+
+def fetch_boletas_data(
+    base_url: str,
+    request_id: str,
+    endpoint: str,
+    timeout: int = 30,
+    max_pages: int = 1000,
+    verbose_page_log: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Consulta la API para obtener la lista de boletas, recorriendo todas las páginas
+    cuando la API usa paginación por cursor.
+
+    Acumula todos los documentos en memoria; run.py usa BoletasPageStream
+    directamente para procesar página a página.
+
+    Args:
+        base_url: URL base de la API
+        request_id: ID del request a consultar
+        endpoint: Endpoint de la API (sin base URL ni request ID)
+        timeout: Timeout en segundos por petición
+        max_pages: Máximo de páginas permitidas para evitar loops infinitos
+        verbose_page_log: Si es True, imprime dos líneas por página (solicitud + respuesta)
+
+    Returns:
+        Lista de todos los documentos JSON (todas las páginas concatenadas)
+
+    Raises:
+        requests.RequestException: Si falla la petición HTTP
+        ValueError: Si la respuesta no tiene el formato esperado
+    """
+    stream = BoletasPageStream(
+        base_url=base_url,
+        request_id=request_id,
+        endpoint=endpoint,
+        timeout=timeout,
+        max_pages=max_pages,
+        verbose_page_log=verbose_page_log,
+    )
+    all_data: List[Dict[str, Any]] = []
+    for page in stream:
+        all_data.extend(page["items"])
+    return all_data
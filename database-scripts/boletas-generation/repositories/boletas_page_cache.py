@@ -0,0 +1,126 @@
+"""
+Caché en disco de las páginas de la API de boletas.
+
+Es común ejecutar run.py varias veces sobre el mismo request ID (dry run, generación,
+y de nuevo tras corregir el Excel); sin caché cada ejecución vuelve a descargar
+todas las páginas del cursor.
+
+Cada página se guarda comprimida (gzip) en:
+
+    {cache_dir}/{sha256(URL base + request ID)[:16]}/{sha256(cursor)[:16]}.json.gz
+
+con el cursor con el que se pidió, el nextCursor que devolvió la API, los documentos
+y la fecha de descarga. La cadena de páginas se recorre desde el cursor inicial
+(sin cursor) siguiendo nextCursor.
+
+Reglas de uso (ver BoletasPageStream):
+    - Una página con más de ttl_hours de antigüedad se vuelve a descargar.
+    - Refresco incremental (refresh_tail=True): las páginas intermedias (con nextCursor)
+      no cambian y se leen de la caché; la última página conocida (hasMore=false) se
+      vuelve a pedir con su cursor, porque el request ID puede haber sumado documentos
+      desde la descarga anterior, y la descarga continúa desde ahí.
+    - Con refresh_tail=False una cadena completa y vigente se sirve entera desde la caché,
+      sin llamar a la API.
+
+Al abrir se borran los archivos vencidos de todos los request IDs.
+
+Uso:
+    cache = BoletasPageCache("./cache", base_request_url, ttl_hours=24)
+    page = cache.get(cursor)        # None si no está o venció
+    cache.put(cursor, items, next_cursor)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+class BoletasPageCache:
+    """
+    Args:
+        cache_dir: Directorio raíz de la caché (se crea si no existe)
+        base_request_url: URL base + endpoint + request ID (clave del request)
+        ttl_hours: Horas de vigencia de cada página (0 = sin vencimiento)
+    """
+
+    def __init__(self, cache_dir: str, base_request_url: str, ttl_hours: float = 24):
+        self.root = Path(cache_dir)
+        self.path = self.root / _digest(base_request_url)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._ttl_s = ttl_hours * 3600
+        self.hits = 0
+        self.writes = 0
+        self.purged = self._purge_expired()
+
+    def _page_path(self, cursor: Optional[str]) -> Path:
+        return self.path / f"{_digest(cursor or '')}.json.gz"
+
+    def _expired(self, path: Path, now: float) -> bool:
+        return self._ttl_s > 0 and now - path.stat().st_mtime > self._ttl_s
+
+    def _purge_expired(self) -> int:
+        """Borra las páginas vencidas de todos los request IDs de la caché."""
+        if self._ttl_s <= 0:
+            return 0
+        now = time.time()
+        purged = 0
+        for page_path in self.root.glob("*/*.json.gz"):
+            try:
+                if self._expired(page_path, now):
+                    page_path.unlink()
+                    purged += 1
+            except FileNotFoundError:
+                continue
+        return purged
+
+    def get(self, cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Página guardada para el cursor, o None si no existe, venció o está dañada.
+
+        Returns:
+            {"cursor", "next_cursor", "items", "fetched_at", "bytes"}
+        """
+        page_path = self._page_path(cursor)
+        try:
+            if self._expired(page_path, time.time()):
+                return None
+            with gzip.open(page_path, "rt", encoding="utf-8") as f:
+                page = json.load(f)
+            page["bytes"] = page_path.stat().st_size
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        if page.get("cursor") != cursor:
+            return None
+        self.hits += 1
+        return page
+
+    def put(self, cursor: Optional[str], items: List[Dict[str, Any]], next_cursor: Optional[str]):
+        """Guarda una página (escritura atómica: archivo temporal + rename)."""
+        page_path = self._page_path(cursor)
+        tmp_path = page_path.with_suffix(".tmp")
+        page = {
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "items": items,
+            "fetched_at": time.time(),
+        }
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+            json.dump(page, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, page_path)
+        self.writes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "writes": self.writes,
+            "purged": self.purged,
+        }
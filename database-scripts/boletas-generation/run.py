@@ -3,11 +3,15 @@ Script orquestador para generación de boletas desde Excel.
 
 Flujo:
     1. Lee Excel de entrada → extrae HESCode
-    2. Llama API con requestId → obtiene lista de respuestas
+    2. Llama API con requestId página a página (sesión keep-alive, reintentos)
+       → arma el índice por HESCode a medida que llegan las páginas
     3. Hace match por HESCode
     4. Genera nuevo Excel con columnas: BOLETA y DETALLE_ERRORES
     5. Genera log JSON con detalle por registro
 
+Modo lote (BATCH_MODE): procesa todos los Excel de reports/ con procesos worker,
+compartiendo una sola descarga de la API (ver services/batch_processor.py).
+
 Uso:
     python run.py
 """
@@ -15,10 +19,13 @@ Uso:
 import json
 import os
 import sys
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import List, Optional
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 
 # ── Resolver raíz del repo (donde está common/) ──────────────────────────────
 current_path = Path(__file__).parent
@@ -60,12 +67,23 @@ script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
 import config
-from repositories.boletas_api_client import fetch_boletas_data
+from repositories.boletas_api_client import BoletasPageStream
+from repositories.boletas_page_cache import BoletasPageCache
+from services.batch_processor import (
+    process_file,
+    read_file_records,
+    resolve_workers,
+    save_lookup_snapshot,
+)
+from services.error_classifier import ErrorClassifier
 from services.excel_processor import (
+    EXCEL_ENGINES,
     read_excel_data,
-    create_api_lookup,
+    read_excel_records,
+    update_api_lookup,
     process_records,
     write_output_excel,
+    write_output_excel_streaming,
     generate_output_filename,
 )
 
@@ -104,13 +122,12 @@ def prompt_int(message: str, default: int, min_val: int = 0) -> int:
             print("  Ingresa un número entero.")
 
 
-def select_input_file() -> str:
+def list_input_files() -> List[Path]:
     """
-    Lista los archivos Excel en reports/ y permite al usuario seleccionar uno.
-    Si solo hay uno, lo usa automáticamente.
+    Archivos Excel en reports/, ordenados por nombre (sin temporales de Excel ~$).
 
-    Returns:
-        Nombre del archivo Excel seleccionado
+    Raises:
+        FileNotFoundError: Si no hay archivos Excel
     """
     reports_dir = resolve_path("./reports")
     excel_files = sorted(reports_dir.glob("*.xlsx"))
@@ -120,6 +137,18 @@ def select_input_file() -> str:
 
     if not excel_files:
         raise FileNotFoundError(f"No se encontraron archivos Excel en {reports_dir}")
+    return excel_files
+
+
+def select_input_file() -> str:
+    """
+    Lista los archivos Excel en reports/ y permite al usuario seleccionar uno.
+    Si solo hay uno, lo usa automáticamente.
+
+    Returns:
+        Nombre del archivo Excel seleccionado
+    """
+    excel_files = list_input_files()
 
     if len(excel_files) == 1:
         # Solo hay uno, usarlo automáticamente
@@ -154,9 +183,18 @@ def collect_user_input():
 
     print("\n--- Configuración de ejecución ---\n")
 
-    # Seleccionar archivo de entrada
+    # Seleccionar archivo de entrada (o todos, en modo lote)
     try:
-        config.INPUT_FILE = select_input_file()
+        excel_files = list_input_files()
+        if len(excel_files) > 1:
+            config.BATCH_MODE = prompt_yes_no(
+                f"¿Procesar los {len(excel_files)} Excel de reports/ en lote?",
+                config.BATCH_MODE,
+            )
+        else:
+            config.BATCH_MODE = False
+        if not config.BATCH_MODE:
+            config.INPUT_FILE = select_input_file()
     except FileNotFoundError as e:
         print(f"✗ {e}")
         sys.exit(1)
@@ -196,11 +234,35 @@ def _validate_config() -> None:
             f"  Ruta esperada: {repo_root / '.env'}\n"
             "  Ejemplo: BOLETAS_REQUEST_ID=YmF0Y2hfMTc3MDIxMTE2MTQzMl8yODZlODlkMC1mYTU3LTQ1ODctOGY5MS0zOTc5YzAyNGM0MWQ="
         )
+    if config.API_MAX_RETRIES < 0 or config.API_BACKOFF_BASE_MS < 0 or config.API_BACKOFF_MAX_MS < 0:
+        raise ValueError(
+            "API_MAX_RETRIES, API_BACKOFF_BASE_MS y API_BACKOFF_MAX_MS no pueden ser negativos (ver config.py)."
+        )
+    if config.API_PREFETCH_PAGES < 1:
+        raise ValueError("API_PREFETCH_PAGES debe ser mayor que 0 (ver config.py).")
+    if config.EXCEL_ENGINE not in EXCEL_ENGINES:
+        raise ValueError(
+            f"EXCEL_ENGINE debe ser uno de {', '.join(EXCEL_ENGINES)} (ver config.py)."
+        )
+    if config.API_CACHE_TTL_HOURS < 0:
+        raise ValueError("API_CACHE_TTL_HOURS no puede ser negativo (ver config.py).")
+    if config.BATCH_WORKERS < 0:
+        raise ValueError("BATCH_WORKERS no puede ser negativo (ver config.py).")
+    # Compila las reglas: un patrón inválido en ERROR_RULES falla antes de llamar a la API
+    ErrorClassifier(config.ERROR_RULES)
 
 
 def _read_excel_and_limit(excel_path: Path):
-    """Lee el Excel y aplica DRY_RUN_LIMIT si corresponde. Returns (wb, excel_records, total_excel)."""
-    wb, excel_records, _ = read_excel_data(str(excel_path))
+    """
+    Lee el Excel y aplica DRY_RUN_LIMIT si corresponde. Returns (wb, excel_records, total_excel).
+
+    Con EXCEL_ENGINE = "streaming" wb es None: el Excel de salida se escribe releyendo el original.
+    """
+    if config.EXCEL_ENGINE == "streaming":
+        wb = None
+        excel_records, _ = read_excel_records(str(excel_path))
+    else:
+        wb, excel_records, _ = read_excel_data(str(excel_path))
     print(f"  → {len(excel_records)} registros con HESCode encontrados\n")
     total_excel = len(excel_records)
     if config.DRY_RUN and config.DRY_RUN_LIMIT > 0:
@@ -246,7 +308,7 @@ def _get_progress_chunk_size(total_records: int) -> int:
 
 
 def _process_records_with_progress(
-    excel_records: List[dict], api_lookup: dict
+    excel_records: List[dict], api_lookup: dict, classifier: ErrorClassifier
 ) -> List[dict]:
     """Procesa registros en bloques e imprime progreso para lotes grandes."""
     total_records = len(excel_records)
@@ -256,7 +318,7 @@ def _process_records_with_progress(
     chunk_size = _get_progress_chunk_size(total_records)
     if chunk_size >= total_records:
         start = time.perf_counter()
-        results = process_records(excel_records, api_lookup)
+        results = process_records(excel_records, api_lookup, classifier)
         elapsed = time.perf_counter() - start
         print(f"  → Procesamiento completado en {_format_elapsed(elapsed)}")
         return results
@@ -272,7 +334,7 @@ def _process_records_with_progress(
         end_idx = min(start_idx + chunk_size, total_records)
         chunk = excel_records[start_idx:end_idx]
         chunk_start = time.perf_counter()
-        chunk_results = process_records(chunk, api_lookup)
+        chunk_results = process_records(chunk, api_lookup, classifier)
         chunk_elapsed = time.perf_counter() - chunk_start
         results.extend(chunk_results)
 
@@ -294,8 +356,16 @@ def _process_records_with_progress(
     return results
 
 
-def _fetch_api_data() -> List[dict]:
-    """Consulta la API y devuelve la lista de documentos."""
+def _fetch_api_lookup(excel_records: List[dict]):
+    """
+    Consulta la API página a página y arma el índice por HESCode.
+
+    Cada página se agrega al índice apenas llega (mientras se descarga la siguiente)
+    y solo se conservan los documentos cuyo HESCode está en el Excel.
+
+    Returns:
+        (api_lookup, api_stats) con api_stats de BoletasPageStream.stats()
+    """
     full_url = (
         f"{config.BOLETAS_API_URL.rstrip('/')}"
         f"{config.API_ENDPOINT}{config.BOLETAS_REQUEST_ID}"
@@ -314,26 +384,73 @@ def _fetch_api_data() -> List[dict]:
     )
     print(f"  • Timeout por petición: {timeout_seconds}s")
     print(f"  • Máximo de páginas: {max_pages}")
+    print(
+        f"  • Reintentos por página: {config.API_MAX_RETRIES} "
+        f"| páginas adelantadas: {config.API_PREFETCH_PAGES}"
+    )
     print(f"  • Log por página detallado: {verbose_page_log}")
 
-    start = time.perf_counter()
-    api_data = fetch_boletas_data(
+    cache = None
+    if config.API_CACHE_ENABLED:
+        cache = BoletasPageCache(
+            str(resolve_path(config.API_CACHE_DIR)), full_url, config.API_CACHE_TTL_HOURS
+        )
+        refresh_label = (
+            "refresca la última página" if config.API_CACHE_REFRESH_TAIL else "sin refresco"
+        )
+        print(
+            f"  • Caché de páginas: {cache.path} "
+            f"(vigencia {config.API_CACHE_TTL_HOURS:g} h, {refresh_label})"
+        )
+
+    stream = BoletasPageStream(
         base_url=config.BOLETAS_API_URL,
         request_id=config.BOLETAS_REQUEST_ID,
         endpoint=config.API_ENDPOINT,
         timeout=timeout_seconds,
         max_pages=max_pages,
         verbose_page_log=verbose_page_log,
+        max_retries=config.API_MAX_RETRIES,
+        backoff_base_ms=config.API_BACKOFF_BASE_MS,
+        backoff_max_ms=config.API_BACKOFF_MAX_MS,
+        prefetch=config.API_PREFETCH_PAGES,
+        cache=cache,
+        refresh_tail=config.API_CACHE_REFRESH_TAIL,
     )
+    hes_codes = {record["hes_code"] for record in excel_records}
+    api_lookup = {}
+
+    start = time.perf_counter()
+    for page in stream:
+        update_api_lookup(api_lookup, page["items"], hes_codes)
     elapsed = time.perf_counter() - start
+
+    api_stats = stream.stats()
+    api_stats["cache"] = cache.stats() if cache is not None else None
+    cached_label = f", {api_stats['cached_pages']} de caché" if cache is not None else ""
     print(
-        f"  → {len(api_data)} documentos recibidos de la API en {_format_elapsed(elapsed)}\n"
+        f"  → {api_stats['documents']} documentos recibidos de la API en {_format_elapsed(elapsed)} "
+        f"({api_stats['pages']} páginas{cached_label}, {api_stats['bytes'] / 1024 / 1024:.1f} MB, "
+        f"{api_stats['retries']} reintentos)"
     )
-    return api_data
+    if api_stats["pages"] > api_stats["cached_pages"]:
+        print(
+            f"  → Latencia por página: p50 {api_stats['latency_ms_p50']} ms "
+            f"| p95 {api_stats['latency_ms_p95']} ms | máx {api_stats['latency_ms_max']} ms"
+        )
+    print(f"  → Índice creado con {len(api_lookup)} HESCode del Excel\n")
+    return api_lookup, api_stats
 
 
-def _print_results_summary(results: List[dict]) -> None:
-    """Imprime resumen de success/error/not_found."""
+def _print_results_summary(
+    results: List[dict], error_counts: Dict[Tuple[str, str], int]
+) -> None:
+    """
+    Imprime resumen de success/error/not_found.
+
+    El detalle de errores sale de error_counts ({(categoría, mensaje): cantidad}, de
+    ErrorClassifier.message_counts()), sin volver a recorrer los resultados.
+    """
     success_count = sum(1 for r in results if r["status"] == "SUCCESS")
     error_count = sum(1 for r in results if r["status"] == "ERROR")
     not_found_count = sum(1 for r in results if r["status"] == "NOT_FOUND")
@@ -341,21 +458,22 @@ def _print_results_summary(results: List[dict]) -> None:
     print(f"  ✗ {error_count} con errores")
     if not_found_count > 0:
         print(f"  ⚠ {not_found_count} no encontrados en API")
-    if error_count > 0:
-        error_breakdown = {}
-        for result in results:
-            if result["status"] != "ERROR":
-                continue
-            key = result["detalle_errores"] or "SIN_DETALLE"
-            error_breakdown[key] = error_breakdown.get(key, 0) + 1
-        top_errors = sorted(error_breakdown.items(), key=lambda x: x[1], reverse=True)
+    if error_counts:
+        category_counts = Counter()
+        for (category, _), count in error_counts.items():
+            category_counts[category] += count
+        print("  Errores por categoría:")
+        for category, count in category_counts.most_common():
+            print(f"    - {count}x {category}")
         print("  Detalle errores:")
-        for error_message, count in top_errors:
+        for (_, error_message), count in sorted(
+            error_counts.items(), key=lambda x: x[1], reverse=True
+        ):
             print(f"    - {count}x {error_message}")
     print()
 
 
-def _run_dry_run(results: List[dict], api_data: List[dict], total_excel: int) -> None:
+def _run_dry_run(results: List[dict], api_stats: dict, total_excel: int) -> None:
     """Muestra preview y guarda log en modo DRY_RUN."""
     print(f"[DRY_RUN] Preview de {len(results)} registros:\n")
     for result in results[:10]:
@@ -367,7 +485,7 @@ def _run_dry_run(results: List[dict], api_data: List[dict], total_excel: int) ->
     print("  Para ejecutar de verdad, selecciona DRY_RUN = No\n")
     save_log(
         total_excel=total_excel,
-        total_api=len(api_data),
+        api_stats=api_stats,
         results=results,
         output_file=None,
         dry_run=True,
@@ -375,7 +493,7 @@ def _run_dry_run(results: List[dict], api_data: List[dict], total_excel: int) ->
 
 
 def _run_full_generation(
-    wb, results: List[dict], api_data: List[dict], total_excel: int
+    wb, results: List[dict], api_stats: dict, total_excel: int
 ) -> None:
     """Genera Excel de salida, resumen y log (modo no DRY_RUN)."""
     success_count = sum(1 for r in results if r["status"] == "SUCCESS")
@@ -391,25 +509,192 @@ def _run_full_generation(
         print()
     print(f"Generando Excel de salida: {output_path}")
     write_start = time.perf_counter()
-    write_output_excel(wb, results, str(output_path))
+    if wb is None:
+        input_path = resolve_path(f"./reports/{config.INPUT_FILE}")
+        write_output_excel_streaming(str(input_path), results, str(output_path))
+    else:
+        write_output_excel(wb, results, str(output_path))
     write_elapsed = time.perf_counter() - write_start
     print(f"  ✓ Excel generado correctamente en {_format_elapsed(write_elapsed)}\n")
     print_summary(success_count, error_count, not_found_count, total_excel)
     save_log(
         total_excel=total_excel,
-        total_api=len(api_data),
+        api_stats=api_stats,
         results=results,
         output_file=str(output_path),
         dry_run=False,
     )
 
 
+def _summarize_results(results: List[dict]) -> dict:
+    """Conteo por status de una lista de resultados (mismo formato que summary del log)."""
+    return {
+        "processed": len(results),
+        "success": sum(1 for r in results if r["status"] == "SUCCESS"),
+        "errors": sum(1 for r in results if r["status"] == "ERROR"),
+        "not_found": sum(1 for r in results if r["status"] == "NOT_FOUND"),
+    }
+
+
+def _print_batch_summary(files: List[dict]) -> None:
+    """Imprime una fila por archivo del lote con sus conteos y tiempo."""
+    name_width = max(len("Archivo"), *(len(f["input_file"]) for f in files))
+    print(
+        f"  {'Archivo':<{name_width}}  {'Registros':>9}  {'Exitosos':>8}  "
+        f"{'Errores':>7}  {'No encontr.':>11}  {'Tiempo':>8}"
+    )
+    for f in files:
+        summary = f["summary"]
+        print(
+            f"  {f['input_file']:<{name_width}}  {summary['processed']:>9}  {summary['success']:>8}  "
+            f"{summary['errors']:>7}  {summary['not_found']:>11}  {_format_elapsed(f['elapsed_s']):>8}"
+        )
+    print()
+
+
+def _run_batch() -> None:
+    """
+    Modo lote: procesa todos los Excel de reports/ con procesos worker.
+
+    1. Lee los HESCode de cada Excel en paralelo
+    2. Consulta la API una sola vez con la unión de los HESCode (proceso principal)
+    3. Guarda el índice como snapshot pickle en un directorio temporal
+    4. Cada worker carga el snapshot una vez y hace match + Excel de salida por archivo
+    5. Imprime el resumen consolidado y guarda un log JSON del lote
+    """
+    try:
+        excel_files = list_input_files()
+    except FileNotFoundError as e:
+        print(f"  ✗ {e}")
+        return
+    workers = resolve_workers(config.BATCH_WORKERS, len(excel_files))
+    print(f"Modo lote: {len(excel_files)} archivos Excel, {workers} procesos worker\n")
+
+    # El pool se crea (y sus procesos arrancan) antes de la descarga de la API, que
+    # usa un hilo de prefetch: los workers no se crean con hilos activos en el padre.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        print("Leyendo Excel...")
+        read_start = time.perf_counter()
+        files = []
+        for read in pool.map(read_file_records, [str(p) for p in excel_files]):
+            if read["error"]:
+                print(f"  ✗ {read['input_file']}: {read['error']}")
+                continue
+            if not read["records"]:
+                print(f"  ⚠ {read['input_file']}: sin registros con HESCode, se omite")
+                continue
+            records = read["records"]
+            read["total_excel"] = len(records)
+            if config.DRY_RUN and config.DRY_RUN_LIMIT > 0:
+                records = records[: config.DRY_RUN_LIMIT]
+            read["records"] = records
+            files.append(read)
+            print(f"  → {read['input_file']}: {read['total_excel']} registros con HESCode")
+        print(f"  → Lectura completada en {_format_elapsed(time.perf_counter() - read_start)}\n")
+        if not files:
+            print("No se encontraron registros con HESCode en los Excel.")
+            return
+        if config.DRY_RUN and config.DRY_RUN_LIMIT > 0:
+            print(
+                f"  [DRY_RUN] Limitado a {config.DRY_RUN_LIMIT} registros por archivo "
+                f"(DRY_RUN_LIMIT={config.DRY_RUN_LIMIT})\n"
+            )
+
+        all_records = [record for f in files for record in f["records"]]
+        try:
+            api_lookup, api_stats = _fetch_api_lookup(all_records)
+        except Exception as e:
+            print(f"  ✗ Error al consultar la API: {e}")
+            return
+
+        for f in files:
+            f["output_file"] = str(
+                resolve_path(f"{config.OUTPUT_DIR}/{generate_output_filename(f['input_file'])}")
+            )
+        if not config.DRY_RUN and sys.stdin.isatty():
+            print("Se generarán los archivos:")
+            for f in files:
+                print(f"  • {Path(f['output_file']).name}")
+            if not prompt_yes_no("¿Confirmar generación?", True):
+                print("\nGeneración cancelada por el usuario.")
+                return
+            print()
+
+        with tempfile.TemporaryDirectory(prefix="boletas_lote_") as tmp_dir:
+            snapshot_path = save_lookup_snapshot(api_lookup, tmp_dir)
+            snapshot_mb = Path(snapshot_path).stat().st_size / 1024 / 1024
+            print(
+                f"Procesando {len(files)} archivos con {workers} workers "
+                f"(snapshot del índice: {len(api_lookup)} HESCode, {snapshot_mb:.1f} MB)..."
+            )
+            process_start = time.perf_counter()
+            futures = {
+                pool.submit(
+                    process_file,
+                    str(resolve_path(f"./reports/{f['input_file']}")),
+                    f["output_file"],
+                    f["records"],
+                    snapshot_path,
+                    config.EXCEL_ENGINE,
+                    config.DRY_RUN,
+                    config.ERROR_RULES,
+                ): f
+                for f in files
+            }
+            for future in as_completed(futures):
+                f = futures[future]
+                try:
+                    processed = future.result()
+                except Exception as e:
+                    f.update(results=[], error_counts={}, output_file=None, elapsed_s=0.0, error=str(e))
+                    print(f"  ✗ {f['input_file']}: {e}")
+                    continue
+                f.update(processed)
+                summary = _summarize_results(f["results"])
+                print(
+                    f"  ✓ {f['input_file']}: {summary['success']} exitosos, "
+                    f"{summary['errors']} con errores, {summary['not_found']} no encontrados "
+                    f"({_format_elapsed(f['elapsed_s'])})"
+                )
+            process_elapsed = time.perf_counter() - process_start
+            print(f"  → Lote procesado en {_format_elapsed(process_elapsed)}\n")
+
+    for f in files:
+        f["summary"] = _summarize_results(f["results"])
+    all_results = [result for f in files for result in f["results"]]
+    error_counts = Counter()
+    for f in files:
+        error_counts.update(f["error_counts"])
+
+    print("=== RESUMEN DEL LOTE ===")
+    _print_batch_summary(files)
+    _print_results_summary(all_results, error_counts)
+    if config.DRY_RUN:
+        print("[DRY_RUN] No se generaron los Excel de salida.")
+        print("  Para ejecutar de verdad, selecciona DRY_RUN = No\n")
+    else:
+        totals = _summarize_results(all_results)
+        print_summary(
+            totals["success"],
+            totals["errors"],
+            totals["not_found"],
+            sum(f["total_excel"] for f in files),
+        )
+    save_batch_log(files=files, api_stats=api_stats, workers=workers, dry_run=config.DRY_RUN)
+
+
 def main():
     collect_user_input()
     job_start = time.perf_counter()
     _validate_config()
     print_configuration()
 
+    if config.BATCH_MODE:
+        _run_batch()
+        total_elapsed = time.perf_counter() - job_start
+        print(f"Tiempo total de ejecución: {_format_elapsed(total_elapsed)}")
+        return
+
     excel_path = resolve_path(f"./reports/{config.INPUT_FILE}")
     print(f"Leyendo Excel: {excel_path}")
     try:
@@ -422,29 +707,22 @@ def main():
         return
 
     try:
-        api_data = _fetch_api_data()
+        api_lookup, api_stats = _fetch_api_lookup(excel_records)
     except Exception as e:
         print(f"  ✗ Error al consultar la API: {e}")
         return
 
-    print("Construyendo índice de respuesta API por HESCode...")
-    lookup_start = time.perf_counter()
-    api_lookup = create_api_lookup(api_data)
-    lookup_elapsed = time.perf_counter() - lookup_start
-    print(
-        f"  → Índice creado con {len(api_lookup)} claves en {_format_elapsed(lookup_elapsed)}\n"
-    )
-
     print("Procesando registros...")
-    results = _process_records_with_progress(excel_records, api_lookup)
-    _print_results_summary(results)
+    classifier = ErrorClassifier(config.ERROR_RULES)
+    results = _process_records_with_progress(excel_records, api_lookup, classifier)
+    _print_results_summary(results, classifier.message_counts())
 
     if config.DRY_RUN:
-        _run_dry_run(results, api_data, total_excel)
+        _run_dry_run(results, api_stats, total_excel)
         total_elapsed = time.perf_counter() - job_start
         print(f"Tiempo total de ejecución: {_format_elapsed(total_elapsed)}")
         return
-    _run_full_generation(wb, results, api_data, total_excel)
+    _run_full_generation(wb, results, api_stats, total_excel)
     total_elapsed = time.perf_counter() - job_start
     print(f"Tiempo total de ejecución: {_format_elapsed(total_elapsed)}")
 
@@ -470,8 +748,13 @@ def print_configuration():
     request_id_display = config.BOLETAS_REQUEST_ID
     print(f"   • API URL:       {api_display}")
     print(f"   • Request ID:    {request_id_display}")
-    print(f"   • Excel entrada: {config.INPUT_FILE}")
+    if config.BATCH_MODE:
+        workers_label = config.BATCH_WORKERS if config.BATCH_WORKERS > 0 else "CPUs"
+        print(f"   • Excel entrada: todos los de reports/ (modo lote, workers: {workers_label})")
+    else:
+        print(f"   • Excel entrada: {config.INPUT_FILE}")
     print(f"   • Directorio salida: {config.OUTPUT_DIR}")
+    print(f"   • Motor Excel:   {config.EXCEL_ENGINE}")
     print(f"   • Dry Run:       {config.DRY_RUN}")
     if config.DRY_RUN:
         limit_label = (
@@ -496,7 +779,7 @@ def print_summary(success: int, errors: int, not_found: int, total: int):
 
 def save_log(
     total_excel: int,
-    total_api: int,
+    api_stats: dict,
     results: List[dict],
     output_file: Optional[str],
     dry_run: bool,
@@ -535,12 +818,13 @@ def save_log(
         "output_file": output_file,
         "summary": {
             "total_excel_records": total_excel,
-            "total_api_documents": total_api,
+            "total_api_documents": api_stats["documents"],
             "processed": len(results),
             "success": success_count,
             "errors": error_count,
             "not_found": not_found_count,
         },
+        "api": api_stats,
         "results": log_results,
     }
 
@@ -550,5 +834,66 @@ def save_log(
     print(f"\nLog guardado en: {log_file}")
 
 
+def save_batch_log(files: List[dict], api_stats: dict, workers: int, dry_run: bool):
+    """
+    Guarda el log JSON del modo lote: resumen consolidado y, por archivo, su resumen
+    y el resultado de cada registro (mismo formato que save_log).
+    """
+    logs_dir = resolve_path(config.LOGS_DIR)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = logs_dir / f"boletas_lote_{timestamp}.json"
+
+    all_results = [result for f in files for result in f["results"]]
+    summary = {
+        "files": len(files),
+        "total_excel_records": sum(f["total_excel"] for f in files),
+        "total_api_documents": api_stats["documents"],
+    }
+    summary.update(_summarize_results(all_results))
+
+    log_files = []
+    for f in files:
+        file_summary = {"total_excel_records": f["total_excel"]}
+        file_summary.update(f["summary"])
+        log_files.append(
+            {
+                "input_file": f["input_file"],
+                "output_file": f.get("output_file"),
+                "error": f.get("error"),
+                "elapsed_s": f["elapsed_s"],
+                "summary": file_summary,
+                "results": [
+                    {
+                        "hes_code": result["hes_code"],
+                        "boleta": result["boleta"],
+                        "detalle_errores": result["detalle_errores"],
+                        "status": result["status"],
+                    }
+                    for result in f["results"]
+                ],
+            }
+        )
+
+    log_data = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "dry_run": dry_run,
+        "batch": True,
+        "workers": workers,
+        "excel_engine": config.EXCEL_ENGINE,
+        "api_url": config.BOLETAS_API_URL,
+        "request_id": config.BOLETAS_REQUEST_ID,
+        "summary": summary,
+        "api": api_stats,
+        "files": log_files,
+    }
+
+    with open(log_file, "w", encoding="utf-8") as f:
+        json.dump(log_data, f, indent=2, ensure_ascii=False)
+
+    print(f"\nLog guardado en: {log_file}")
+
+
 if __name__ == "__main__":
     main()
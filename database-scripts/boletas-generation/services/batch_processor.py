@@ -0,0 +1,159 @@
+"""
+Procesamiento en lote de varios Excel de reports/ con procesos worker.
+
+Los Excel de un mismo cierre (HES FEBRERO, MARZO, Flex Laboral Ene/Feb, ...) se cruzan
+contra el mismo request ID de la API. En vez de una ejecución por archivo (una
+descarga de la API y un Excel por vez), el lote hace:
+
+    1. Lectura de HESCode de todos los Excel en paralelo (read_excel_records)
+    2. Una sola descarga de la API → índice por HESCode con la unión de los HESCode
+       de todos los archivos (en el proceso principal, ver run.py)
+    3. Snapshot del índice serializado con pickle en un archivo temporal
+    4. Match + escritura del Excel de salida de cada archivo en paralelo: cada worker
+       carga el snapshot una sola vez y lo reutiliza para todos sus archivos
+
+Las funciones que se ejecutan en los workers (read_file_records, process_file) reciben
+todo por parámetro (no leen config) y retornan diccionarios serializables.
+
+Uso:
+    snapshot_path = save_lookup_snapshot(api_lookup, tmp_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pool.submit(process_file, excel_path, output_path, records, snapshot_path, "streaming", False)
+"""
+
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.error_classifier import ErrorClassifier
+from services.excel_processor import (
+    process_records,
+    read_excel_data,
+    read_excel_records,
+    write_output_excel,
+    write_output_excel_streaming,
+)
+
+SNAPSHOT_FILENAME = "api_lookup.pickle"
+
+# Snapshot ya cargado en este proceso worker: {ruta: api_lookup}
+_loaded_snapshots: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+# Clasificador de errores de este proceso worker: (reglas, ErrorClassifier)
+_worker_classifier: Optional[Tuple[List[Dict[str, Any]], ErrorClassifier]] = None
+
+
+def resolve_workers(requested: int, total_files: int) -> int:
+    """Workers a usar: requested (0 = CPUs disponibles), sin superar la cantidad de archivos."""
+    workers = requested if requested > 0 else (os.cpu_count() or 1)
+    return max(1, min(workers, total_files))
+
+
+def save_lookup_snapshot(api_lookup: Dict[int, Dict[str, Any]], directory: str) -> str:
+    """
+    Serializa el índice por HESCode en {directory}/api_lookup.pickle.
+
+    Returns:
+        Ruta del snapshot (se pasa a cada tarea de process_file)
+    """
+    snapshot_path = Path(directory) / SNAPSHOT_FILENAME
+    with open(snapshot_path, "wb") as f:
+        pickle.dump(api_lookup, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return str(snapshot_path)
+
+
+def _load_snapshot(snapshot_path: str) -> Dict[int, Dict[str, Any]]:
+    """Carga el snapshot una vez por proceso worker."""
+    api_lookup = _loaded_snapshots.get(snapshot_path)
+    if api_lookup is None:
+        with open(snapshot_path, "rb") as f:
+            api_lookup = pickle.load(f)
+        _loaded_snapshots.clear()
+        _loaded_snapshots[snapshot_path] = api_lookup
+    return api_lookup
+
+
+def _get_classifier(error_rules: List[Dict[str, Any]]) -> ErrorClassifier:
+    """Compila las reglas una vez por proceso worker y reinicia los conteos por archivo."""
+    global _worker_classifier
+    if _worker_classifier is None or _worker_classifier[0] != error_rules:
+        _worker_classifier = (error_rules, ErrorClassifier(error_rules))
+    classifier = _worker_classifier[1]
+    classifier.reset_counts()
+    return classifier
+
+
+def read_file_records(excel_path: str) -> Dict[str, Any]:
+    """
+    Lee los HESCode de un Excel (worker de la etapa 1).
+
+    Returns:
+        {"input_file", "records", "elapsed_s", "error"}; si el archivo no se puede
+        leer, records es [] y error trae el motivo.
+    """
+    start = time.perf_counter()
+    try:
+        records, _ = read_excel_records(excel_path)
+        error = None
+    except (FileNotFoundError, ValueError) as e:
+        records, error = [], str(e)
+    return {
+        "input_file": Path(excel_path).name,
+        "records": records,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "error": error,
+    }
+
+
+def process_file(
+    excel_path: str,
+    output_path: Optional[str],
+    records: List[Dict[str, Any]],
+    snapshot_path: str,
+    engine: str,
+    dry_run: bool,
+    error_rules: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Hace el match de un Excel contra el snapshot y escribe su Excel de salida
+    (worker de la etapa 2).
+
+    Args:
+        excel_path: Ruta al Excel original
+        output_path: Ruta del Excel de salida (ignorada si dry_run)
+        records: Registros leídos en la etapa 1 ({row_index, hes_code})
+        snapshot_path: Ruta del snapshot de save_lookup_snapshot
+        engine: "streaming" o "full" (ver config.EXCEL_ENGINE)
+        dry_run: Si es True no se escribe el Excel de salida
+        error_rules: Reglas adicionales del clasificador de errores (config.ERROR_RULES)
+
+    Returns:
+        {"input_file", "output_file", "results", "error_counts", "elapsed_s"} con
+        error_counts de ErrorClassifier.message_counts()
+    """
+    start = time.perf_counter()
+    api_lookup = _load_snapshot(snapshot_path)
+
+    wb = None
+    if engine == "full" and not dry_run:
+        wb, _, _ = read_excel_data(excel_path)
+
+    classifier = _get_classifier(error_rules or [])
+    results = process_records(records, api_lookup, classifier)
+
+    if dry_run:
+        output_path = None
+    elif wb is None:
+        write_output_excel_streaming(excel_path, results, output_path)
+    else:
+        write_output_excel(wb, results, output_path)
+
+    return {
+        "input_file": Path(excel_path).name,
+        "output_file": output_path,
+        "results": results,
+        "error_counts": classifier.message_counts(),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
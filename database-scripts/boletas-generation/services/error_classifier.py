@@ -0,0 +1,162 @@
+"""
+Clasificación y traducción de los mensajes de error de la API de boletas.
+
+Antes translate_error_message evaluaba, por cada registro con error, un re.search sin
+compilar y pasaba el mensaje a minúsculas dos veces. La API devuelve pocos errores
+distintos (comuna inexistente, SII, dirección/RUT del proveedor, ...) repetidos en
+cientos de filas, así que ahora:
+
+    1. Las reglas se compilan una sola vez al crear el ErrorClassifier
+    2. El resultado (categoría, mensaje traducido) se memoiza por mensaje original
+    3. tally() además cuenta cada registro por (categoría, mensaje): el resumen de
+       run.py sale de esos conteos, sin volver a recorrer los resultados
+
+El costo de clasificar crece con la cantidad de errores distintos, no con las filas.
+
+Reglas: se evalúan en orden y gana la primera que coincide (re.search). Cada regla es
+un dict:
+    {
+        "category": "COMMUNE_NOT_IN_REGION",
+        "pattern": r"communeName: Commune '([^']+)' does not exist in region '([^']+)'",
+        "message": "Comuna '{0}' no existe en la región '{1}'",
+    }
+message puede usar {0}, {1}, ... con los grupos del patrón. Las reglas de
+config.ERROR_RULES se evalúan antes que DEFAULT_ERROR_RULES. Un mensaje que no coincide
+con ninguna regla queda en la categoría OTHER sin traducir.
+
+Uso:
+    classifier = ErrorClassifier(config.ERROR_RULES)
+    category, message = classifier.tally(error_raw)
+    classifier.message_counts()     # {(categoría, mensaje): cantidad}
+"""
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+OTHER_CATEGORY = "OTHER"
+
+# Mensajes distintos que se memoizan como máximo (protege la memoria si la API
+# incluyera identificadores únicos en los mensajes)
+MAX_CACHED_MESSAGES = 10_000
+
+DEFAULT_ERROR_RULES: List[Dict[str, str]] = [
+    {
+        "category": "COMMUNE_NOT_IN_REGION",
+        "pattern": r"communeName: Commune '([^']+)' does not exist in region '([^']+)'",
+        "message": "Comuna '{0}' no existe en la región '{1}'",
+    },
+    {
+        # sii_error y "failed to extract hidden fields" en cualquier orden
+        "category": "SII_MANUAL_GENERATION",
+        "pattern": r"(?is)^(?=.*sii_error)(?=.*failed to extract hidden fields)",
+        "message": "Error interno de SII: la boleta debe ser generada manualmente",
+    },
+    {
+        "category": "PROVIDER_ADDRESS_NOT_VALID",
+        "pattern": r"\APROVIDER_FULL_ADDRESS_NOT_VALID\Z",
+        "message": "Error interno de SII: la boleta debe ser generada manualmente (formato de dirección no válido para SII)",
+    },
+    {
+        "category": "PROVIDER_IDENTIFIER_NOT_VALID",
+        "pattern": r"\APROVIDER_IDENTIFIER_FORMAT_NOT_VALID\Z",
+        "message": "Formato de RUT del proveedor inválido",
+    },
+    {
+        "category": "BTE_CREATE_ERROR",
+        "pattern": r"\ABTE_CREATE_ERROR\Z",
+        "message": "Error al crear BTE",
+    },
+    {
+        "category": "NOT_FOUND_IN_API",
+        "pattern": r"\ANO_ENCONTRADO_EN_API\Z",
+        "message": "No encontrado en respuesta de API",
+    },
+    {
+        "category": "UNKNOWN",
+        "pattern": r"\AERROR_DESCONOCIDO\Z",
+        "message": "Error desconocido",
+    },
+]
+
+
+def _compile_rule(rule: Dict[str, Any], position: int) -> Tuple[str, "re.Pattern", str]:
+    """Valida y compila una regla. Raises ValueError con la posición de la regla inválida."""
+    try:
+        category, pattern, message = rule["category"], rule["pattern"], rule["message"]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f"Regla de error #{position} inválida: debe tener category, pattern y message. Regla: {rule!r}"
+        )
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Regla de error #{position} ({category}): patrón inválido: {e}")
+    try:
+        message.format(*[""] * compiled.groups)
+    except (IndexError, KeyError, ValueError) as e:
+        raise ValueError(
+            f"Regla de error #{position} ({category}): message usa grupos que el patrón no tiene: {e!r}"
+        )
+    return category, compiled, message
+
+
+class ErrorClassifier:
+    """
+    Args:
+        extra_rules: Reglas adicionales (ej: config.ERROR_RULES), evaluadas antes que
+            DEFAULT_ERROR_RULES
+
+    Raises:
+        ValueError: Si alguna regla no tiene category/pattern/message o el patrón no compila
+    """
+
+    def __init__(self, extra_rules: Optional[List[Dict[str, Any]]] = None):
+        rules = list(extra_rules or []) + DEFAULT_ERROR_RULES
+        self._rules = [_compile_rule(rule, position) for position, rule in enumerate(rules, 1)]
+        self._cache: Dict[str, Tuple[str, str]] = {}
+        self._counts: Counter = Counter()
+
+    def classify(self, error_msg: str) -> Tuple[str, str]:
+        """
+        Categoría y mensaje traducido de un error de la API (memoizado por mensaje).
+
+        Returns:
+            (categoría, mensaje en español); ("", "") si el mensaje está vacío
+        """
+        if not error_msg:
+            return "", ""
+        classified = self._cache.get(error_msg)
+        if classified is not None:
+            return classified
+
+        classified = (OTHER_CATEGORY, error_msg)
+        for category, pattern, message in self._rules:
+            match = pattern.search(error_msg)
+            if match:
+                classified = (category, message.format(*match.groups()))
+                break
+        if len(self._cache) < MAX_CACHED_MESSAGES:
+            self._cache[error_msg] = classified
+        return classified
+
+    def tally(self, error_msg: str) -> Tuple[str, str]:
+        """Igual que classify, y cuenta el registro en message_counts()."""
+        classified = self.classify(error_msg)
+        self._counts[classified] += 1
+        return classified
+
+    def message_counts(self) -> Dict[Tuple[str, str], int]:
+        """Registros contados con tally() por (categoría, mensaje traducido)."""
+        return dict(self._counts)
+
+    def category_counts(self) -> Dict[str, int]:
+        """Registros contados con tally() por categoría."""
+        totals: Counter = Counter()
+        for (category, _), count in self._counts.items():
+            totals[category] += count
+        return dict(totals)
+
+    def reset_counts(self):
+        """Reinicia los conteos (la memoización se conserva)."""
+        self._counts.clear()
@@ -7,6 +7,14 @@ Flujo:
     3. Agregar columnas: BOLETA y DETALLE_ERRORES
     4. Escribir Excel de salida
 
+Motores de Excel (config.EXCEL_ENGINE):
+    - "streaming": lee con read_only=True (read_excel_records) y escribe un libro nuevo
+      en modo write_only (write_output_excel_streaming) copiando fila a fila los valores
+      y formatos numéricos del original. No mantiene el libro en memoria: la RAM se
+      mantiene constante aunque la planilla tenga cientos de miles de filas.
+    - "full": carga el libro completo (read_excel_data), modifica las celdas y lo guarda
+      (write_output_excel). Conserva estilos (fuentes, colores, anchos de columna).
+
 Formato del Excel:
     - Debe tener una columna con el header que contenga "HES" (ej: "HESCode", "HES Code", etc.)
     - Se agregan 2 columnas al final:
@@ -16,57 +24,34 @@ Formato del Excel:
 
 import openpyxl
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-import re
+
+from services.error_classifier import ErrorClassifier
+
+EXCEL_ENGINES = ("streaming", "full")
+
+# Clasificador con las reglas por defecto (translate_error_message y process_records
+# sin clasificador propio)
+_default_classifier = ErrorClassifier()
 
 
 def translate_error_message(error_msg: str) -> str:
     """
     Traduce y simplifica mensajes de error comunes de la API a español.
 
+    Usa las reglas por defecto de ErrorClassifier (services/error_classifier.py),
+    compiladas una vez y memoizadas por mensaje.
+
     Args:
         error_msg: Mensaje de error en inglés
 
     Returns:
         Mensaje traducido y simplificado en español
     """
-    if not error_msg:
-        return ""
-
-    # Patrón: communeName: Commune 'X' does not exist in region 'Y'
-    match = re.search(
-        r"communeName: Commune '([^']+)' does not exist in region '([^']+)'", error_msg
-    )
-    if match:
-        commune = match.group(1)
-        region = match.group(2)
-        return f"Comuna '{commune}' no existe en la región '{region}'"
-
-    # Patrón: sii_error: Failed to extract hidden fields: ...
-    if (
-        "sii_error" in error_msg.lower()
-        and "failed to extract hidden fields" in error_msg.lower()
-    ):
-        return "Error interno de SII: la boleta debe ser generada manualmente"
-
-    # Patrón: PROVIDER_FULL_ADDRESS_NOT_VALID
-    if error_msg == "PROVIDER_FULL_ADDRESS_NOT_VALID":
-        return "Error interno de SII: la boleta debe ser generada manualmente (formato de dirección no válido para SII)"
-
-    # Patrón: PROVIDER_IDENTIFIER_FORMAT_NOT_VALID
-    if error_msg == "PROVIDER_IDENTIFIER_FORMAT_NOT_VALID":
-        return "Formato de RUT del proveedor inválido"
-
-    # Otros estados conocidos
-    error_translations = {
-        "BTE_CREATE_ERROR": "Error al crear BTE",
-        "NO_ENCONTRADO_EN_API": "No encontrado en respuesta de API",
-        "ERROR_DESCONOCIDO": "Error desconocido",
-    }
-
-    return error_translations.get(error_msg, error_msg)
+    return _default_classifier.classify(error_msg)[1]
 
 
 def find_hes_column(worksheet) -> Optional[int]:
@@ -131,6 +116,70 @@ def read_excel_data(excel_path: str) -> Tuple[Workbook, List[Dict[str, Any]], in
     return wb, records, hes_column
 
 
+def _parse_hes_code(value) -> Optional[int]:
+    """HESCode como entero, o None si la celda está vacía o no es numérica."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _find_header(header: List[Any], predicate) -> Optional[int]:
+    """Índice (1-based) de la primera celda del header que cumple predicate."""
+    for idx, value in enumerate(header, start=1):
+        if value is not None and predicate(str(value)):
+            return idx
+    return None
+
+
+def _is_hes_header(value: str) -> bool:
+    return "HES" in value.upper()
+
+
+def read_excel_records(excel_path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Lee los HESCode del Excel en modo read_only (motor "streaming").
+
+    A diferencia de read_excel_data no retorna el Workbook: las filas se recorren
+    una vez y el archivo se cierra; write_output_excel_streaming lo vuelve a leer.
+
+    Args:
+        excel_path: Ruta al archivo Excel
+
+    Returns:
+        Tupla: (lista de registros con {row_index, hes_code}, columna HES)
+
+    Raises:
+        FileNotFoundError: Si no existe el archivo
+        ValueError: Si no se encuentra la columna HES
+    """
+    path = Path(excel_path)
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el archivo Excel: {excel_path}")
+
+    wb = openpyxl.load_workbook(str(path), read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        hes_column = _find_header(header, _is_hes_header)
+        if not hes_column:
+            raise ValueError(
+                f"No se encontró una columna con 'HES' en el header del Excel: {excel_path}"
+            )
+
+        records = []
+        for row_idx, row in enumerate(rows, start=2):
+            hes_code = _parse_hes_code(row[hes_column - 1] if len(row) >= hes_column else None)
+            if hes_code is not None:
+                records.append({"row_index": row_idx, "hes_code": hes_code})
+    finally:
+        wb.close()
+
+    return records, hes_column
+
+
 def create_api_lookup(api_data: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
     """
     Crea un diccionario de lookup por HESCode desde la respuesta de la API.
@@ -141,19 +190,47 @@ def create_api_lookup(api_data: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any
     Returns:
         Dict {hes_code: documento}
     """
+    lookup = {}
+    update_api_lookup(lookup, api_data)
+    return lookup
+
+
+def update_api_lookup(
+    lookup: Dict[int, Dict[str, Any]],
+    documents: List[Dict[str, Any]],
+    hes_codes: Optional[set] = None,
+) -> int:
+    """
+    Agrega al lookup los documentos de una página de la API.
+
+    Si un HESCode se repite, prevalece el último documento (igual que create_api_lookup
+    sobre la lista completa).
+
+    Args:
+        lookup: Diccionario {hes_code: documento} a completar
+        documents: Documentos de la página
+        hes_codes: Si se indica, solo se guardan los HESCode del Excel (el resto se
+            descarta y no ocupa memoria)
+
+    Returns:
+        Cantidad de documentos agregados o reemplazados
+    """
     from entities.boleta_response import extract_hes_code
 
-    lookup = {}
-    for doc in api_data:
+    added = 0
+    for doc in documents:
         hes_code = extract_hes_code(doc)
-        if hes_code is not None:
-            lookup[hes_code] = doc
-
-    return lookup
+        if hes_code is None or (hes_codes is not None and hes_code not in hes_codes):
+            continue
+        lookup[hes_code] = doc
+        added += 1
+    return added
 
 
 def process_records(
-    excel_records: List[Dict[str, Any]], api_lookup: Dict[int, Dict[str, Any]]
+    excel_records: List[Dict[str, Any]],
+    api_lookup: Dict[int, Dict[str, Any]],
+    classifier: Optional[ErrorClassifier] = None,
 ) -> List[Dict[str, Any]]:
     """
     Procesa los registros del Excel haciendo match con los datos de la API.
@@ -161,6 +238,8 @@ def process_records(
     Args:
         excel_records: Lista de registros del Excel con row_index y hes_code
         api_lookup: Diccionario {hes_code: documento de API}
+        classifier: Clasificador de errores (ej: con config.ERROR_RULES). Los registros
+            con status ERROR se cuentan en él (classifier.tally) para el resumen
 
     Returns:
         Lista de resultados con row_index, hes_code, boleta, detalle_errores, status
@@ -171,6 +250,12 @@ def process_records(
         is_success,
     )
 
+    if classifier is None:
+        classifier = _default_classifier
+        classify_error = classifier.classify
+    else:
+        classify_error = classifier.tally
+
     results = []
 
     for record in excel_records:
@@ -187,7 +272,7 @@ def process_records(
                     "row_index": row_index,
                     "hes_code": hes_code,
                     "boleta": 0,
-                    "detalle_errores": translate_error_message(error_raw),
+                    "detalle_errores": classifier.classify(error_raw)[1],
                     "status": "NOT_FOUND",
                 }
             )
@@ -211,7 +296,7 @@ def process_records(
                     "row_index": row_index,
                     "hes_code": hes_code,
                     "boleta": 0,
-                    "detalle_errores": translate_error_message(error_raw),
+                    "detalle_errores": classify_error(error_raw)[1],
                     "status": "ERROR",
                 }
             )
@@ -288,6 +373,93 @@ def write_output_excel(wb: Workbook, results: List[Dict[str, Any]], output_path:
     wb.save(output_path)
 
 
+def _copy_cell(ws, cell, value=None, number_format: Optional[str] = None):
+    """
+    Valor de la celda original para una fila write_only.
+
+    Con formato numérico distinto de "General" retorna una WriteOnlyCell con ese
+    formato; si no, el valor tal cual (más rápido que crear una celda por valor).
+    """
+    if value is None:
+        value = cell.value if cell is not None else None
+    fmt = number_format or getattr(cell, "number_format", None)
+    if not fmt or fmt == "General":
+        return value
+    out = WriteOnlyCell(ws, value=value)
+    out.number_format = fmt
+    return out
+
+
+def write_output_excel_streaming(
+    input_path: str, results: List[Dict[str, Any]], output_path: str
+):
+    """
+    Escribe el Excel de salida en modo write_only leyendo el original en read_only.
+
+    Mismo resultado que write_output_excel: columnas BOLETA y DETALLE_ERRORES (se
+    sobrescriben si ya existen, si no se agregan al final), HES como texto y BOLETA
+    con formato "0". Las demás hojas se copian tal cual. Se copian valores y formatos
+    numéricos; no estilos ni anchos de columna (para eso, EXCEL_ENGINE = "full").
+
+    Args:
+        input_path: Ruta al Excel original
+        results: Lista de resultados procesados
+        output_path: Ruta donde guardar el Excel de salida
+    """
+    results_by_row = {result["row_index"]: result for result in results}
+
+    src = openpyxl.load_workbook(str(input_path), read_only=True)
+    out = openpyxl.Workbook(write_only=True)
+    try:
+        active_title = src.active.title
+        for src_ws in src.worksheets:
+            out_ws = out.create_sheet(title=src_ws.title)
+            rows = src_ws.iter_rows()
+
+            if src_ws.title != active_title:
+                for row in rows:
+                    out_ws.append([_copy_cell(out_ws, cell) for cell in row])
+                continue
+
+            header_cells = next(rows, ())
+            header = [cell.value for cell in header_cells]
+            width = max(src_ws.max_column or 0, len(header))
+            header += [None] * (width - len(header))
+
+            hes_col = _find_header(header, _is_hes_header)
+            boleta_col = _find_header(header, lambda v: v.strip().upper() == "BOLETA")
+            detalle_col = _find_header(header, lambda v: v.strip().upper() == "DETALLE_ERRORES")
+            if boleta_col is None:
+                header.append("BOLETA")
+                boleta_col = len(header)
+            if detalle_col is None:
+                header.append("DETALLE_ERRORES")
+                detalle_col = len(header)
+            out_ws.append(header)
+
+            for row_idx, row in enumerate(rows, start=2):
+                cells = [_copy_cell(out_ws, cell) for cell in row]
+                cells += [None] * (len(header) - len(cells))
+                result = results_by_row.get(row_idx)
+                if result is not None:
+                    # Forzar columna HES como texto (evita decimales o separadores de miles)
+                    if hes_col is not None:
+                        cells[hes_col - 1] = _copy_cell(
+                            out_ws, row[hes_col - 1] if len(row) >= hes_col else None,
+                            value=str(result["hes_code"]), number_format="@",
+                        )
+                    boleta = WriteOnlyCell(out_ws, value=result["boleta"])
+                    boleta.number_format = "0"
+                    cells[boleta_col - 1] = boleta
+                    cells[detalle_col - 1] = result["detalle_errores"]
+                out_ws.append(cells)
+
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        out.save(output_path)
+    finally:
+        src.close()
+
+
 def generate_output_filename(input_filename: str) -> str:
     """
     Genera el nombre del archivo de salida basado en el original.
@@ -0,0 +1,454 @@
+"""
+Benchmark offline del reenvío de notificaciones (CSV → lookup Mongo → envío).
+
+Genera un set sintético de órdenes, facturas y CSV de errores (con orderIds
+repetidos, órdenes sin factura, etc.) y ejecuta el pipeline real de run.py
+(run.resend: NotificationErrorStream → iter_resolved → NotificationDispatcher) contra:
+  - MongoDB: una colección en memoria (default) o un mongod local (--mongo-uri),
+    sembrado en una base desechable que se elimina al terminar.
+  - Gateway: el stand-in local gateway_stand_in.py, con latencia, cuota (429) y
+    errores configurables. Nunca se llama al gateway real ni se envían correos.
+
+No usa el .env ni se conecta a producción. Reporta OS/s, latencia de la API
+(p50/p95/máx), reintentos, códigos HTTP y round-trips Mongo por lote, para validar
+cambios de concurrencia y de tamaño de lote antes de un reenvío real. --concurrency
+acepta varios valores separados por coma para comparar en una sola ejecución.
+
+Uso:
+    python ./database-scripts/notification-resend/bench_resend.py
+    python ./database-scripts/notification-resend/bench_resend.py --orders 5000 --concurrency 1,4,8,16 --max-rps 0
+    python ./database-scripts/notification-resend/bench_resend.py --quota-rps 10 --error-rate 0.02 --mongo-latency-ms 20
+    python ./database-scripts/notification-resend/bench_resend.py --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import copy
+import csv
+import gzip
+import io
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+
+# run.py resuelve la raíz del repo (common/), carga el .env y agrega el
+# directorio del script a sys.path; el benchmark no usa MONGO_URI/MONGO_DATABASE
+import run
+import config
+from gateway_stand_in import GatewayStandIn
+from repositories.invoice_repository import COLLECTION_NAME as INVOICES_COLLECTION
+from repositories.order_repository import COLLECTION_NAME as ORDERS_COLLECTION
+from services.csv_reader import NotificationErrorStream
+
+script_dir = Path(__file__).parent
+
+_CSV_HEADER = ["Date", "Host", "Service", "#ordeId", "#identifier", "#recipient", "Content"]
+
+
+# ============================================================================
+# DATOS SINTÉTICOS
+# ============================================================================
+
+
+def generate_dataset(
+    n_orders: int,
+    seed: int,
+    duplicate_ratio: float = 0.1,
+    missing_order_ratio: float = 0.01,
+    no_folio_ratio: float = 0.01,
+    missing_invoice_ratio: float = 0.01,
+    no_email_ratio: float = 0.005,
+) -> dict:
+    """
+    Genera órdenes, facturas y filas del CSV de errores coherentes entre sí.
+
+    Las proporciones de órdenes inexistentes, sin siiFolio, sin factura y sin email
+    producen los mismos status de error que en producción; duplicate_ratio agrega
+    filas repetidas (mismo orderId) al CSV.
+
+    Returns:
+        {"orders", "invoices": listas de documentos, "rows": filas (orderId, recipient)}
+    """
+    rng = random.Random(seed)
+    orders, invoices, rows = [], [], []
+
+    for i in range(n_orders):
+        order_id = str(2200000000 + i)
+        recipient = "" if rng.random() < no_email_ratio else f"cliente{i}@example.invalid"
+        rows.append((order_id, recipient))
+        if rng.random() < missing_order_ratio:
+            continue
+        if rng.random() < no_folio_ratio:
+            orders.append({"orderId": order_id, "billing": {"status": "BILLED"}})
+            continue
+        sii_folio = str(5000000 + i)
+        orders.append({
+            "orderId": order_id,
+            "buyer": {"email": f"cliente{i}@example.invalid"},
+            "billing": {"siiFolio": sii_folio, "status": "BILLED"},
+        })
+        if rng.random() < missing_invoice_ratio:
+            continue
+        invoices.append({
+            "siiFolio": sii_folio,
+            "siiDocumentPath": f"https://docs.example.invalid/{sii_folio}.pdf",
+            "totalDetail": {"totalToPay": rng.randint(1990, 49990)},
+            "relatedElements": [{"identifier": order_id, "type": "order"}],
+        })
+
+    for order_id, recipient in rng.sample(rows, int(len(rows) * duplicate_ratio)):
+        rows.insert(rng.randrange(len(rows) + 1), (order_id, recipient))
+
+    return {"orders": orders, "invoices": invoices, "rows": rows}
+
+
+def write_csv_files(rows: list, out_dir: Path, n_files: int, compress: bool) -> list:
+    """Reparte las filas en n_files CSV con el formato del export de errores (opcionalmente .gz)."""
+    per_file = -(-len(rows) // n_files)
+    paths = []
+    for n in range(n_files):
+        suffix = ".csv.gz" if compress else ".csv"
+        path = out_dir / f"notification-errors-{n + 1}{suffix}"
+        opener = gzip.open if compress else open
+        with opener(path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            writer.writerow(_CSV_HEADER)
+            for order_id, recipient in rows[n * per_file: (n + 1) * per_file]:
+                writer.writerow([
+                    "2026-02-09T11:18:16.125Z",
+                    "bench",
+                    "bx-cnsr-finmg-billing-customer-notification",
+                    "",
+                    order_id,
+                    recipient,
+                    f"Skipping notification - Identifier: {order_id}, Recipient: {recipient}",
+                ])
+        paths.append(path)
+    return paths
+
+
+# ============================================================================
+# REEMPLAZO DE MONGODB EN MEMORIA
+# ============================================================================
+
+
+class _RoundTrips:
+    """Contador thread-safe de round-trips por operación."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_op = Counter()
+
+    def add(self, op: str, count: int = 1):
+        with self._lock:
+            self.by_op[op] += count
+
+    def total(self) -> int:
+        return sum(self.by_op.values())
+
+    def reset(self):
+        with self._lock:
+            self.by_op.clear()
+
+
+def _values(doc, path: str) -> list:
+    """Valores de un campo con notación de punto, recorriendo arrays como MongoDB."""
+    values = [doc]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                next_values.extend(v.get(part) for v in value if isinstance(v, dict))
+            elif isinstance(value, dict):
+                next_values.append(value.get(part))
+        values = next_values
+    return values
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, cond in query.items():
+        wanted = cond["$in"] if isinstance(cond, dict) and "$in" in cond else [cond]
+        if not any(value in wanted for value in _values(doc, field)):
+            return False
+    return True
+
+
+class _MemoryCollection:
+    """
+    Subconjunto de la API de pymongo.Collection usado por los repositorios.
+
+    Indexa por el primer campo del filtro (orderId en orders, siiFolio en invoices)
+    para no recorrer la colección en cada lote. La proyección no se aplica.
+    """
+
+    def __init__(self, name: str, key: str, round_trips: _RoundTrips, latency_s: float):
+        self.name = name
+        self._key = key
+        self._by_key = {}
+        self._round_trips = round_trips
+        self._latency_s = latency_s
+
+    def insert_many(self, docs: list, ordered: bool = True):
+        for doc in docs:
+            self._by_key.setdefault(doc[self._key], []).append(doc)
+
+    def find(self, query: dict, projection: dict = None, **kwargs):
+        self._round_trips.add(f"{self.name}.find")
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        cond = query[self._key]
+        keys = cond["$in"] if isinstance(cond, dict) else [cond]
+        return [
+            copy.deepcopy(doc)
+            for key in keys
+            for doc in self._by_key.get(key, [])
+            if _matches(doc, query)
+        ]
+
+
+class _MemoryDatabase(dict):
+    def __init__(self, round_trips: _RoundTrips, latency_s: float):
+        super().__init__({
+            ORDERS_COLLECTION: _MemoryCollection(ORDERS_COLLECTION, "orderId", round_trips, latency_s),
+            INVOICES_COLLECTION: _MemoryCollection(INVOICES_COLLECTION, "siiFolio", round_trips, latency_s),
+        })
+
+
+# ============================================================================
+# MONGOD LOCAL (OPCIONAL)
+# ============================================================================
+
+
+def _register_command_counter(round_trips: _RoundTrips):
+    """Cuenta cada comando find/getMore enviado por pymongo (debe ir antes de crear el cliente)."""
+    from pymongo import monitoring
+
+    class _CommandCounter(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name in ("find", "getMore"):
+                round_trips.add(event.command_name)
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(_CommandCounter())
+
+
+def _seed(mongo_db, dataset: dict):
+    """Siembra la base (en memoria o mongod local) con una copia del set sintético."""
+    for name, docs in ((ORDERS_COLLECTION, dataset["orders"]), (INVOICES_COLLECTION, dataset["invoices"])):
+        if docs:
+            mongo_db[name].insert_many(copy.deepcopy(docs), ordered=False)
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+
+def _configure(args, concurrency: int, base_url: str, ledger_path: Path):
+    """Sobreescribe config para la corrida: gateway local, sin DRY_RUN ni retry."""
+    config.NOTIFICATION_API_BASE_URL = base_url
+    config.NOTIFICATION_CONCURRENCY = concurrency
+    config.NOTIFICATION_MAX_RPS = args.max_rps
+    config.NOTIFICATION_MAX_RETRIES = args.max_retries
+    config.NOTIFICATION_TIMEOUT_S = args.timeout_s
+    config.LOOKUP_CHUNK_SIZE = args.chunk_size
+    config.LEDGER_ENABLED = args.ledger
+    config.LEDGER_PATH = str(ledger_path)
+    config.RETRY_FAILED = False
+    config.DRY_RUN = False
+
+
+def _run_pipeline(args, concurrency: int, csv_paths: list, mongo_db, mongo_rt: _RoundTrips, tmp_dir: Path) -> dict:
+    mongo_rt.reset()
+    gateway = GatewayStandIn(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        quota_rps=args.quota_rps,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        hang_ms=args.hang_ms,
+        seed=args.seed,
+    )
+    with gateway:
+        _configure(args, concurrency, gateway.base_url, tmp_dir / f"ledger_c{concurrency}.sqlite")
+        email_map = {}
+        stream = NotificationErrorStream(csv_paths, email_map)
+
+        output = sys.stdout if args.verbose else io.StringIO()
+        start = time.perf_counter()
+        with redirect_stdout(output):
+            results, dispatch_stats, _ = run.resend(mongo_db, iter(stream), None, email_map)
+        elapsed = time.perf_counter() - start
+        gateway_stats = gateway.stats()
+
+    lookups = -(-len(results) // args.chunk_size) if results else 0
+    statuses = Counter(r["status"] for r in results)
+    return {
+        "concurrency": concurrency,
+        "orders": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "orders_per_s": round(len(results) / elapsed, 1) if elapsed > 0 else None,
+        "sent_per_s": round(statuses.get("SENT", 0) / elapsed, 1) if elapsed > 0 else None,
+        "csv": stream.stats(),
+        "mongo_round_trips_per_lookup": round(mongo_rt.total() / lookups, 2) if lookups else 0,
+        "mongo_round_trips": dict(mongo_rt.by_op),
+        "dispatch": dispatch_stats,
+        "gateway": gateway_stats,
+        "statuses": dict(statuses),
+    }
+
+
+def _print_report(dataset: dict, args, reports: list):
+    rps_label = f"{args.max_rps} req/s" if args.max_rps > 0 else "sin límite"
+    quota_label = f"{args.quota_rps} req/s" if args.quota_rps > 0 else "sin cuota"
+    print()
+    print("=" * 65)
+    print("=== BENCHMARK notification-resend (datos sintéticos) ===")
+    print(f"  CSV             : {len(dataset['rows'])} filas en {args.files} archivo(s){' .gz' if args.gzip else ''}")
+    print(f"  MongoDB         : {args.mongo_uri or 'en memoria'} | latencia simulada {args.mongo_latency_ms} ms | lote {args.chunk_size}")
+    print(
+        f"  Gateway         : stand-in local | latencia {args.latency_ms}±{args.jitter_ms} ms | cuota {quota_label} | "
+        f"503 {args.error_rate:.1%} | hang {args.hang_rate:.1%}"
+    )
+    print(f"  Cliente         : máx {rps_label} | {args.max_retries} reintentos | timeout {args.timeout_s} s")
+    for r in reports:
+        d = r["dispatch"] or {}
+        print("-" * 65)
+        print(f"  [concurrencia {r['concurrency']}]")
+        print(f"  Throughput      : {r['orders_per_s']} OS/s, {r['sent_per_s']} enviadas/s ({r['orders']} OS en {r['elapsed_s']} s)")
+        print(
+            f"  API             : {d.get('requests')} requests ({d.get('retries')} reintentos), "
+            f"p50 {d.get('latency_ms_p50')} ms | p95 {d.get('latency_ms_p95')} ms | máx {d.get('latency_ms_max')} ms"
+        )
+        print(
+            f"  Gateway         : {r['gateway']['status_codes']} | {r['gateway']['hung']} demoradas | "
+            f"máx {r['gateway']['max_concurrent']} en paralelo"
+        )
+        print(f"  Mongo RT/lote   : {r['mongo_round_trips_per_lookup']}  {r['mongo_round_trips']}")
+        print(f"  Estados         : {r['statuses']}")
+    print("=" * 65)
+
+
+def _save_report(dataset: dict, args, reports: list):
+    logs_dir = Path(config.LOGS_DIR)
+    logs_dir = logs_dir if logs_dir.is_absolute() else script_dir / logs_dir
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    out = logs_dir / f"bench_resend_{datetime.now():%Y%m%d_%H%M%S}.json"
+    data = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k != "mongo_uri"},
+        "mongo": "mongod" if args.mongo_uri else "memory",
+        "csv_rows": len(dataset["rows"]),
+        "reports": reports,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nReporte guardado en: {out}")
+
+
+def _parse_concurrency(value: str) -> list:
+    try:
+        levels = [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("--concurrency espera enteros separados por coma (ej: 1,4,8)")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("--concurrency debe ser mayor que 0")
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del reenvío de notificaciones")
+    parser.add_argument("--orders", type=int, default=2000, help="orderIds únicos sintéticos (default: 2000)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1, help="Filas repetidas en el CSV (default: 0.1)")
+    parser.add_argument("--files", type=int, default=2, help="Archivos CSV en que se reparten las filas (default: 2)")
+    parser.add_argument("--gzip", action="store_true", help="Escribe los CSV comprimidos (.csv.gz)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--concurrency", type=_parse_concurrency, default=[config.NOTIFICATION_CONCURRENCY],
+        help=f"Envíos en paralelo; varios separados por coma para comparar (default: {config.NOTIFICATION_CONCURRENCY})",
+    )
+    parser.add_argument("--max-rps", type=float, default=config.NOTIFICATION_MAX_RPS, help=f"Límite del cliente en req/s, 0 = sin límite (default: {config.NOTIFICATION_MAX_RPS})")
+    parser.add_argument("--max-retries", type=int, default=config.NOTIFICATION_MAX_RETRIES, help=f"Reintentos por correo (default: {config.NOTIFICATION_MAX_RETRIES})")
+    parser.add_argument("--timeout-s", type=float, default=config.NOTIFICATION_TIMEOUT_S, help=f"Timeout por request (default: {config.NOTIFICATION_TIMEOUT_S})")
+    parser.add_argument("--chunk-size", type=int, default=config.LOOKUP_CHUNK_SIZE, help=f"orderIds por lote de lookup (default: {config.LOOKUP_CHUNK_SIZE})")
+    parser.add_argument("--ledger", action="store_true", help="Activa el ledger (archivo temporal por corrida)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia del gateway por request (default: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Variación ± de la latencia del gateway (default: 20)")
+    parser.add_argument("--quota-rps", type=float, default=0, help="Cuota del gateway antes de responder 429 (default: 0 = sin cuota)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503 del gateway (default: 0)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fracción de respuestas demoradas hang-ms (default: 0)")
+    parser.add_argument("--hang-ms", type=float, default=None, help="Demora de esas respuestas (default: timeout + 1 s)")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0, help="Latencia simulada por round-trip Mongo (solo en memoria)")
+    parser.add_argument("--mongo-uri", default="", help="mongod local de pruebas (default: Mongo en memoria)")
+    parser.add_argument("--mongo-db", default="notification_resend_bench", help="Base desechable en --mongo-uri (se elimina al terminar)")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida por orden de run.py")
+    args = parser.parse_args()
+
+    if args.orders <= 0 or args.files <= 0 or args.chunk_size <= 0:
+        raise ValueError("--orders, --files y --chunk-size deben ser mayores que 0.")
+    if args.timeout_s <= 0:
+        raise ValueError("--timeout-s debe ser mayor que 0.")
+    if not 0 <= args.error_rate + args.hang_rate <= 1:
+        raise ValueError("--error-rate + --hang-rate debe estar entre 0 y 1.")
+    if args.mongo_uri and (args.mongo_uri == config.MONGO_URI or args.mongo_db == config.MONGO_DATABASE):
+        raise ValueError(
+            "El benchmark siembra y elimina su base: --mongo-uri/--mongo-db no pueden apuntar a MONGO_URI/MONGO_DATABASE."
+        )
+    if args.hang_ms is None:
+        args.hang_ms = (args.timeout_s + 1) * 1000
+
+    print(f"Generando datos sintéticos ({args.orders} orderIds, {args.files} CSV)...")
+    dataset = generate_dataset(args.orders, args.seed, args.duplicate_ratio)
+    mongo_rt = _RoundTrips()
+    reports = []
+
+    with tempfile.TemporaryDirectory(prefix="bench_resend_") as tmp:
+        tmp_dir = Path(tmp)
+        csv_paths = write_csv_files(dataset["rows"], tmp_dir, args.files, args.gzip)
+
+        if args.mongo_uri:
+            from common.mongo.mongo_client import MongoConnection
+
+            _register_command_counter(mongo_rt)
+            with MongoConnection(uri=args.mongo_uri, database=args.mongo_db) as mongo_db:
+                try:
+                    mongo_db.client.drop_database(args.mongo_db)
+                    mongo_db[ORDERS_COLLECTION].create_index("orderId")
+                    mongo_db[INVOICES_COLLECTION].create_index("siiFolio")
+                    _seed(mongo_db, dataset)
+                    for concurrency in args.concurrency:
+                        print(f"Ejecutando con concurrencia {concurrency}...")
+                        reports.append(_run_pipeline(args, concurrency, csv_paths, mongo_db, mongo_rt, tmp_dir))
+                finally:
+                    mongo_db.client.drop_database(args.mongo_db)
+        else:
+            mongo_db = _MemoryDatabase(mongo_rt, args.mongo_latency_ms / 1000)
+            _seed(mongo_db, dataset)
+            for concurrency in args.concurrency:
+                print(f"Ejecutando con concurrencia {concurrency}...")
+                reports.append(_run_pipeline(args, concurrency, csv_paths, mongo_db, mongo_rt, tmp_dir))
+
+    _print_report(dataset, args, reports)
+    _save_report(dataset, args, reports)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nInterrumpido por el usuario.")
+        sys.exit(130)
+    except ValueError as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
@@ -48,7 +48,11 @@ DRY_RUN_EMAIL = "johann.gomez@blue.cl"
 # CONFIGURACIÓN: CSV DE ENTRADA
 # ============================================================================
 
-# Ruta al archivo CSV con los errores de notificación (relativa a este script)
+# CSV con los errores de notificación (relativo a este script). Acepta una ruta, un
+# patrón glob o una lista de ambos; cada archivo puede venir comprimido (.gz).
+# Se leen en streaming: los orderIds repetidos entre filas o archivos se procesan una
+# vez, con el primer #recipient no vacío.
+# Ejemplos: "./reports/*.csv.gz"  |  ["./reports/errores-1.csv", "./reports/errores-2.csv.gz"]
 CSV_FILE = "./reports/notification-errors.csv"
 
 # ============================================================================
@@ -61,8 +65,26 @@ LOGS_DIR = "./logs"
 # CONFIGURACIÓN: EJECUCIÓN
 # ============================================================================
 
-# Delay entre envíos de notificación (ms) para no saturar la API
-DELAY_MS = 500
+# Envío de notificaciones (services/notification_dispatcher.py): sesión HTTP keep-alive
+# compartida, NOTIFICATION_CONCURRENCY envíos en paralelo y como máximo
+# NOTIFICATION_MAX_RPS requests por segundo en total (incluye reintentos).
+# Ajustar NOTIFICATION_MAX_RPS a la cuota del gateway on-demand de SES (0 = sin límite).
+# NOTIFICATION_CONCURRENCY = 1 y NOTIFICATION_MAX_RPS = 2 equivale al envío
+# secuencial anterior con 500 ms entre correos.
+NOTIFICATION_CONCURRENCY = 8
+NOTIFICATION_MAX_RPS = 10
+NOTIFICATION_TIMEOUT_S = 30
+
+# Reintentos ante 429, 5xx, timeout o error de conexión, con backoff exponencial
+# con jitter: espera aleatoria entre 0 y min(MAX, BASE * 2^intento) ms.
+# En 429 con header Retry-After se espera lo que indica el gateway (hasta MAX).
+NOTIFICATION_MAX_RETRIES = 3
+NOTIFICATION_BACKOFF_BASE_MS = 500
+NOTIFICATION_BACKOFF_MAX_MS = 10000
+
+# orderIds por consulta a MongoDB: las órdenes y sus facturas se buscan por lotes
+# con $in (2 consultas por lote) en vez de 2 consultas por orderId.
+LOOKUP_CHUNK_SIZE = 500
 
 # Si es True, envía las notificaciones al DRY_RUN_EMAIL en lugar de al buyer.email real.
 # Si es False, envía al buyer.email real de cada orden.
@@ -75,6 +97,25 @@ DRY_RUN = True
 # En modo real (DRY_RUN=False) se ignora y siempre se procesan todos.
 DRY_RUN_LIMIT = 5
 
+# ============================================================================
+# CONFIGURACIÓN: LEDGER DE ENVÍOS
+# ============================================================================
+
+# Registro persistente de envíos (services/sent_ledger.py), clave orderId + siiFolio +
+# recipient. Cada envío se registra al completarse; en cada ejecución se omiten los ya
+# enviados (status ALREADY_SENT), así que relanzar el mismo CSV tras un corte continúa
+# donde quedó y no duplica correos.
+LEDGER_ENABLED = True
+LEDGER_PATH = "./logs/sent_ledger.sqlite"
+
+# Envíos con timeout esperando la respuesta (el correo pudo haber salido) quedan como
+# UNCERTAIN. False → no se reenvían; True → se reintentan en la próxima ejecución.
+LEDGER_RESEND_UNCERTAIN = False
+
+# Días que se conserva cada registro; al abrir el ledger se borran los más antiguos
+# (0 = sin compactación).
+LEDGER_RETENTION_DAYS = 90
+
 # ============================================================================
 # CONFIGURACIÓN: REINTENTO DE FALLIDOS
 # ============================================================================
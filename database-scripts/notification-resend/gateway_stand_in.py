@@ -0,0 +1,251 @@
+"""
+Stand-in local del gateway de notificaciones (POST /notif/on-demand/v1/ses).
+
+Servidor HTTP/1.1 keep-alive que imita el contrato del gateway sin enviar correos:
+valida el endpoint y el body (templateName, recipient.to) y responde 200 con un
+messageId. Permite simular:
+
+  - Latencia por request (latency_ms ± jitter_ms).
+  - Cuota del gateway: sobre quota_rps requests en la última ventana de 1 s
+    responde 429 con Retry-After.
+  - Errores del servidor: una fracción error_rate responde 503.
+  - Respuestas perdidas: una fracción hang_rate tarda hang_ms antes de responder
+    (con hang_ms > NOTIFICATION_TIMEOUT_S el cliente ve un timeout de lectura).
+
+Lo usa bench_resend.py, y también se puede levantar solo para probar run.py a mano
+apuntando NOTIFICATION_API_BASE_URL a http://127.0.0.1:<puerto>:
+
+    python ./database-scripts/notification-resend/gateway_stand_in.py --port 8089
+    python ./database-scripts/notification-resend/gateway_stand_in.py --latency-ms 120 --quota-rps 10 --error-rate 0.02
+
+Uso desde Python:
+    with GatewayStandIn(latency_ms=80, quota_rps=10) as gateway:
+        gateway.base_url   # http://127.0.0.1:<puerto>
+        ...
+        gateway.stats()
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from services.notification_client import NOTIFICATION_ENDPOINT
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers y body salen en escrituras separadas: sin esto Nagle + ACK diferido
+    # suman ~40 ms a cada respuesta
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if self.path != NOTIFICATION_ENDPOINT:
+            gateway._count(404)
+            self._reply(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            payload = json.loads(raw)
+            valid = bool(payload.get("templateName")) and bool(payload["recipient"]["to"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            valid = False
+        if not valid:
+            gateway._count(400)
+            self._reply(400, {"error": "Body inválido: se esperaba templateName y recipient.to"})
+            return
+
+        status, headers, delay_s = gateway._decide()
+        with gateway._lock:
+            gateway._active += 1
+            gateway._max_active = max(gateway._max_active, gateway._active)
+        try:
+            if delay_s:
+                time.sleep(delay_s)
+            gateway._count(status)
+            if status == 200:
+                self._reply(200, {"messageId": str(uuid.uuid4())})
+            elif status == 429:
+                self._reply(429, {"error": "Too Many Requests"}, headers)
+            else:
+                self._reply(status, {"error": "Service Unavailable"})
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó la conexión (timeout de lectura)
+            pass
+        finally:
+            with gateway._lock:
+                gateway._active -= 1
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class GatewayStandIn:
+    """
+    Args:
+        host / port: Dirección de escucha (port 0 = puerto libre)
+        latency_ms: Latencia base por request
+        jitter_ms: Variación uniforme ± sobre la latencia
+        quota_rps: Requests por segundo antes de responder 429 (0 = sin cuota)
+        retry_after_s: Valor del header Retry-After en los 429
+        error_rate: Fracción de requests que responden 503
+        hang_rate: Fracción de requests que tardan hang_ms en responder
+        hang_ms: Demora de esas respuestas
+        seed: Semilla del generador aleatorio (None = no determinista)
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 50,
+        jitter_ms: float = 20,
+        quota_rps: float = 0,
+        retry_after_s: float = 1,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_ms: float = 35000,
+        seed: int = None,
+    ):
+        self._latency_ms = latency_ms
+        self._jitter_ms = jitter_ms
+        self._quota_rps = quota_rps
+        self._retry_after_s = retry_after_s
+        self._error_rate = error_rate
+        self._hang_rate = hang_rate
+        self._hang_ms = hang_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._status_codes = Counter()
+        self._active = 0
+        self._max_active = 0
+        self._hung = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.gateway = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="gateway-stand-in", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _decide(self):
+        """(status, headers, demora en segundos) del próximo request."""
+        with self._lock:
+            now = time.monotonic()
+            if self._quota_rps > 0:
+                while self._window and now - self._window[0] >= 1.0:
+                    self._window.popleft()
+                if len(self._window) >= self._quota_rps:
+                    return 429, {"Retry-After": f"{self._retry_after_s:g}"}, 0.0
+                self._window.append(now)
+            roll = self._rng.random()
+            latency_ms = max(0.0, self._latency_ms + self._rng.uniform(-self._jitter_ms, self._jitter_ms))
+            if roll < self._hang_rate:
+                self._hung += 1
+                return 200, {}, self._hang_ms / 1000
+        if roll < self._hang_rate + self._error_rate:
+            return 503, {}, latency_ms / 1000
+        return 200, {}, latency_ms / 1000
+
+    def _count(self, status: int):
+        with self._lock:
+            self._status_codes[str(status)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests por código HTTP, respuestas demoradas (hang) y máximo de requests en paralelo."""
+        with self._lock:
+            return {
+                "requests": sum(self._status_codes.values()),
+                "status_codes": dict(self._status_codes),
+                "hung": self._hung,
+                "max_concurrent": self._max_active,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local del gateway de notificaciones")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia base por request (default: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Variación ± de la latencia (default: 20)")
+    parser.add_argument("--quota-rps", type=float, default=0, help="Requests/s antes de responder 429 (default: 0 = sin cuota)")
+    parser.add_argument("--retry-after-s", type=float, default=1, help="Retry-After de los 429 (default: 1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503 (default: 0)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fracción de respuestas demoradas (default: 0)")
+    parser.add_argument("--hang-ms", type=float, default=35000, help="Demora de esas respuestas (default: 35000)")
+    args = parser.parse_args()
+
+    if not 0 <= args.error_rate + args.hang_rate <= 1:
+        raise ValueError("--error-rate + --hang-rate debe estar entre 0 y 1.")
+
+    gateway = GatewayStandIn(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        quota_rps=args.quota_rps,
+        retry_after_s=args.retry_after_s,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        hang_ms=args.hang_ms,
+    )
+    print(f"Stand-in del gateway escuchando en {gateway.base_url}{NOTIFICATION_ENDPOINT}")
+    print(f"  → NOTIFICATION_API_BASE_URL = \"{gateway.base_url}\"  (Ctrl+C para terminar)")
+    gateway.start()
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        gateway.stop()
+        print(f"\n{gateway.stats()}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
@@ -13,6 +13,8 @@ Campos que leemos:
 
 Filtro de búsqueda:
     { "siiFolio": <siiFolio>, "relatedElements.identifier": <orderId> }
+    { "siiFolio": { "$in": [...] }, "relatedElements.identifier": { "$in": [...] } }
+        → búsqueda por lotes; los pares (siiFolio, orderId) se cruzan en memoria
 
 Ejemplo de documento relevante en MongoDB:
     {
@@ -32,7 +34,7 @@ Ejemplo de documento relevante en MongoDB:
     }
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 
 # Nombre de la colección en MongoDB
@@ -73,6 +75,44 @@ def find_invoice_by_folio_and_order(
     )
 
 
+def find_invoices_by_folio_and_order(
+    collection,
+    pairs: List[Tuple[str, str]],
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Busca las facturas de varios pares (siiFolio, orderId) en un solo round-trip.
+
+    La consulta usa $in sobre siiFolio y sobre relatedElements.identifier, lo que
+    puede traer combinaciones que no pidió nadie (folio de un par con orderId de
+    otro); por eso cada factura se asigna solo a los pares pedidos que calzan con
+    su siiFolio y alguno de sus relatedElements. Si un par calza con más de una
+    factura se conserva la primera, igual que find_invoice_by_folio_and_order.
+
+    Args:
+        collection: Referencia a la colección "invoices" de pymongo
+        pairs: Lista de tuplas (siiFolio, orderId) de un lote
+
+    Returns:
+        Diccionario (siiFolio, orderId) → documento proyectado (sin entrada si no existe)
+    """
+    wanted = set(pairs)
+    if not wanted:
+        return {}
+
+    query = {
+        "siiFolio": {"$in": sorted({folio for folio, _ in wanted})},
+        "relatedElements.identifier": {"$in": sorted({order_id for _, order_id in wanted})},
+    }
+    invoices = {}
+    for invoice in collection.find(query, INVOICE_PROJECTION):
+        folio = invoice.get("siiFolio")
+        for element in invoice.get("relatedElements") or []:
+            key = (folio, element.get("identifier"))
+            if key in wanted:
+                invoices.setdefault(key, invoice)
+    return invoices
+
+
 def extract_document_path(invoice: Dict[str, Any]) -> Optional[str]:
     """
     Extrae la URL del documento SII (enlace al comprobante).
@@ -11,6 +11,7 @@ Campos que leemos:
 
 Filtro de búsqueda:
     { "orderId": <orderId> }
+    { "orderId": { "$in": [<orderId>, ...] } }   → búsqueda por lotes
 
 Ejemplo de documento relevante en MongoDB:
     {
@@ -30,7 +31,7 @@ Ejemplo de documento relevante en MongoDB:
     }
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 # Nombre de la colección en MongoDB
@@ -62,6 +63,29 @@ def find_order_by_order_id(collection, order_id: str) -> Optional[Dict[str, Any]
     )
 
 
+def find_orders_by_order_ids(collection, order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca varias órdenes en un solo round-trip con { orderId: { $in: [...] } }.
+
+    Si hay más de un documento con el mismo orderId se conserva el primero,
+    igual que find_order_by_order_id (find_one).
+
+    Args:
+        collection: Referencia a la colección "orders" de pymongo
+        order_ids: Lista de orderIds (un lote; el que llama define el tamaño)
+
+    Returns:
+        Diccionario orderId → documento proyectado (sin entrada si no existe)
+    """
+    if not order_ids:
+        return {}
+
+    orders = {}
+    for order in collection.find({"orderId": {"$in": order_ids}}, ORDER_PROJECTION):
+        orders.setdefault(order.get("orderId"), order)
+    return orders
+
+
 def extract_sii_folio(order: Dict[str, Any]) -> Optional[str]:
     """
     Extrae el siiFolio del subdocumento billing de una orden.
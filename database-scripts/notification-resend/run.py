@@ -2,14 +2,20 @@
 Script orquestador para reenvío de notificaciones.
 
 Flujo:
-    1. Lee el CSV de errores de notificación → extrae orderIds y emails (#recipient)
-    2. Por cada orderId:
-        a. Consulta la colección "orders" → obtiene billing.siiFolio
-        b. Consulta la colección "invoices" con { siiFolio, relatedElements.identifier: orderId }
+    1. Lee los CSV de errores de notificación en streaming (uno o varios, planos o .gz)
+       → orderIds únicos y emails (#recipient), entregados a medida que se leen
+    2. Por lotes de LOOKUP_CHUNK_SIZE orderIds (services/order_lookup.py):
+        a. Consulta la colección "orders" con orderId $in → obtiene billing.siiFolio
+        b. Consulta la colección "invoices" con siiFolio $in + relatedElements.identifier $in
            → obtiene siiDocumentPath y totalDetail.totalToPay
-        c. Construye el payload de notificación (usando el email del CSV)
-        d. Llama a la API de envío de correos
-    3. Genera un log con el resultado
+    3. Por cada orderId, con la orden y factura ya resueltas:
+        a. Omite los envíos ya registrados en el ledger (services/sent_ledger.py) y
+           construye el payload de notificación (usando el email del CSV)
+        b. Encola el envío en el despachador concurrente (services/notification_dispatcher.py):
+           sesión keep-alive, NOTIFICATION_CONCURRENCY envíos en paralelo, máximo
+           NOTIFICATION_MAX_RPS requests/s y reintentos con backoff ante 429/5xx
+        c. Registra cada envío en el ledger apenas se completa (callback del envío)
+    4. Genera un log con el resultado
 
 Uso:
     python run.py
@@ -18,7 +24,10 @@ Uso:
 import json
 import os
 import sys
-import time
+from collections import deque
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -68,22 +77,20 @@ sys.path.insert(0, str(script_dir))
 
 import config
 from services.csv_reader import (
-    read_notification_errors,
-    get_unique_order_ids,
+    NotificationErrorStream,
     read_failed_from_log,
+    resolve_csv_paths,
 )
-from services.notification_client import (
-    send_notification,
-)
+from services.notification_dispatcher import NotificationDispatcher
+from services.sent_ledger import SENT, UNCERTAIN, SentLedger
+from services.order_lookup import iter_resolved
 from repositories.order_repository import (
     COLLECTION_NAME as ORDERS_COLLECTION,
-    find_order_by_order_id,
     extract_sii_folio,
     extract_buyer_email,
 )
 from repositories.invoice_repository import (
     COLLECTION_NAME as INVOICES_COLLECTION,
-    find_invoice_by_folio_and_order,
     extract_document_path,
     extract_total_to_pay,
 )
@@ -229,11 +236,25 @@ def main():
             "  Ejemplo: MONGO_DATABASE=soport-orders"
         )
 
+    if config.LOOKUP_CHUNK_SIZE < 1:
+        raise ValueError("LOOKUP_CHUNK_SIZE debe ser mayor que 0 (ver config.py).")
+    if config.NOTIFICATION_CONCURRENCY < 1 or config.NOTIFICATION_TIMEOUT_S <= 0:
+        raise ValueError(
+            "NOTIFICATION_CONCURRENCY y NOTIFICATION_TIMEOUT_S deben ser mayores que 0 (ver config.py)."
+        )
+    if config.LEDGER_RETENTION_DAYS < 0:
+        raise ValueError("LEDGER_RETENTION_DAYS no puede ser negativo (ver config.py).")
+    if config.NOTIFICATION_MAX_RPS < 0 or config.NOTIFICATION_MAX_RETRIES < 0:
+        raise ValueError(
+            "NOTIFICATION_MAX_RPS y NOTIFICATION_MAX_RETRIES no pueden ser negativos (ver config.py)."
+        )
+
     # Mostrar resumen y pedir confirmación
     print_configuration()
 
     # Almacenar el mapeo de emails (del CSV o log anterior)
     email_map = {}
+    csv_stream = None
 
     # 1. Obtener orderIds (desde CSV o desde JSON de retry)
     if config.RETRY_FAILED:
@@ -246,30 +267,40 @@ def main():
         print(f"[RETRY] Leyendo fallidos de: {retry_path}")
         order_ids = read_failed_from_log(str(retry_path))
         print(f"  → {len(order_ids)} orderIds fallidos encontrados\n")
-    else:
-        csv_path = resolve_path(config.CSV_FILE)
-        print(f"Leyendo CSV: {csv_path}")
-        records, email_map = read_notification_errors(str(csv_path))
-        order_ids = get_unique_order_ids(records)
-        print(
-            f"  → {len(records)} registros leídos, {len(order_ids)} orderIds únicos\n"
-        )
 
-    if not order_ids:
-        print("No hay orderIds para procesar. Abortando.")
-        return
+        if not order_ids:
+            print("No hay orderIds para procesar. Abortando.")
+            return
+        total = len(order_ids)
+    else:
+        # Los CSV se leen en streaming: los orderIds se resuelven y envían a medida
+        # que se leen, así que el total se conoce recién al terminar
+        csv_paths = resolve_csv_paths(config.CSV_FILE, script_dir)
+        print(f"Leyendo CSV ({len(csv_paths)} archivo(s), en streaming):")
+        for csv_path in csv_paths:
+            print(f"  • {csv_path}")
+        print()
+        csv_stream = NotificationErrorStream(csv_paths, email_map)
+        order_ids = iter(csv_stream)
+        total = None
 
     # Aplicar límite en modo DRY_RUN
-    total_csv = len(order_ids)
     if config.DRY_RUN and config.DRY_RUN_LIMIT > 0:
-        order_ids = order_ids[: config.DRY_RUN_LIMIT]
-        print(
-            f"  [DRY_RUN] Limitado a {len(order_ids)} de {total_csv} orderIds (DRY_RUN_LIMIT={config.DRY_RUN_LIMIT})\n"
-        )
+        if total is not None and total > config.DRY_RUN_LIMIT:
+            print(
+                f"  [DRY_RUN] Limitado a {config.DRY_RUN_LIMIT} de {total} orderIds (DRY_RUN_LIMIT={config.DRY_RUN_LIMIT})\n"
+            )
+            total = config.DRY_RUN_LIMIT
+        elif total is None:
+            print(f"  [DRY_RUN] Limitado a los primeros {config.DRY_RUN_LIMIT} orderIds (DRY_RUN_LIMIT={config.DRY_RUN_LIMIT})\n")
+        order_ids = islice(order_ids, config.DRY_RUN_LIMIT)
 
     # Confirmación antes de ejecutar
     if sys.stdin.isatty():
-        print(f"Se procesarán {len(order_ids)} orderIds.")
+        if total is not None:
+            print(f"Se procesarán {total} orderIds.")
+        else:
+            print("Se procesarán los orderIds únicos de los CSV (el total se informa al terminar).")
         if not config.DRY_RUN:
             print("  *** MODO REAL: se enviarán correos a los emails del CSV ***")
         confirm = prompt_yes_no("¿Confirmar ejecución?", True)
@@ -279,42 +310,123 @@ def main():
         print()
 
     # 2. Conectar a MongoDB y procesar
-    results = []
-
     _uri_display = (
         config.MONGO_URI.split("@")[-1] if "@" in config.MONGO_URI else config.MONGO_URI
     )
     print(f"Conectando a MongoDB: ...@{_uri_display} / {config.MONGO_DATABASE}\n")
 
     with MongoConnection(uri=config.MONGO_URI, database=config.MONGO_DATABASE) as db:
-        orders_col = db[ORDERS_COLLECTION]
-        invoices_col = db[INVOICES_COLLECTION]
+        results, dispatch_stats, ledger_stats = resend(db, order_ids, total, email_map)
+
+    csv_stats = csv_stream.stats() if csv_stream is not None else None
+    if csv_stats:
+        print(
+            f"\nCSV: {csv_stats['rows']} registros leídos, {csv_stats['unique_order_ids']} orderIds únicos "
+            f"({csv_stats['duplicates']} repetidos)"
+        )
+    if not results:
+        print("No hay orderIds para procesar.")
+        return
+
+    # 3. Resumen y log
+    print_summary(results, dispatch_stats, ledger_stats)
+    save_log(results, dispatch_stats, ledger_stats, csv_stats)
+
+
+def resend(db, order_ids, total, email_map):
+    """
+    Resuelve, envía y registra los orderIds (pasos 2 y 3 del flujo).
+
+    Separado de main() para que bench_resend.py ejecute el mismo pipeline contra
+    datos sintéticos y el stand-in del gateway (gateway_stand_in.py).
+
+    Args:
+        db: Base de datos MongoDB (colecciones orders e invoices)
+        order_ids: orderIds a procesar (lista o iterador en streaming)
+        total: Cantidad de orderIds, o None si aún no se conoce
+        email_map: orderId → email del CSV (o del log anterior si es retry)
+
+    Returns:
+        Tupla (results, dispatch_stats, ledger_stats)
+    """
+    results = []
+    orders_col = db[ORDERS_COLLECTION]
+    invoices_col = db[INVOICES_COLLECTION]
+
+    # Órdenes y facturas se resuelven por lotes ($in) antes de enviar cada lote
+    resolved = iter_resolved(
+        order_ids, orders_col, invoices_col, config.LOOKUP_CHUNK_SIZE
+    )
 
-        for idx, order_id in enumerate(order_ids, 1):
-            result = process_order(
+    # Envíos en vuelo (idx, result, future), completados en orden de entrada.
+    # El tope evita resolver todo el CSV antes de que salgan los primeros correos.
+    in_flight = deque()
+    max_in_flight = config.NOTIFICATION_CONCURRENCY * 4
+
+    # Ledger de envíos: se consulta antes de cada envío y se escribe al completarlo, desde
+    # el callback del Future: no espera a los envíos anteriores en in_flight, y si el loop
+    # se corta (Ctrl+C, excepción) los envíos en curso igual quedan registrados
+    ledger_cm = (
+        SentLedger(resolve_path(config.LEDGER_PATH), config.LEDGER_RETENTION_DAYS)
+        if config.LEDGER_ENABLED
+        else nullcontext()
+    )
+
+    with ledger_cm as ledger, NotificationDispatcher(
+        base_url=config.NOTIFICATION_API_BASE_URL,
+        headers=NOTIFICATION_HEADERS,
+        concurrency=config.NOTIFICATION_CONCURRENCY,
+        max_rps=config.NOTIFICATION_MAX_RPS,
+        max_retries=config.NOTIFICATION_MAX_RETRIES,
+        backoff_base_ms=config.NOTIFICATION_BACKOFF_BASE_MS,
+        backoff_max_ms=config.NOTIFICATION_BACKOFF_MAX_MS,
+        timeout=config.NOTIFICATION_TIMEOUT_S,
+    ) as dispatcher:
+        for idx, (order_id, order, invoice) in enumerate(resolved, 1):
+            result, payload = process_order(
                 idx=idx,
-                total=len(order_ids),
+                total=total,
                 order_id=order_id,
-                orders_col=orders_col,
-                invoices_col=invoices_col,
+                order=order,
+                invoice=invoice,
                 email_map=email_map,
+                ledger=ledger,
             )
             results.append(result)
+            if payload is not None:
+                future = dispatcher.submit(payload)
+                if ledger is not None:
+                    future.add_done_callback(partial(record_in_ledger, ledger, result))
+                in_flight.append((idx, result, future))
 
-            if config.DELAY_MS > 0 and idx < len(order_ids):
-                time.sleep(config.DELAY_MS / 1000.0)
+            while in_flight and (
+                len(in_flight) >= max_in_flight or in_flight[0][2].done()
+            ):
+                done_idx, done_result, future = in_flight.popleft()
+                complete_order(done_idx, total, done_result, future.result())
 
-    # 3. Resumen y log
-    print_summary(results)
-    save_log(results)
+        while in_flight:
+            done_idx, done_result, future = in_flight.popleft()
+            complete_order(done_idx, total, done_result, future.result())
 
+        dispatch_stats = dispatcher.stats()
+        ledger_stats = ledger.stats() if ledger is not None else None
 
-def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
-    """Procesa un orderId: consulta DB, construye payload, envía notificación.
+    return results, dispatch_stats, ledger_stats
 
+
+def process_order(idx, total, order_id, order, invoice, email_map, ledger=None):
+    """Procesa un orderId: valida orden y factura y construye el payload.
+
+    La orden y la factura vienen resueltas por lotes (services/order_lookup.py);
+    None si no se encontraron.
     El email del destinatario se obtiene del CSV (email_map), no de la BD.
+
+    Returns:
+        Tupla (result, payload). payload es None si la orden no se puede notificar
+        (result ya tiene el status del motivo); si no, el envío lo completa complete_order.
     """
-    prefix = f"[{idx}/{total}]"
+    prefix = _progress_prefix(idx, total)
     result = {"order_id": order_id, "status": "PENDING"}
 
     # Obtener email del CSV (o del log anterior si es retry)
@@ -322,33 +434,31 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
     if not csv_email and not config.DRY_RUN:
         print(f"{prefix} ✗ Sin email en CSV: {order_id}")
         result["status"] = "NO_EMAIL_IN_CSV"
-        return result
+        return result, None
 
     result["csv_email"] = csv_email
 
-    # 2a. Buscar orden
-    order = find_order_by_order_id(orders_col, order_id)
+    # 2a. Orden
     if not order:
         print(f"{prefix} ✗ Orden no encontrada: {order_id}")
         result["status"] = "ORDER_NOT_FOUND"
-        return result
+        return result, None
 
     sii_folio = extract_sii_folio(order)
     if not sii_folio:
         print(f"{prefix} ✗ Sin siiFolio en billing: {order_id}")
         result["status"] = "NO_SII_FOLIO"
-        return result
+        return result, None
 
     result["sii_folio"] = sii_folio
 
-    # 2b. Buscar factura
-    invoice = find_invoice_by_folio_and_order(invoices_col, sii_folio, order_id)
+    # 2b. Factura
     if not invoice:
         print(
             f"{prefix} ✗ Factura no encontrada: siiFolio={sii_folio}, orderId={order_id}"
         )
         result["status"] = "INVOICE_NOT_FOUND"
-        return result
+        return result, None
 
     document_path = extract_document_path(invoice)
     total_to_pay = extract_total_to_pay(invoice)
@@ -356,12 +466,12 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
     if not document_path:
         print(f"{prefix} ✗ Sin siiDocumentPath en factura: {order_id}")
         result["status"] = "NO_DOCUMENT_PATH"
-        return result
+        return result, None
 
     if total_to_pay is None:
         print(f"{prefix} ✗ Sin totalToPay en factura: {order_id}")
         result["status"] = "NO_TOTAL_TO_PAY"
-        return result
+        return result, None
 
     result["sii_document_path"] = document_path
     result["total_to_pay"] = total_to_pay
@@ -370,6 +480,16 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
     recipient_email = config.DRY_RUN_EMAIL if config.DRY_RUN else csv_email
     result["recipient_email"] = recipient_email
 
+    # Envío ya registrado en el ledger (ejecución anterior, o cortada a la mitad)
+    if ledger is not None:
+        previous = ledger.lookup(order_id, sii_folio, recipient_email)
+        if previous == SENT or (previous == UNCERTAIN and not config.LEDGER_RESEND_UNCERTAIN):
+            print(f"{prefix} = Ya enviada ({previous}): orderId={order_id} → {recipient_email}")
+            result["status"] = "ALREADY_SENT"
+            result["ledger_status"] = previous
+            ledger.skipped += 1
+            return result, None
+
     # 2c. Construir payload
     payload = build_notification_request(
         order_id=order_id,
@@ -380,21 +500,46 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
         from_address=config.FROM_ADDRESS,
     )
 
-    # 2d. Enviar notificación
-    mode_label = "[DRY_RUN]" if config.DRY_RUN else "[PROD]"
+    return result, payload
 
-    api_result = send_notification(
-        base_url=config.NOTIFICATION_API_BASE_URL,
-        payload=payload,
-        headers=NOTIFICATION_HEADERS,
+
+def record_in_ledger(ledger, result, future):
+    """
+    Callback de cada envío: registra SENT / UNCERTAIN en el ledger apenas se completa.
+
+    Corre en el hilo del despachador que completó el envío. Los envíos cancelados (no
+    salieron) y los que fallaron sin respuesta de entrega no se registran.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    api_result = future.result()
+    if api_result["status"] == "OK":
+        status, status_code = SENT, api_result.get("status_code")
+    elif api_result.get("delivery_unknown"):
+        # Timeout esperando la respuesta: el correo pudo haber salido
+        status, status_code = UNCERTAIN, None
+    else:
+        return
+    ledger.record(
+        result["order_id"], result["sii_folio"], result["recipient_email"], status,
+        status_code, api_result.get("attempts"),
     )
 
+
+def complete_order(idx, total, result, api_result):
+    """Registra en result la respuesta de la API para un envío despachado (el ledger lo escribe record_in_ledger)."""
+    prefix = _progress_prefix(idx, total)
+    mode_label = "[DRY_RUN]" if config.DRY_RUN else "[PROD]"
+    order_id = result["order_id"]
+
     result["api_status"] = api_result["status"]
     result["api_status_code"] = api_result.get("status_code")
+    result["api_attempts"] = api_result.get("attempts")
+    result["api_latency_ms"] = api_result.get("latency_ms")
 
     if api_result["status"] == "OK":
         print(
-            f"{prefix} {mode_label} ✓ Enviada: orderId={order_id} → {recipient_email}"
+            f"{prefix} {mode_label} ✓ Enviada: orderId={order_id} → {result['recipient_email']}"
         )
         result["status"] = "SENT"
     else:
@@ -403,8 +548,9 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
         )
         result["status"] = "API_ERROR"
         result["error"] = api_result.get("error")
-
-    return result
+        # Timeout esperando la respuesta: el correo pudo haber salido
+        if api_result.get("delivery_unknown"):
+            result["delivery_unknown"] = True
 
 
 # ============================================================================
@@ -412,6 +558,11 @@ def process_order(idx, total, order_id, orders_col, invoices_col, email_map):
 # ============================================================================
 
 
+def _progress_prefix(idx, total) -> str:
+    """[idx/total], o [idx] si el total aún no se conoce (lectura de CSV en streaming)."""
+    return f"[{idx}/{total}]" if total is not None else f"[{idx}]"
+
+
 def resolve_path(relative_path: str) -> Path:
     """Resuelve una ruta relativa al directorio del script."""
     p = Path(relative_path)
@@ -440,7 +591,15 @@ def print_configuration():
     else:
         print(f"   • Modo:         NORMAL (desde CSV)")
         print(f"   • CSV:          {config.CSV_FILE}")
-    print(f"   • Delay:        {config.DELAY_MS}ms")
+    rps_label = (
+        f"{config.NOTIFICATION_MAX_RPS} req/s" if config.NOTIFICATION_MAX_RPS > 0 else "sin límite"
+    )
+    print(f"   • Envíos:       {config.NOTIFICATION_CONCURRENCY} en paralelo, máx {rps_label}, {config.NOTIFICATION_MAX_RETRIES} reintentos")
+    print(f"   • Lote lookup:  {config.LOOKUP_CHUNK_SIZE} orderIds por consulta")
+    ledger_label = (
+        f"{config.LEDGER_PATH} (omite ya enviados)" if config.LEDGER_ENABLED else "desactivado"
+    )
+    print(f"   • Ledger:       {ledger_label}")
     print(f"   • Dry Run:      {config.DRY_RUN}")
     if config.DRY_RUN:
         print(f"   • DRY_RUN Email:{config.DRY_RUN_EMAIL} (reemplaza email del CSV)")
@@ -454,23 +613,40 @@ def print_configuration():
     print()
 
 
-def print_summary(results):
+def print_summary(results, dispatch_stats=None, ledger_stats=None):
     total = len(results)
     sent = sum(1 for r in results if r["status"] == "SENT")
-    errors = total - sent
+    already_sent = sum(1 for r in results if r["status"] == "ALREADY_SENT")
+    errors = total - sent - already_sent
 
     print()
     print("=" * 50)
     print("=== RESUMEN FINAL ===")
     print(f"   Total procesados:    {total}")
     print(f"   Enviados:            {sent}")
+    if already_sent:
+        print(f"   Ya enviados (ledger):{already_sent}")
     print(f"   Errores/No enviados: {errors}")
+    if dispatch_stats and dispatch_stats["requests"]:
+        print(
+            f"   Requests API:        {dispatch_stats['requests']} ({dispatch_stats['retries']} reintentos, "
+            f"{dispatch_stats['requests_per_second']} req/s)"
+        )
+        print(
+            f"   Latencia API:        p50 {dispatch_stats['latency_ms_p50']} ms | "
+            f"p95 {dispatch_stats['latency_ms_p95']} ms | máx {dispatch_stats['latency_ms_max']} ms"
+        )
+    if ledger_stats:
+        print(
+            f"   Ledger:              {ledger_stats['recorded']} registrados, "
+            f"{ledger_stats['purged']} compactados ({ledger_stats['path']})"
+        )
     if config.DRY_RUN:
         print(f"   (Enviados a: {config.DRY_RUN_EMAIL})")
     print("=" * 50)
 
 
-def save_log(results):
+def save_log(results, dispatch_stats=None, ledger_stats=None, csv_stats=None):
     logs_dir = resolve_path(config.LOGS_DIR)
     logs_dir.mkdir(parents=True, exist_ok=True)
 
@@ -483,11 +659,15 @@ def save_log(results):
         "retry_source": (
             str(resolve_path(config.RETRY_FILE)) if config.RETRY_FAILED else None
         ),
+        "csv": csv_stats,
         "dry_run": config.DRY_RUN,
         "dry_run_email": config.DRY_RUN_EMAIL if config.DRY_RUN else None,
         "total": len(results),
         "sent": sum(1 for r in results if r["status"] == "SENT"),
-        "errors": sum(1 for r in results if r["status"] != "SENT"),
+        "already_sent": sum(1 for r in results if r["status"] == "ALREADY_SENT"),
+        "errors": sum(1 for r in results if r["status"] not in ("SENT", "ALREADY_SENT")),
+        "dispatch": dispatch_stats,
+        "ledger": ledger_stats,
         "results": results,
     }
 
@@ -2,12 +2,13 @@
 Servicio para leer fuentes de entrada de orderIds.
 
 Soporta dos fuentes:
-    1. CSV de errores de notificación (reports/notification-errors.csv)
+    1. CSV de errores de notificación (reports/notification-errors.csv), uno o varios,
+       planos o comprimidos (.gz), leídos en streaming (NotificationErrorStream)
     2. JSON de log de ejecución anterior (logs/resend_*.json) → para reintentar fallidos
 
 CSV esperado:
     Separador: coma (,)
-    Encoding: UTF-8
+    Encoding: UTF-8 (opcionalmente comprimido con gzip)
     Columnas: Date, Host, Service, #ordeId, #identifier, #recipient, Content
     Columnas que extraemos:
         - #identifier  → orderId
@@ -16,85 +17,122 @@ CSV esperado:
 JSON de retry esperado:
     El JSON generado por save_log() en run.py.
     Contiene "results" con objetos que tienen "order_id" y "status".
-    Se filtran solo los que NO tienen status "SENT".
+    Se filtran solo los que NO tienen status "SENT" ni "ALREADY_SENT".
 """
 
 import csv
+import glob
+import gzip
 import json
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Any, Dict, Iterator, List, Union
 
 
-def read_notification_errors(
-    csv_path: str,
-) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
+def resolve_csv_paths(csv_files: Union[str, List[str]], base_dir: Path) -> List[Path]:
     """
-    Lee el CSV de errores de notificación y extrae los datos relevantes.
+    Resuelve CSV_FILE de config.py a una lista de archivos.
 
-    Args:
-        csv_path: Ruta al archivo CSV
+    Acepta una ruta, un patrón glob ("./reports/*.csv.gz") o una lista de ambos;
+    las rutas relativas se resuelven respecto de base_dir. Mantiene el orden
+    indicado (los patrones se expanden en orden alfabético) y omite repetidos.
 
-    Returns:
-        Tupla de:
-            - Lista de diccionarios con: order_id, recipient
-            - Diccionario de mapeo: order_id → recipient (email del CSV)
+    Raises:
+        FileNotFoundError: Si una ruta no existe o un patrón no encuentra archivos
     """
-    path = Path(csv_path)
-    if not path.exists():
-        raise FileNotFoundError(f"No se encontró el archivo CSV: {csv_path}")
-
-    records = []
-    email_map = {}
-
-    with open(path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            identifier = (row.get("#identifier") or "").strip()
-            recipient = (row.get("#recipient") or "").strip()
-
-            if not identifier:
-                continue
-
-            records.append(
-                {
-                    "order_id": identifier,
-                    "recipient": recipient,
-                }
-            )
-
-            # Mapeo: order_id → email (el primero que se encuentra)
-            if identifier not in email_map and recipient:
-                email_map[identifier] = recipient
-
-    return records, email_map
+    entries = [csv_files] if isinstance(csv_files, str) else list(csv_files)
+    paths = []
+    for entry in entries:
+        pattern = Path(entry)
+        if not pattern.is_absolute():
+            pattern = base_dir / entry
+        if glob.has_magic(str(pattern)):
+            matches = sorted(Path(p) for p in glob.glob(str(pattern)))
+            if not matches:
+                raise FileNotFoundError(f"Ningún archivo CSV coincide con: {entry}")
+        elif pattern.exists():
+            matches = [pattern]
+        else:
+            raise FileNotFoundError(f"No se encontró el archivo CSV: {pattern}")
+        for match in matches:
+            if match not in paths:
+                paths.append(match)
+    return paths
+
+
+def _open_csv(path: Path):
+    """Abre un CSV plano o comprimido (.gz) en modo texto."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+class NotificationErrorStream:
+    """
+    Lee uno o varios CSV de errores (planos o .gz) fila a fila y entrega los
+    orderIds únicos a medida que aparecen, sin cargar los archivos en memoria.
 
+    El email de cada orderId (el primero no vacío) se agrega a email_map al momento
+    de entregar el orderId. Un orderId cuyas filas vistas hasta ahora no traen email
+    se retiene hasta encontrar uno, o se entrega sin email al terminar los archivos.
 
-def get_unique_order_ids(records: List[Dict[str, str]]) -> List[str]:
-    """
-    Extrae los orderIds únicos de los registros del CSV.
-    Mantiene el orden de primera aparición.
+    La memoria crece con la cantidad de orderIds únicos (email_map), no con el
+    tamaño de los CSV.
 
     Args:
-        records: Lista de registros retornados por read_notification_errors
-
-    Returns:
-        Lista de orderIds únicos
+        csv_paths: Archivos a leer, en orden (ver resolve_csv_paths)
+        email_map: Diccionario order_id → recipient que se completa durante la lectura
     """
-    seen = set()
-    unique = []
-    for record in records:
-        oid = record["order_id"]
-        if oid not in seen:
-            seen.add(oid)
-            unique.append(oid)
-    return unique
+
+    def __init__(self, csv_paths: List[Path], email_map: Dict[str, str]):
+        self.csv_paths = csv_paths
+        self.email_map = email_map
+        self.rows = 0
+        self.unique = 0
+        self.duplicates = 0
+
+    def __iter__(self) -> Iterator[str]:
+        without_email = {}  # orderIds vistos solo con #recipient vacío (en orden)
+        for path in self.csv_paths:
+            with _open_csv(path) as f:
+                for row in csv.DictReader(f):
+                    identifier = (row.get("#identifier") or "").strip()
+                    recipient = (row.get("#recipient") or "").strip()
+                    if not identifier:
+                        continue
+                    self.rows += 1
+
+                    if identifier in self.email_map:
+                        self.duplicates += 1
+                        continue
+                    if not recipient:
+                        if identifier in without_email:
+                            self.duplicates += 1
+                        without_email[identifier] = True
+                        continue
+                    if without_email.pop(identifier, None):
+                        self.duplicates += 1
+
+                    self.email_map[identifier] = recipient
+                    self.unique += 1
+                    yield identifier
+
+        for identifier in without_email:
+            self.unique += 1
+            yield identifier
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": [str(p) for p in self.csv_paths],
+            "rows": self.rows,
+            "unique_order_ids": self.unique,
+            "duplicates": self.duplicates,
+        }
 
 
 def read_failed_from_log(json_path: str) -> List[str]:
     """
     Lee un JSON de log de ejecución anterior y extrae los orderIds
-    que NO fueron enviados exitosamente (status != "SENT").
+    que NO fueron enviados exitosamente (status distinto de "SENT" y "ALREADY_SENT").
 
     Args:
         json_path: Ruta al archivo JSON de log
@@ -119,7 +157,7 @@ def read_failed_from_log(json_path: str) -> List[str]:
         order_id = entry.get("order_id", "")
         status = entry.get("status", "")
 
-        if status != "SENT" and order_id and order_id not in seen:
+        if status not in ("SENT", "ALREADY_SENT") and order_id and order_id not in seen:
             seen.add(order_id)
             failed_ids.append(order_id)
 
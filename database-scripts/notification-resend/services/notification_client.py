@@ -16,7 +16,8 @@ Referencia del curl original:
 import requests
 import json
 import urllib3
-from typing import Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional
 
 # Desactivar warnings de SSL para certificados internos/privados
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -26,11 +27,33 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 NOTIFICATION_ENDPOINT = "/notif/on-demand/v1/ses"
 
 
+def create_session(pool_size: int) -> requests.Session:
+    """
+    Crea una sesión HTTP con conexiones keep-alive reutilizables.
+
+    Sin sesión, cada requests.post abre una conexión nueva (TCP + TLS) por correo.
+    La sesión mantiene hasta pool_size conexiones abiertas al gateway, una por
+    envío concurrente.
+
+    Args:
+        pool_size: Conexiones máximas del pool (= envíos concurrentes)
+
+    Returns:
+        requests.Session lista para usar desde varios hilos
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def send_notification(
     base_url: str,
     payload: Dict[str, Any],
     headers: Dict[str, str],
     timeout: int = 30,
+    session: Optional[requests.Session] = None,
 ) -> Dict[str, Any]:
     """
     Envía una notificación a la API.
@@ -40,6 +63,7 @@ def send_notification(
         payload: Diccionario con el body del request (ver entities/notification_request.py)
         headers: Headers del request (ver entities/notification_request.py → NOTIFICATION_HEADERS)
         timeout: Timeout en segundos para la petición
+        session: Sesión con pool de conexiones (ver create_session); None = conexión nueva
 
     Returns:
         Diccionario con:
@@ -47,11 +71,15 @@ def send_notification(
             - status_code: Código HTTP de respuesta
             - response: Body de la respuesta (si aplica)
             - error: Mensaje de error (si aplica)
+            - retry_after: Segundos del header Retry-After (si aplica)
+            - delivery_unknown: True si hubo timeout esperando la respuesta (el envío
+              pudo haberse completado; no conviene reintentar)
     """
     url = f"{base_url.rstrip('/')}{NOTIFICATION_ENDPOINT}"
+    http = session if session is not None else requests
 
     try:
-        response = requests.post(
+        response = http.post(
             url,
             headers=headers,
             json=payload,
@@ -71,8 +99,17 @@ def send_notification(
                 "status_code": response.status_code,
                 "response": _safe_json(response),
                 "error": f"HTTP {response.status_code}: {response.text[:200]}",
+                "retry_after": _retry_after(response),
             }
 
+    except requests.exceptions.ReadTimeout:
+        # El request llegó al gateway pero la respuesta no: el correo pudo haber salido
+        return {
+            "status": "ERROR",
+            "status_code": None,
+            "error": f"Timeout después de {timeout}s esperando la respuesta de {url}",
+            "delivery_unknown": True,
+        }
     except requests.exceptions.Timeout:
         return {
             "status": "ERROR",
@@ -93,6 +130,15 @@ def send_notification(
         }
 
 
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Segundos del header Retry-After (solo formato numérico), o None."""
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
 def _safe_json(response: requests.Response) -> Any:
     """Intenta parsear la respuesta como JSON; si falla, retorna el texto."""
     try:
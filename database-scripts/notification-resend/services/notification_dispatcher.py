@@ -0,0 +1,177 @@
+"""
+Despacho concurrente de notificaciones con pool de conexiones, límite de tasa y reintentos.
+
+Antes cada correo se enviaba de a uno con una conexión nueva (TCP + TLS) y un
+sleep de DELAY_MS entre envíos: un reenvío de 20.000 correos tomaba horas.
+NotificationDispatcher:
+
+    - Mantiene una sesión HTTP keep-alive compartida (notification_client.create_session).
+    - Envía hasta NOTIFICATION_CONCURRENCY correos en paralelo (hilos).
+    - Limita la tasa a NOTIFICATION_MAX_RPS requests por segundo entre todos los hilos
+      (cuota del gateway on-demand de SES). Los reintentos también cuentan.
+    - Reintenta 429, 5xx, timeouts de conexión y errores de conexión hasta
+      NOTIFICATION_MAX_RETRIES veces con backoff exponencial con jitter ("full jitter");
+      en 429 respeta Retry-After. Un timeout esperando la respuesta no se reintenta
+      (el correo pudo haber salido; ver services/sent_ledger.py).
+    - Registra la latencia de cada request para el resumen (p50 / p95 / máx).
+
+Uso:
+    with NotificationDispatcher(base_url, headers, concurrency=8, max_rps=10) as dispatcher:
+        future = dispatcher.submit(payload)
+        api_result = future.result()   # mismo formato que send_notification + attempts / latency_ms
+        ...
+        stats = dispatcher.stats()
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from services.notification_client import create_session, send_notification
+
+
+def _is_retryable(api_result: Dict[str, Any]) -> bool:
+    """
+    429, 5xx, timeout de conexión y errores de conexión se reintentan; otros 4xx no.
+    Un timeout esperando la respuesta tampoco: el correo pudo haber salido.
+    """
+    if api_result["status"] == "OK" or api_result.get("delivery_unknown"):
+        return False
+    status_code = api_result.get("status_code")
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[idx], 1)
+
+
+class _RateLimiter:
+    """Reparte los requests en intervalos de 1/max_rps segundos entre todos los hilos."""
+
+    def __init__(self, max_rps: float):
+        self._interval = 1.0 / max_rps if max_rps > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class NotificationDispatcher:
+    """
+    Args:
+        base_url: URL base del servicio de notificaciones
+        headers: Headers del request (NOTIFICATION_HEADERS)
+        concurrency: Envíos en paralelo (y conexiones del pool)
+        max_rps: Requests por segundo como máximo (0 = sin límite)
+        max_retries: Reintentos por correo ante 429 / 5xx / timeout / conexión
+        backoff_base_ms: Backoff del primer reintento; se duplica en cada intento
+        backoff_max_ms: Tope del backoff
+        timeout: Timeout en segundos por request
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        concurrency: int = 8,
+        max_rps: float = 10,
+        max_retries: int = 3,
+        backoff_base_ms: int = 500,
+        backoff_max_ms: int = 10000,
+        timeout: int = 30,
+    ):
+        self._base_url = base_url
+        self._headers = headers
+        self._max_retries = max_retries
+        self._backoff_base_ms = backoff_base_ms
+        self._backoff_max_ms = backoff_max_ms
+        self._timeout = timeout
+        self._limiter = _RateLimiter(max_rps)
+        self._session = create_session(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="notif")
+        self._lock = threading.Lock()
+        self._latencies_ms = []
+        self._requests = 0
+        self._retries = 0
+        self._status_codes = {}
+        self._started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Con una excepción (ej: Ctrl+C) los envíos encolados se descartan: solo terminan
+        # los que ya están en curso (y sus callbacks los registran en el ledger)
+        self.close(cancel_pending=exc_type is not None)
+        return False
+
+    def close(self, cancel_pending: bool = False):
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+        self._session.close()
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        """Encola un envío; el Future retorna el resultado de send_notification + attempts / latency_ms."""
+        return self._executor.submit(self._send, payload)
+
+    def _backoff_seconds(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self._backoff_max_ms / 1000.0)
+        cap = min(self._backoff_max_ms, self._backoff_base_ms * (2 ** attempt))
+        return random.uniform(0, cap) / 1000.0
+
+    def _send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            self._limiter.wait()
+            start = time.monotonic()
+            api_result = send_notification(
+                base_url=self._base_url,
+                payload=payload,
+                headers=self._headers,
+                timeout=self._timeout,
+                session=self._session,
+            )
+            latency_ms = (time.monotonic() - start) * 1000
+            with self._lock:
+                self._requests += 1
+                self._latencies_ms.append(latency_ms)
+                code = str(api_result.get("status_code"))
+                self._status_codes[code] = self._status_codes.get(code, 0) + 1
+
+            if attempt >= self._max_retries or not _is_retryable(api_result):
+                api_result["attempts"] = attempt + 1
+                api_result["latency_ms"] = round(latency_ms, 1)
+                return api_result
+
+            with self._lock:
+                self._retries += 1
+            time.sleep(self._backoff_seconds(attempt, api_result.get("retry_after")))
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, reintentos, códigos HTTP, latencia p50/p95/máx y tasa efectiva."""
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            elapsed = time.monotonic() - self._started
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "status_codes": dict(self._status_codes),
+                "latency_ms_p50": _percentile(latencies, 50),
+                "latency_ms_p95": _percentile(latencies, 95),
+                "latency_ms_max": round(latencies[-1], 1) if latencies else None,
+                "requests_per_second": round(self._requests / elapsed, 2) if elapsed > 0 else None,
+            }
@@ -0,0 +1,148 @@
+"""
+Registro persistente (SQLite) de notificaciones ya enviadas.
+
+Antes el único registro de lo enviado era el log JSON de la ejecución, escrito al
+final: una ejecución interrumpida perdía su avance, y un reintento podía volver a
+enviar correos que sí llegaron pero cuya respuesta se perdió por timeout.
+
+El ledger guarda una fila por envío con clave (orderId, siiFolio, recipient), escrita
+(y confirmada en disco) apenas se completa cada envío:
+
+    - SENT:      la API respondió OK.
+    - UNCERTAIN: el request se envió pero la respuesta no llegó (timeout de lectura);
+                 el correo puede haber salido.
+
+En cada ejecución, antes de enviar, se consulta el ledger: las claves en SENT se
+omiten (status ALREADY_SENT), y también las UNCERTAIN salvo LEDGER_RESEND_UNCERTAIN.
+Volver a lanzar el mismo CSV después de un corte continúa donde quedó.
+
+La clave incluye el recipient: los envíos DRY_RUN (al email de prueba) no impiden
+el envío real al email del CSV.
+
+Compactación: al abrir se borran las filas con más de LEDGER_RETENTION_DAYS días
+y, si se borró algo, se ejecuta VACUUM.
+
+Las consultas ocurren en el hilo principal (process_order en run.py) y los registros
+en el hilo que completó cada envío (callback del Future, ver resend en run.py), así
+que la conexión se comparte entre hilos y cada operación toma un lock.
+
+Uso:
+    with SentLedger(path, retention_days=90) as ledger:
+        if ledger.lookup(order_id, sii_folio, recipient) == "SENT": ...
+        ledger.record(order_id, sii_folio, recipient, "SENT", status_code=200, attempts=1)
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+SENT = "SENT"
+UNCERTAIN = "UNCERTAIN"
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sent (
+        order_id    TEXT NOT NULL,
+        sii_folio   TEXT NOT NULL,
+        recipient   TEXT NOT NULL,
+        status      TEXT NOT NULL,
+        status_code INTEGER,
+        attempts    INTEGER,
+        sent_at     TEXT NOT NULL,
+        PRIMARY KEY (order_id, sii_folio, recipient)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS sent_sent_at ON sent (sent_at);
+"""
+
+
+class SentLedger:
+    """
+    Args:
+        path: Archivo SQLite del ledger (se crea si no existe)
+        retention_days: Días que se conserva cada fila (0 = sin compactación)
+    """
+
+    def __init__(self, path: str, retention_days: int = 90):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        # WAL: cada commit es barato y una ejecución cortada no deja el archivo a medias
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.purged = self._compact(retention_days)
+        self.skipped = 0
+        self.recorded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _compact(self, retention_days: int) -> int:
+        if retention_days <= 0:
+            return 0
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+        deleted = self._conn.execute("DELETE FROM sent WHERE sent_at < ?", (cutoff,)).rowcount
+        self._conn.commit()
+        if deleted:
+            self._conn.execute("VACUUM")
+        return deleted
+
+    def lookup(self, order_id: str, sii_folio: str, recipient: str) -> Optional[str]:
+        """Status registrado (SENT / UNCERTAIN) para la clave, o None si no hay registro."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM sent WHERE order_id = ? AND sii_folio = ? AND recipient = ?",
+                (str(order_id), str(sii_folio), recipient),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(
+        self,
+        order_id: str,
+        sii_folio: str,
+        recipient: str,
+        status: str,
+        status_code: Optional[int] = None,
+        attempts: Optional[int] = None,
+    ):
+        """Registra (o actualiza) un envío y lo confirma en disco. Se puede llamar desde cualquier hilo."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sent "
+                "(order_id, sii_folio, recipient, status, status_code, attempts, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(order_id),
+                    str(sii_folio),
+                    recipient,
+                    status,
+                    status_code,
+                    attempts,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+            self._conn.commit()
+            self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status = dict(
+                self._conn.execute("SELECT status, COUNT(*) FROM sent GROUP BY status").fetchall()
+            )
+        return {
+            "path": str(self.path),
+            "skipped": self.skipped,
+            "recorded": self.recorded,
+            "purged": self.purged,
+            "entries": by_status,
+        }